@@ -0,0 +1,138 @@
+import asyncio
+import hashlib
+import random
+from typing import Dict, List, Optional
+from xml.sax.saxutils import escape
+from aiohttp import web
+
+class FakeS3:
+    def __init__(self, latency: float = 0.0, forbidden_ratio: float = 0.3, missing_ratio: float = 0.6,
+                 throttle_ratio: float = 0.0, keys_per_bucket: int = 2500, object_size: int = 1024 * 1024,
+                 region: str = 'us-east-1', seed: int = 0):
+        """
+        Servidor S3 simulado (estilo path) para pruebas y benchmarks sin red.
+
+        El estado de cada bucket se deriva de un hash de su nombre: con las proporciones indicadas es
+        privado (403), inexistente (404) o público (200, con `keys_per_bucket` claves paginadas de 1000 en
+        1000). Una fracción `throttle_ratio` de las peticiones responde 429. Los objetos miden `object_size`
+        bytes y terminan con una credencial falsa para que el análisis de contenido tenga algo que encontrar.
+
+        Args:
+            latency (float): Retardo añadido a cada respuesta (segundos).
+            forbidden_ratio (float): Proporción de buckets privados.
+            missing_ratio (float): Proporción de buckets inexistentes.
+            throttle_ratio (float): Proporción de peticiones respondidas con 429.
+            keys_per_bucket (int): Claves de cada bucket público.
+            object_size (int): Tamaño de cada objeto (bytes).
+            region (str): Región anunciada en x-amz-bucket-region.
+            seed (int): Semilla del throttling aleatorio.
+        """
+        self.latency = latency
+        self.forbidden_ratio = forbidden_ratio
+        self.missing_ratio = missing_ratio
+        self.throttle_ratio = throttle_ratio
+        self.keys_per_bucket = keys_per_bucket
+        self.object_size = object_size
+        self.region = region
+        self.rng = random.Random(seed)
+        self.requests = 0
+        self.statuses: Dict[int, int] = {}
+        self.runner: Optional[web.AppRunner] = None
+        self.port = 0
+
+    @property
+    def endpoint(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def status_of(self, bucket: str) -> int:
+        """Estado HTTP fijo de un bucket según las proporciones configuradas."""
+        point = int.from_bytes(hashlib.blake2b(bucket.encode(), digest_size=8).digest(), 'big') / 2 ** 64
+        if point < self.missing_ratio:
+            return 404
+        if point < self.missing_ratio + self.forbidden_ratio:
+            return 403
+        return 200
+
+    def keys(self, bucket: str) -> List[str]:
+        names = ['config/.env', 'backups/db_password.sql', 'assets/logo.png', 'docs/readme.md']
+        return [f"{i:06d}/{names[i % len(names)]}" for i in range(self.keys_per_bucket)]
+
+    def listing(self, bucket: str, start: int, max_keys: int) -> bytes:
+        keys = self.keys(bucket)
+        page = keys[start:start + max_keys]
+        truncated = start + max_keys < len(keys)
+        contents = ''.join(f"<Contents><Key>{escape(key)}</Key><Size>{self.object_size}</Size>"
+                           f"<StorageClass>STANDARD</StorageClass></Contents>" for key in page)
+        token = f"<NextContinuationToken>{start + max_keys}</NextContinuationToken>" if truncated else ''
+        return (f'<?xml version="1.0" encoding="UTF-8"?><ListBucketResult xmlns="http://s3.amazonaws.com/doc/2006-03-01/">'
+                f"<Name>{escape(bucket)}</Name><KeyCount>{len(page)}</KeyCount><MaxKeys>{max_keys}</MaxKeys>"
+                f"<IsTruncated>{'true' if truncated else 'false'}</IsTruncated>{token}{contents}</ListBucketResult>").encode()
+
+    def _record(self, status: int) -> int:
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        return status
+
+    async def _delay(self) -> Optional[web.Response]:
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.throttle_ratio and self.rng.random() < self.throttle_ratio:
+            return web.Response(status=self._record(429))
+        return None
+
+    async def handle_bucket(self, request: web.Request) -> web.StreamResponse:
+        throttled = await self._delay()
+        if throttled:
+            return throttled
+        bucket = request.match_info['bucket']
+        status = self._record(self.status_of(bucket))
+        headers = {'x-amz-bucket-region': self.region} if status != 404 else {}
+        if request.method == 'HEAD' or status != 200:
+            return web.Response(status=status, headers=headers)
+        max_keys = int(request.query.get('max-keys', 1000))
+        if max_keys == 0:
+            return web.Response(status=200, headers=headers, body=self.listing(bucket, 0, 0))
+        start = int(request.query.get('continuation-token', 0))
+        return web.Response(status=200, headers=headers, body=self.listing(bucket, start, max_keys),
+                            content_type='application/xml')
+
+    async def handle_object(self, request: web.Request) -> web.StreamResponse:
+        throttled = await self._delay()
+        if throttled:
+            return throttled
+        if self.status_of(request.match_info['bucket']) != 200:
+            return web.Response(status=self._record(403))
+        self._record(200)
+        secret = b"\naws_secret_access_key=FAKEFAKEFAKE\n"
+        filler = self.object_size - len(secret)
+        response = web.StreamResponse(headers={'Content-Length': str(self.object_size)})
+        await response.prepare(request)
+        block = b'x' * (64 * 1024)
+        while filler > 0:
+            await response.write(block[:filler])
+            filler -= len(block)
+        await response.write(secret)
+        await response.write_eof()
+        return response
+
+    async def start(self) -> 'FakeS3':
+        app = web.Application()
+        app.router.add_route('*', '/{bucket}', self.handle_bucket)
+        app.router.add_get('/{bucket}/{key:.+}', self.handle_object)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, '127.0.0.1', self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self) -> None:
+        if self.runner:
+            await self.runner.cleanup()
+            self.runner = None
+
+    async def __aenter__(self) -> 'FakeS3':
+        return await self.start()
+
+    async def __aexit__(self, *exc) -> None:
+        await self.stop()
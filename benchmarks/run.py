@@ -0,0 +1,220 @@
+"""
+Benchmark sin red de S3Hunter-X contra un S3 simulado local.
+
+Recorre las rutas reales de escaneo (scan_buckets_async), listado y análisis (list_bucket_pages y
+AnalysisPool), descarga con análisis en vuelo (download_file) y reporte (generate_report), y mide para
+cada etapa el tiempo, las operaciones por segundo, la latencia p50/p99 y el tiempo de CPU.
+
+    python benchmarks/run.py --candidates 5000 --latency 0.02 --throttle 0.05 --json bench.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import aiohttp
+from tabulate import tabulate
+from config import settings
+from core import http_client, metrics
+from core.analyzer import Analyzer
+from core.db_writer import DBWriter
+from core.downloader import download_file
+from core.offload import AnalysisPool
+from core.ratelimit import AdaptiveRateLimiter
+from core.reporter import generate_report
+from core.scanner import list_bucket_pages, scan_buckets_async
+from benchmarks.fake_s3 import FakeS3
+from main import init_db
+
+# Patrones por defecto: con ellos la mitad de las claves simuladas son de riesgo y el secreto de cada
+# objeto está al final, así que la descarga recorre el objeto entero
+DEFAULT_PATTERNS = ['password', 'secret', r'\.env$', r'\.sql$', 'aws_secret_access_key']
+
+def percentile(samples: List[float], q: float) -> Optional[float]:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+def cpu_seconds(who: int = resource.RUSAGE_SELF) -> float:
+    usage = resource.getrusage(who)
+    return usage.ru_utime + usage.ru_stime
+
+class Stage:
+    """Mide una etapa: tiempo de pared, CPU del proceso principal y latencias individuales."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.latencies: List[float] = []
+        self.operations = 0
+
+    def __enter__(self) -> 'Stage':
+        self.wall = time.perf_counter()
+        self.cpu = cpu_seconds()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.wall = time.perf_counter() - self.wall
+        self.cpu = cpu_seconds() - self.cpu
+
+    def row(self) -> Dict:
+        p50, p99 = percentile(self.latencies, 0.5), percentile(self.latencies, 0.99)
+        return {
+            'stage': self.name,
+            'operations': self.operations,
+            'seconds': round(self.wall, 3),
+            'ops_per_second': round(self.operations / self.wall, 1) if self.wall else None,
+            'p50_ms': round(p50 * 1000, 2) if p50 is not None else None,
+            'p99_ms': round(p99 * 1000, 2) if p99 is not None else None,
+            'cpu_seconds': round(self.cpu, 3)
+        }
+
+def request_timer(stage_ref: Dict) -> aiohttp.TraceConfig:
+    """TraceConfig que anota la latencia de cada petición en la etapa activa."""
+    trace = aiohttp.TraceConfig()
+
+    async def on_start(session, context, params):
+        context.started = time.perf_counter()
+
+    async def on_end(session, context, params):
+        stage_ref['stage'].latencies.append(time.perf_counter() - context.started)
+
+    trace.on_request_start.append(on_start)
+    trace.on_request_end.append(on_end)
+    return trace
+
+async def run(args: argparse.Namespace) -> Dict:
+    tmp = tempfile.TemporaryDirectory()
+    fake = FakeS3(latency=args.latency, forbidden_ratio=args.forbidden, missing_ratio=args.missing,
+                  throttle_ratio=args.throttle, keys_per_bucket=args.keys,
+                  object_size=int(args.object_size_mb * 1024 * 1024))
+    await fake.start()
+    saved_settings = dict(settings.SETTINGS)
+    settings.SETTINGS.update({
+        's3_endpoint': fake.endpoint,
+        'database': os.path.join(tmp.name, 'bench.db'),
+        'request_timeout': 60,
+        'max_file_size_mb': args.object_size_mb + 1,
+        'save_flagged_files': False,
+        'region_discovery': True
+    })
+    patterns_file = args.patterns
+    if not patterns_file:
+        patterns_file = os.path.join(tmp.name, 'patterns.txt')
+        with open(patterns_file, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(DEFAULT_PATTERNS) + '\n')
+    init_db(settings.SETTINGS['database'])
+    metrics.REGISTRY.reset()
+    stages: List[Stage] = []
+    active: Dict = {}
+    connector = aiohttp.TCPConnector(limit=args.workers)
+    session = aiohttp.ClientSession(connector=connector, trace_configs=[request_timer(active)])
+    writer = DBWriter(settings.SETTINGS['database'], pragmas=settings.SETTINGS['sqlite_pragmas'])
+    analyzer = Analyzer(patterns_file)
+    analysis_pool = AnalysisPool(analyzer.patterns, workers=args.analysis_workers)
+    try:
+        candidates = [f"bench-bucket-{i}" for i in range(args.candidates)]
+        limiter = AdaptiveRateLimiter(args.rate, max_rate=args.rate * 10) if args.rate else None
+        with Stage('scan') as stage:
+            active['stage'] = stage
+            results = await scan_buckets_async(candidates, args.workers, session, limiter=limiter)
+            stage.operations = len(results)
+        stages.append(stage)
+        public = [bucket for bucket, data in results if data['status'] == 'PUBLIC'][:args.list_buckets]
+
+        # Arranque de los procesos de análisis fuera de la medición
+        await analysis_pool.analyze(fake.listing('warmup', 0, 1))
+        flagged = []
+        with Stage('list+analyze') as stage:
+            active['stage'] = stage
+            for bucket in public:
+                async for body in list_bucket_pages(session, bucket, fake.region, limiter=limiter):
+                    records = await analysis_pool.analyze(body)
+                    stage.operations += len(records)
+                    writer.write_many(
+                        "INSERT OR REPLACE INTO results (bucket, filename, risk, source, url, region) VALUES (?, ?, ?, ?, ?, ?)",
+                        [(bucket, r.filename, r.risk, 'bench', f"{fake.endpoint}/{bucket}/{r.filename}", fake.region) for r in records]
+                    )
+                    flagged.extend((bucket, r.filename) for r in records if r.risk == 'HIGH')
+            await writer.drain()
+        stages.append(stage)
+
+        semaphore = asyncio.Semaphore(args.download_workers)
+        with Stage('download') as stage:
+            active['stage'] = Stage('ignored')
+
+            async def fetch(bucket: str, filename: str) -> None:
+                async with semaphore:
+                    started = time.perf_counter()
+                    await download_file(bucket, filename, analyzer, fake.region)
+                    stage.latencies.append(time.perf_counter() - started)
+                    stage.operations += 1
+
+            await asyncio.gather(*(fetch(bucket, filename) for bucket, filename in flagged[:args.downloads]))
+        stages.append(stage)
+
+        with Stage('report') as stage:
+            await asyncio.to_thread(generate_report, ['md', 'json', 'csv'], os.path.join(tmp.name, 'report'))
+        with open(os.path.join(tmp.name, 'report.csv'), encoding='utf-8') as f:
+            stage.operations = sum(1 for _ in f) - 1
+        stages.append(stage)
+    finally:
+        analysis_pool.close()
+        writer.close()
+        await session.close()
+        await http_client.close_sessions()
+        await fake.stop()
+        tmp.cleanup()
+        settings.SETTINGS.clear()
+        settings.SETTINGS.update(saved_settings)
+
+    return {
+        'parameters': vars(args),
+        'server': {'requests': fake.requests, 'statuses': fake.statuses},
+        'stages': [stage.row() for stage in stages],
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        # Los procesos de análisis solo cuentan al terminar, así que su CPU se da como total de la ejecución
+        'analysis_process_cpu_seconds': round(cpu_seconds(resource.RUSAGE_CHILDREN), 3),
+        'peak_child_rss_mb': round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1)
+    }
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Benchmark offline de S3Hunter-X contra un S3 simulado')
+    parser.add_argument('--candidates', type=int, default=2000, help='Buckets candidatos a escanear')
+    parser.add_argument('--workers', type=int, default=50, help='Workers de escaneo (y conexiones HTTP)')
+    parser.add_argument('--rate', type=float, default=0, help='Ritmo inicial por endpoint (0 = sin limitador)')
+    parser.add_argument('--latency', type=float, default=0.005, help='Latencia simulada por respuesta (s)')
+    parser.add_argument('--forbidden', type=float, default=0.3, help='Proporción de buckets privados (403)')
+    parser.add_argument('--missing', type=float, default=0.65, help='Proporción de buckets inexistentes (404)')
+    parser.add_argument('--throttle', type=float, default=0.0, help='Proporción de respuestas 429')
+    parser.add_argument('--keys', type=int, default=2500, help='Claves por bucket público')
+    parser.add_argument('--list-buckets', type=int, default=10, help='Buckets públicos a listar')
+    parser.add_argument('--analysis-workers', type=int, default=None, help='Procesos de análisis (0 = en el proceso)')
+    parser.add_argument('--object-size-mb', type=float, default=4, help='Tamaño de cada objeto descargado (MB)')
+    parser.add_argument('--downloads', type=int, default=20, help='Objetos a descargar')
+    parser.add_argument('--download-workers', type=int, default=4, help='Descargas concurrentes')
+    parser.add_argument('--patterns', type=str, default=None, help='Archivo de patrones (por defecto, un conjunto reducido de ejemplo)')
+    parser.add_argument('--json', type=str, default=None, help='Archivo donde guardar el resultado en JSON')
+    return parser.parse_args(argv)
+
+def main(argv: Optional[List[str]] = None) -> Dict:
+    args = parse_args(argv)
+    report = asyncio.run(run(args))
+    print(tabulate(report['stages'], headers='keys', tablefmt='github'))
+    print(f"\nPeticiones al S3 simulado: {report['server']['requests']} {report['server']['statuses']}")
+    print(f"RSS máximo: {report['peak_rss_mb']} MB (procesos de análisis: {report['peak_child_rss_mb']} MB, "
+          f"{report['analysis_process_cpu_seconds']} s de CPU)")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    return report
+
+if __name__ == '__main__':
+    main()
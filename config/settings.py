@@ -1,22 +1,12 @@
 import os
 import re
-import requests
 from typing import Dict, List
 from dotenv import load_dotenv
 
 load_dotenv()
 
-def validate_proxy(proxy: str) -> bool:
-    """Valida si un proxy está funcional."""
-    try:
-        response = requests.get("https://httpbin.org/ip", proxies={"http": proxy, "https": proxy}, timeout=5)
-        return response.status_code == 200
-    except Exception as e:
-        print(f"Proxy {proxy} no funcional: {e}")
-        return False
-
 def validate_settings(settings: Dict) -> Dict:
-    """Valida los valores de configuración."""
+    """Valida los valores de configuración (sin acceder a la red; los proxies se comprueban con core.proxies)."""
     errors = []
     if not isinstance(settings.get('max_workers', 0), int) or settings['max_workers'] <= 0:
         errors.append("max_workers debe ser un entero positivo")
@@ -35,7 +25,11 @@ def validate_settings(settings: Dict) -> Dict:
             errors.append(f"Dominio no válido en authorized_domains: {domain}")
     if not isinstance(settings.get('s3_regions', []), list) or not settings['s3_regions']:
         errors.append("s3_regions debe ser una lista no vacía")
-    settings['proxies'] = [proxy for proxy in settings.get('proxies', []) if validate_proxy(proxy)]
+    for proxy in settings.get('proxies', []):
+        if not re.match(r'^https?://[^\s/]+', proxy):
+            errors.append(f"Proxy no válido: {proxy}")
+    if not isinstance(settings.get('cache_ttl', {}), dict) or any(not isinstance(v, (int, float)) or v < 0 for v in settings.get('cache_ttl', {}).values()):
+        errors.append("cache_ttl debe ser un diccionario estado -> segundos no negativos")
     if settings.get('telegram_token') and not settings.get('telegram_chat_id'):
         errors.append("Se proporcionó telegram_token pero falta telegram_chat_id")
     if settings.get('telegram_chat_id') and not settings.get('telegram_token'):
@@ -52,8 +46,76 @@ DEFAULT_SETTINGS: Dict[str, any] = {
     'patterns_file': 'data/grep_words.txt',
     'database': 'data/results.db',
     'request_timeout': 10,
+    # Pools de conexiones compartidos por core.http_client (keep-alive y caché DNS)
+    'http_pools': {
+        's3': {'limit': 100, 'limit_per_host': 10, 'keepalive_timeout': 30},
+        'api': {'limit': 10, 'limit_per_host': 5, 'keepalive_timeout': 60},
+        'crawler': {'limit': 50, 'limit_per_host': 8, 'keepalive_timeout': 15},
+    },
+    'dns_cache_ttl': 300,
+    # Resolución DNS en bloque de subdominios: servidores (vacío = los del sistema), consultas simultáneas,
+    # tiempo máximo por nombre y vigencia en caché de las respuestas negativas (el TTL positivo lo acota dns_cache_ttl)
+    'dns_nameservers': [],
+    'dns_concurrency': 200,
+    'dns_timeout': 3.0,
+    'dns_negative_ttl': 60,
     's3_regions': ['us-east-1', 'us-west-2', 'eu-west-1', 'ap-southeast-1'],
+    'region_discovery': True,
+    # Limitador AIMD por endpoint: ritmo inicial, techo y suelo en peticiones/s
+    'scan_rate': 50,
+    'scan_max_rate': 500,
+    'scan_min_rate': 1,
+    'max_retries': 5,
+    # TTL en segundos por estado para la caché de escaneo persistente (0 = volver a comprobar siempre)
+    'cache_ttl': {'NOT_FOUND': 7 * 24 * 3600, 'PRIVATE': 24 * 3600, 'PUBLIC': 0},
+    # Filtro de Bloom del generador de candidatos (elementos esperados y tasa de falsos positivos)
+    'dedup_capacity': 10_000_000,
+    'dedup_error_rate': 0.001,
+    'content_overlap_chars': 4096,
+    # Conservar en disco los archivos de alto riesgo; obliga a descargarlos enteros (sin corte en el primer hallazgo)
+    'save_flagged_files': False,
+    'download_queue_size': 100,
+    # Endpoint compatible con S3 (p. ej. http://127.0.0.1:9000); vacío = AWS con URLs virtual-hosted
+    's3_endpoint': '',
+    # Sondas en estilo path contra el endpoint regional (reutilizan conexiones keep-alive); fallback a virtual-hosted por bucket
+    's3_path_style': False,
+    # Rastreo web: páginas y MB máximos por rastreo, MB máximos por página y cortesía por host (peticiones simultáneas y segundos entre peticiones)
+    'crawl_max_pages': 5000,
+    'crawl_max_mb': 500,
+    'crawl_page_max_mb': 10,
+    'crawl_host_concurrency': 4,
+    'crawl_host_delay': 0.0,
+    # Comprobaciones simultáneas de los buckets de nube encontrados durante el rastreo (cada bucket se comprueba una vez)
+    'crawl_validation_workers': 20,
+    # Métricas: puerto del endpoint Prometheus (0 = desactivado), snapshot JSON periódico y su intervalo en segundos
+    'metrics_host': '127.0.0.1',
+    'metrics_port': 0,
+    'metrics_file': '',
+    'metrics_interval': 10,
+    # Procesos que analizan las páginas de listado (XML y patrones); None = uno por núcleo, 0 = en el bucle de eventos
+    'analysis_workers': None,
+    # Hilos (y conexiones por cliente boto3) para verificar ACLs con credenciales AWS
+    'acl_workers': 8,
+    # Escritor SQLite en segundo plano: filas por transacción, segundos máximos entre commits y PRAGMAs aplicados
+    'db_writer_batch': 2000,
+    'db_writer_interval': 1.0,
+    # Sentencias en espera como máximo: si el escritor se atasca, quien escribe se bloquea en lugar de acumular memoria
+    'db_writer_queue_size': 10000,
+    'sqlite_pragmas': {'journal_mode': 'WAL', 'synchronous': 'NORMAL', 'cache_size': -65536, 'temp_store': 'MEMORY'},
+    # Modo coordinador/worker: cola SQLite compartida, duración de las reservas, intentos y buckets por reserva
+    'queue_database': 'data/queue.db',
+    'queue_lease_seconds': 300,
+    'queue_max_attempts': 3,
+    'queue_batch_size': 100,
     'proxies': [],
+    # Comprobación de proxies bajo demanda: endpoint de prueba, tiempo máximo y vigencia del resultado
+    'proxy_check_url': 'https://httpbin.org/ip',
+    'proxy_check_timeout': 5,
+    'proxy_check_ttl': 600,
+    # Pool de salida: peticiones simultáneas por proxy, uso también de la IP propia y expulsión inicial en segundos
+    'proxy_max_concurrency': 20,
+    'proxy_include_direct': False,
+    'proxy_eject_seconds': 30,
     'use_tor': False,
     'user_agents': [
         'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
@@ -1,11 +1,55 @@
-import re
 import os
-from typing import List, Dict
+import codecs
+from typing import List, Dict, Optional
 from config import settings
+from core.matcher import PatternMatcher
 import logging
 
 logger = logging.getLogger('S3Hunter-X')
 
+class ContentScanner:
+    def __init__(self, matcher: PatternMatcher, overlap: int):
+        """
+        Analiza contenido fragmento a fragmento sin mantenerlo completo en memoria.
+
+        Args:
+            matcher (PatternMatcher): Matcher compartido con el Analyzer.
+            overlap (int): Caracteres del fragmento anterior que se conservan para detectar
+                coincidencias que cruzan el límite entre fragmentos.
+        """
+        self.matcher = matcher
+        self.overlap = overlap
+        self.decoder = codecs.getincrementaldecoder('utf-8')(errors='ignore')
+        self.tail = ''
+        self.started = False
+        self.pattern: Optional[str] = None
+
+    def feed(self, data: bytes, final: bool = False) -> Optional[str]:
+        """Procesa un fragmento de bytes y devuelve el patrón encontrado, si lo hay."""
+        if self.pattern:
+            return self.pattern
+        text = self.decoder.decode(data, final)
+        # Al terminar se vuelve a mirar la cola aunque no lleguen más bytes: es donde '$' puede coincidir
+        if not text and not final:
+            return None
+        # Tras el primer fragmento se antepone un centinela y se busca desde pos=1: así '^' solo
+        # coincide con el inicio real del contenido y no con el de cada ventana. Del mismo modo,
+        # '$' solo coincide con el final real (open_end mientras queden fragmentos)
+        sentinel = '\n' if self.started else ''
+        window = sentinel + self.tail + text
+        self.pattern = self.matcher.search(window, len(sentinel), open_end=not final)
+        self.tail = window[len(sentinel):][-self.overlap:] if self.overlap else ''
+        self.started = True
+        return self.pattern
+
+    def finish(self) -> Optional[str]:
+        """Vacía el decodificador y devuelve el resultado final."""
+        return self.feed(b'', final=True)
+
+    @property
+    def risk(self) -> str:
+        return 'HIGH' if self.pattern else 'LOW'
+
 class Analyzer:
     def __init__(self, patterns_file: str):
         """Inicializa el analizador con patrones de riesgo."""
@@ -20,6 +64,8 @@ class Analyzer:
         except Exception as e:
             logger.error(f"Error al cargar patrones: {e}")
             self.patterns = []
+        # Se compila una sola vez y se comparte entre el análisis de nombres y de contenido
+        self.matcher = PatternMatcher(self.patterns)
 
     def analyze_files(self, bucket: str, files: List[Dict]) -> List[Dict]:
         """Analiza archivos de un bucket S3 y asigna niveles de riesgo."""
@@ -28,27 +74,34 @@ class Analyzer:
             filename = file.get('Key', '')
             if not filename:
                 continue
-            risk = 'LOW'
-            if any(re.search(pattern, filename, re.IGNORECASE) for pattern in self.patterns):
-                risk = 'HIGH'
+            pattern = self.matcher.search(filename)
+            risk = 'HIGH' if pattern else 'LOW'
             results.append({
                 'bucket': bucket,
                 'filename': filename,
-                'risk': risk
+                'risk': risk,
+                'pattern': pattern,
+                'size': file.get('Size')
             })
             logger.debug(f"Analizado {filename} en {bucket}: Riesgo {risk}")
         return results
 
+    def content_scanner(self) -> ContentScanner:
+        """Crea un analizador incremental de contenido que comparte el matcher compilado."""
+        return ContentScanner(self.matcher, settings.SETTINGS.get('content_overlap_chars', 4096))
+
     def analyze_content(self, file_path: str) -> str:
         """Analiza el contenido de un archivo descargado para detectar patrones sensibles."""
         try:
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                content = f.read()
-                for pattern in self.patterns:
-                    if re.search(pattern, content, re.IGNORECASE):
-                        logger.debug(f"Patrón sensible encontrado en {file_path}: {pattern}")
-                        return 'HIGH'
-            return 'LOW'
+            scanner = self.content_scanner()
+            with open(file_path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    if scanner.feed(chunk):
+                        break
+                scanner.finish()
+            if scanner.pattern:
+                logger.debug(f"Patrón sensible encontrado en {file_path}: {scanner.pattern}")
+            return scanner.risk
         except Exception as e:
             logger.error(f"Error al analizar contenido de {file_path}: {e}")
             return 'UNKNOWN'
\ No newline at end of file
@@ -1,66 +1,183 @@
+import asyncio
+import threading
 import boto3
 import logging
-from typing import Dict, Optional
+from concurrent.futures import ThreadPoolExecutor
+from botocore.config import Config
+from botocore.exceptions import ClientError
+from typing import Dict, Optional, Tuple
 
 logger = logging.getLogger('S3Hunter-X')
 
+_clients: Dict[Tuple[str, str, Optional[str]], object] = {}
+_clients_lock = threading.Lock()
+
+def get_s3_client(aws_credentials: Dict, region: Optional[str] = None, max_pool_connections: int = 10):
+    """
+    Devuelve un cliente S3 reutilizable por juego de credenciales y región.
+
+    Los clientes de boto3 son seguros entre hilos, pero crearlos (y las sesiones) no lo es ni es barato,
+    así que se crean una sola vez bajo un lock.
+    """
+    key = (aws_credentials["access_key"], aws_credentials["secret_key"], region)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            session = boto3.Session(
+                aws_access_key_id=aws_credentials["access_key"],
+                aws_secret_access_key=aws_credentials["secret_key"]
+            )
+            client = session.client("s3", region_name=region,
+                                    config=Config(max_pool_connections=max_pool_connections))
+            _clients[key] = client
+        return client
+
+def _has_credentials(aws_credentials: Optional[Dict]) -> bool:
+    return bool(aws_credentials and aws_credentials.get("access_key") and aws_credentials.get("secret_key"))
+
+def _bucket_name(bucket_url: str) -> str:
+    return bucket_url.replace(".s3.amazonaws.com", "")
+
+def _new_result(bucket_url: str) -> Dict:
+    return {"bucket_url": bucket_url, "exists": False, "is_public": False, "owner": None, "acls": None,
+            "policy_public": None, "public_access_block": None, "error": None}
+
+def _read_acl(s3_client, bucket_name: str) -> Dict:
+    try:
+        acl = s3_client.get_bucket_acl(Bucket=bucket_name)
+        return {
+            "owner": acl.get("Owner", {}).get("DisplayName", "unknown"),
+            "acls": {
+                "AllUsers": get_group_acls(acl, "AllUsers"),
+                "AuthenticatedUsers": get_group_acls(acl, "AuthenticatedUsers")
+            },
+            "acl_public": bool(_group_permissions(acl, "AllUsers"))
+        }
+    except Exception as e:
+        logger.debug(f"No se pudieron leer ACLs para {bucket_name}: {e}")
+        return {"acls": f"could not read: {str(e)}"}
+
+def _read_policy_status(s3_client, bucket_name: str) -> Dict:
+    try:
+        status = s3_client.get_bucket_policy_status(Bucket=bucket_name)
+        return {"policy_public": status.get("PolicyStatus", {}).get("IsPublic", False)}
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") == "NoSuchBucketPolicy":
+            return {"policy_public": False}
+        logger.debug(f"No se pudo leer el estado de la política de {bucket_name}: {e}")
+    except Exception as e:
+        logger.debug(f"No se pudo leer el estado de la política de {bucket_name}: {e}")
+    return {}
+
+def _read_public_access_block(s3_client, bucket_name: str) -> Dict:
+    try:
+        block = s3_client.get_public_access_block(Bucket=bucket_name)
+        return {"public_access_block": block.get("PublicAccessBlockConfiguration", {})}
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") == "NoSuchPublicAccessBlockConfiguration":
+            return {"public_access_block": {}}
+        logger.debug(f"No se pudo leer el bloqueo de acceso público de {bucket_name}: {e}")
+    except Exception as e:
+        logger.debug(f"No se pudo leer el bloqueo de acceso público de {bucket_name}: {e}")
+    return {}
+
+def _merge(result: Dict, *parts: Dict) -> Dict:
+    """Combina los campos devueltos por cada lectura; is_public se calcula una sola vez al final."""
+    for part in parts:
+        result.update(part)
+    result["is_public"] = bool(result.pop("acl_public", False) or result.get("policy_public"))
+    return result
+
 def check_bucket_access(bucket_url: str, aws_credentials: Optional[Dict] = None) -> Dict:
     """
     Verifica si un bucket S3 es accesible usando AWS SDK.
-    
+
     Args:
         bucket_url (str): URL del bucket (e.g., bucket.s3.amazonaws.com).
         aws_credentials (Dict, optional): Credenciales AWS (access_key, secret_key).
-    
+
     Returns:
-        Dict: Detalles de accesibilidad (exists, is_public, owner, acls, error).
+        Dict: Detalles de accesibilidad (exists, is_public, owner, acls, policy_public, public_access_block, error).
     """
-    result = {"bucket_url": bucket_url, "exists": False, "is_public": False, "owner": None, "acls": None, "error": None}
-    
+    result = _new_result(bucket_url)
+
     try:
-        if not aws_credentials or not aws_credentials.get("access_key") or not aws_credentials.get("secret_key"):
+        if not _has_credentials(aws_credentials):
             logger.debug(f"No se proporcionaron credenciales AWS para {bucket_url}")
             return result
-        
-        bucket_name = bucket_url.replace(".s3.amazonaws.com", "")
-        session = boto3.Session(
-            aws_access_key_id=aws_credentials["access_key"],
-            aws_secret_access_key=aws_credentials["secret_key"]
-        )
-        s3_client = session.client("s3")
-        
+
+        bucket_name = _bucket_name(bucket_url)
+        s3_client = get_s3_client(aws_credentials)
+
         s3_client.head_bucket(Bucket=bucket_name)
         result["exists"] = True
-        
-        try:
-            acl = s3_client.get_bucket_acl(Bucket=bucket_name)
-            result["owner"] = acl.get("Owner", {}).get("DisplayName", "unknown")
-            result["acls"] = {
-                "AllUsers": get_group_acls(acl, "AllUsers"),
-                "AuthenticatedUsers": get_group_acls(acl, "AuthenticatedUsers")
-            }
-            result["is_public"] = bool(result["acls"]["AllUsers"])
-        except Exception as e:
-            result["acls"] = f"could not read: {str(e)}"
-            logger.debug(f"No se pudieron leer ACLs para {bucket_name}: {e}")
-        
+
+        _merge(result, _read_acl(s3_client, bucket_name), _read_policy_status(s3_client, bucket_name),
+               _read_public_access_block(s3_client, bucket_name))
+
     except Exception as e:
         result["error"] = str(e)
         logger.error(f"Error al verificar bucket {bucket_url}: {e}")
-    
+
     return result
 
+class ACLChecker:
+    def __init__(self, aws_credentials: Dict, max_workers: int = 8):
+        """
+        Verificador de ACLs que no bloquea el bucle de eventos.
+
+        Las llamadas de boto3 se ejecutan en un pool de hilos acotado y reutilizan un cliente por región;
+        ACL, estado de la política y bloqueo de acceso público se consultan en paralelo.
+
+        Args:
+            aws_credentials (Dict): Credenciales AWS (access_key, secret_key).
+            max_workers (int): Hilos (y conexiones por cliente) dedicados a las llamadas a AWS.
+        """
+        self.aws_credentials = aws_credentials
+        self.max_workers = max_workers
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='acl-checker')
+
+    async def check(self, bucket: str, region: Optional[str] = None) -> Dict:
+        """Verifica un bucket y devuelve el mismo diccionario que check_bucket_access."""
+        bucket_url = f"{bucket}.s3.amazonaws.com"
+        result = _new_result(bucket_url)
+        if not _has_credentials(self.aws_credentials):
+            logger.debug(f"No se proporcionaron credenciales AWS para {bucket_url}")
+            return result
+        loop = asyncio.get_running_loop()
+        try:
+            s3_client = get_s3_client(self.aws_credentials, region, self.max_workers)
+            await loop.run_in_executor(self.executor, lambda: s3_client.head_bucket(Bucket=bucket))
+            result["exists"] = True
+            # Cada lectura devuelve sus propios campos y se combinan aquí, en el bucle, sin estado compartido entre hilos
+            parts = await asyncio.gather(*(
+                loop.run_in_executor(self.executor, read, s3_client, bucket)
+                for read in (_read_acl, _read_policy_status, _read_public_access_block)
+            ))
+            _merge(result, *parts)
+        except Exception as e:
+            result["error"] = str(e)
+            logger.error(f"Error al verificar bucket {bucket_url}: {e}")
+        return result
+
+    def close(self) -> None:
+        """Libera el pool de hilos sin esperar a llamadas pendientes."""
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+def _group_permissions(acl: Dict, group: str) -> list:
+    group_uri = f"http://acs.amazonaws.com/groups/global/{group}"
+    return [g["Permission"] for g in acl.get("Grants", []) if g["Grantee"]["Type"] == "Group" and g["Grantee"].get("URI") == group_uri]
+
 def get_group_acls(acl: Dict, group: str) -> str:
     """
     Extrae permisos ACL para un grupo específico.
-    
+
     Args:
         acl (Dict): Datos ACL del bucket.
         group (str): Nombre del grupo (e.g., AllUsers, AuthenticatedUsers).
-    
+
     Returns:
         str: Cadena de permisos ACL.
     """
-    group_uri = f"http://acs.amazonaws.com/groups/global/{group}"
-    perms = [g["Permission"] for g in acl.get("Grants", []) if g["Grantee"]["Type"] == "Group" and g["Grantee"]["URI"] == group_uri]
-    return f"{group}: {', '.join(perms) if perms else '(none)'}"
\ No newline at end of file
+    perms = _group_permissions(acl, group)
+    return f"{group}: {', '.join(perms) if perms else '(none)'}"
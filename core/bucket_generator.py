@@ -3,29 +3,28 @@ import re
 import itertools
 import random
 import string
-import dns.resolver
-from typing import List, Set
+from typing import List, Iterator, Optional
 from config import settings
+from core.utils import BloomFilter
 import logging
 
 logger = logging.getLogger('S3Hunter-X')
 
-def resolve_subdomains(domain: str) -> List[str]:
-    """Resuelve subdominios de un dominio usando DNS, filtrando solo los relacionados con S3."""
-    subdomains = [domain.replace('.', '-').lower()]
-    try:
-        resolver = dns.resolver.Resolver()
-        resolver.timeout = 5
-        resolver.lifetime = 5
-        answers = resolver.resolve(domain, 'CNAME')
-        for rdata in answers:
-            target = rdata.target.to_text().rstrip('.')
-            if target.endswith('.s3.amazonaws.com') or any(target.endswith(f'.s3.{region}.amazonaws.com') for region in settings.SETTINGS['s3_regions']):
-                subdomains.append(domain.replace('.', '-').lower())
-        logger.debug(f"CNAMEs encontrados para {domain}: {[rdata.target.to_text() for rdata in answers]}")
-    except Exception as e:
-        logger.debug(f"No se encontraron CNAMEs válidos para {domain}: {e}")
-    return list(set(subdomains))
+def load_subdomains(domain: str, subdomains_file: Optional[str] = None) -> List[str]:
+    """
+    Nombres de host del objetivo: el dominio y los subdominios del archivo (una etiqueta o un nombre completo por línea).
+
+    Returns:
+        List[str]: Nombres en minúsculas, sin duplicados y en el orden del archivo.
+    """
+    hostnames = [domain.lower()]
+    if subdomains_file and os.path.exists(subdomains_file):
+        with open(subdomains_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                name = line.strip().rstrip('.').lower()
+                if name:
+                    hostnames.append(name if '.' in name else f"{name}.{domain.lower()}")
+    return list(dict.fromkeys(hostnames))
 
 def load_wordlist(file_path: str) -> List[str]:
     """Carga una lista de palabras desde un archivo."""
@@ -52,24 +51,63 @@ def load_permutations(file_path: str, domain: str) -> List[str]:
         logger.warning(f"Archivo de permutaciones {file_path} no encontrado")
     return permutations
 
-def generate_fuzzed_names(base_name: str, max_fuzz: int = 100) -> List[str]:
+def generate_fuzzed_names(base_name: str, max_fuzz: int = 100, rng: Optional[random.Random] = None) -> Iterator[str]:
     """Genera variaciones fuzzed de un nombre base."""
-    fuzzed = [base_name]
+    rng = rng or random
+    yield base_name
     for i in range(min(max_fuzz // 2, 50)):
-        fuzzed.append(f"{base_name}-{i:03d}")
-        fuzzed.append(f"{base_name}{i:03d}")
+        yield f"{base_name}-{i:03d}"
+        yield f"{base_name}{i:03d}"
     for _ in range(min(max_fuzz // 2, 50)):
-        random_suffix = ''.join(random.choices(string.ascii_lowercase + string.digits, k=8))
-        fuzzed.append(f"{base_name}-{random_suffix}")
+        random_suffix = ''.join(rng.choices(string.ascii_lowercase + string.digits, k=8))
+        yield f"{base_name}-{random_suffix}"
     variations = ['v1', 'v2', 'v3', 'prod', 'dev', 'test', 'backup', 'old', 'new', 'temp', 'staging', 'qa', 'sandbox']
     for var in variations:
-        fuzzed.append(f"{base_name}-{var}")
-        fuzzed.append(f"{var}-{base_name}")
-    return fuzzed
+        yield f"{base_name}-{var}"
+        yield f"{var}-{base_name}"
 
-def generate_bucket_names(target_domain: str, wordlist_file: str = None, subdomains_file: str = None, 
-                         permutations_file: str = None, max_buckets: int = None, exhaustive: bool = False) -> List[str]:
-    """Genera nombres de buckets con fuzzing avanzado."""
+# Palabras que, como en la ordenación previa, marcan los candidatos más probables
+PRIORITY_KEYWORDS = ['prod', 'backup', 'data', 'public', 's3', 'dev', 'test', 'www']
+
+def high_priority_names(domain_clean: str) -> List[str]:
+    """Nombres directos derivados de un dominio limpio."""
+    return [
+        f"{domain_clean}",
+        f"s3-{domain_clean}",
+        f"{domain_clean}-s3",
+        f"{domain_clean}-public",
+        f"{domain_clean}-private",
+        f"{domain_clean}-data",
+        f"{domain_clean}-backup",
+        f"{domain_clean}-prod",
+        f"{domain_clean}-dev",
+        f"{domain_clean}-test",
+        f"www-{domain_clean}",
+        f"{domain_clean}-www"
+    ]
+
+def iter_bucket_names(target_domain: str, wordlist_file: str = None, subdomains_file: str = None,
+                      permutations_file: str = None, max_buckets: int = None, exhaustive: bool = False,
+                      seed: Optional[int] = None) -> Iterator[str]:
+    """
+    Genera nombres de buckets de forma perezosa, en orden de prioridad y sin duplicados.
+
+    Los candidatos se emiten por niveles (nombres directos, permutaciones, prefijos/sufijos simples,
+    fuzzing y combinaciones prefijo-sufijo) para que el escaneo empiece de inmediato con los más
+    probables. La deduplicación usa un filtro de Bloom de memoria acotada.
+
+    Args:
+        target_domain (str): Dominio objetivo.
+        wordlist_file (str, optional): Wordlist con prefijos/sufijos adicionales.
+        subdomains_file (str, optional): Archivo con subdominios.
+        permutations_file (str, optional): Patrones de permutación con '%s'.
+        max_buckets (int, optional): Máximo de nombres a emitir.
+        exhaustive (bool): Usar todas las palabras en lugar de las 50 primeras.
+        seed (int, optional): Semilla del fuzzing aleatorio para obtener un orden reproducible.
+
+    Yields:
+        str: Nombres de buckets válidos según las reglas de S3.
+    """
     prefixes = [
         'dev', 'prod', 'staging', 'backup', 'data', 'files', 'public', 'logs', 'test', 'api',
         'app', 'config', 'archive', 'static', 'media', 'assets', 'qa', 'sandbox', 'temp',
@@ -86,50 +124,54 @@ def generate_bucket_names(target_domain: str, wordlist_file: str = None, subdoma
         extra_words = load_wordlist(wordlist_file)
         prefixes.extend(extra_words[:200 if exhaustive else 100])
         suffixes.extend(extra_words[:200 if exhaustive else 100])
+    prefix_limit = len(prefixes) if exhaustive else min(len(prefixes), 50)
+    suffix_limit = len(suffixes) if exhaustive else min(len(suffixes), 50)
+    # Orden estable: las palabras clave primero, para que sus combinaciones salgan antes
+    is_priority = lambda word: any(kw in word for kw in PRIORITY_KEYWORDS)
+    prefixes = sorted(prefixes[:prefix_limit], key=is_priority, reverse=True)
+    suffixes = sorted(suffixes[:suffix_limit], key=is_priority, reverse=True)
     
-    subdomains = resolve_subdomains(target_domain)
-    if subdomains_file and os.path.exists(subdomains_file):
-        with open(subdomains_file, 'r', encoding='utf-8') as f:
-            subdomains.extend([line.strip().replace('.', '-').lower() for line in f if line.strip()])
-    subdomains = list(set(subdomains))
+    # La resolución DNS de los subdominios se hace antes, en bloque y sin bloquear (core.dns_resolver)
+    subdomains = list(dict.fromkeys(host.replace('.', '-') for host in load_subdomains(target_domain, subdomains_file)))
     
-    buckets: Set[str] = set()
-    for domain_clean in subdomains:
-        high_priority = [
-            f"{domain_clean}",
-            f"s3-{domain_clean}",
-            f"{domain_clean}-s3",
-            f"{domain_clean}-public",
-            f"{domain_clean}-private",
-            f"{domain_clean}-data",
-            f"{domain_clean}-backup",
-            f"{domain_clean}-prod",
-            f"{domain_clean}-dev",
-            f"{domain_clean}-test",
-            f"www-{domain_clean}",
-            f"{domain_clean}-www"
-        ]
-        buckets.update(high_priority)
-        prefix_limit = len(prefixes) if exhaustive else min(len(prefixes), 50)
-        suffix_limit = len(suffixes) if exhaustive else min(len(suffixes), 50)
-        for prefix in prefixes[:prefix_limit]:
-            buckets.add(f"{prefix}-{domain_clean}")
-        for suffix in suffixes[:suffix_limit]:
-            buckets.add(f"{domain_clean}-{suffix}")
-        for prefix, suffix in itertools.product(prefixes[:prefix_limit], suffixes[:suffix_limit]):
-            buckets.add(f"{prefix}-{domain_clean}-{suffix}")
-        for base_name in high_priority:
-            buckets.update(generate_fuzzed_names(base_name, max_fuzz=200 if exhaustive else 100))
-        
-        if permutations_file:
-            buckets.update(load_permutations(permutations_file, domain_clean))
+    rng = random.Random(seed)
+    max_fuzz = 200 if exhaustive else 100
     
-    valid_buckets = [b for b in buckets if is_valid_s3_bucket_name(b)]
-    if max_buckets:
-        valid_buckets = sorted(valid_buckets, key=lambda x: any(kw in x for kw in ['prod', 'backup', 'data', 'public', 's3', 'dev', 'test', 'www']), reverse=True)[:max_buckets]
+    def tiers() -> Iterator[str]:
+        for domain_clean in subdomains:
+            yield from high_priority_names(domain_clean)
+        if permutations_file:
+            for domain_clean in subdomains:
+                yield from load_permutations(permutations_file, domain_clean)
+        for domain_clean in subdomains:
+            for prefix in prefixes:
+                yield f"{prefix}-{domain_clean}"
+            for suffix in suffixes:
+                yield f"{domain_clean}-{suffix}"
+        for domain_clean in subdomains:
+            for base_name in high_priority_names(domain_clean):
+                yield from generate_fuzzed_names(base_name, max_fuzz=max_fuzz, rng=rng)
+        for domain_clean in subdomains:
+            for prefix, suffix in itertools.product(prefixes, suffixes):
+                yield f"{prefix}-{domain_clean}-{suffix}"
     
-    logger.info(f"Generados {len(valid_buckets)} nombres de buckets para {target_domain}")
-    return valid_buckets
+    capacity = max_buckets or settings.SETTINGS['dedup_capacity']
+    seen = BloomFilter(capacity, settings.SETTINGS['dedup_error_rate'])
+    emitted = 0
+    for bucket in tiers():
+        if not is_valid_s3_bucket_name(bucket) or bucket in seen:
+            continue
+        seen.add(bucket)
+        yield bucket
+        emitted += 1
+        if max_buckets and emitted >= max_buckets:
+            break
+    logger.info(f"Generados {emitted} nombres de buckets para {target_domain}")
+
+def generate_bucket_names(target_domain: str, wordlist_file: str = None, subdomains_file: str = None, 
+                         permutations_file: str = None, max_buckets: int = None, exhaustive: bool = False) -> List[str]:
+    """Genera nombres de buckets con fuzzing avanzado."""
+    return list(iter_bucket_names(target_domain, wordlist_file, subdomains_file, permutations_file, max_buckets, exhaustive))
 
 def is_valid_s3_bucket_name(bucket: str) -> bool:
     """Valida si un nombre de bucket cumple con las reglas de AWS S3."""
@@ -149,23 +191,23 @@ def generate_buckets_file(target_domain: str, output_file: str = 'data/buckets.t
         logger.error("Se requiere un dominio objetivo para generar buckets")
         return False
     
-    buckets = generate_bucket_names(target_domain, wordlist_file, subdomains_file, permutations_file, max_buckets, exhaustive)
+    buckets = iter_bucket_names(target_domain, wordlist_file, subdomains_file, permutations_file, max_buckets, exhaustive)
     authorized_domains = settings.SETTINGS.get('authorized_domains', [])
     if authorized_domains:
         authorized_domains_clean = [domain.replace('.', '-').lower() for domain in authorized_domains]
-        buckets = [b for b in buckets if any(domain in b for domain in authorized_domains_clean)]
-        logger.info(f"Filtrados {len(buckets)} buckets autorizados")
-    
-    if not buckets:
-        logger.error("No se generaron buckets válidos para escanear")
-        return False
+        buckets = (b for b in buckets if any(domain in b for domain in authorized_domains_clean))
     
     try:
         os.makedirs(os.path.dirname(output_file), exist_ok=True)
+        written = 0
         with open(output_file, 'w', encoding='utf-8') as f:
             for bucket in buckets:
                 f.write(f"{bucket}\n")
-        logger.info(f"Archivo {output_file} generado con {len(buckets)} buckets")
+                written += 1
+        if not written:
+            logger.error("No se generaron buckets válidos para escanear")
+            return False
+        logger.info(f"Archivo {output_file} generado con {written} buckets")
         return True
     except Exception as e:
         logger.error(f"Error al generar {output_file}: {e}")
@@ -0,0 +1,95 @@
+import sqlite3
+import threading
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional
+from core.db_writer import DBWriter
+
+logger = logging.getLogger('S3Hunter-X')
+
+class ScanCache:
+    def __init__(self, db_path: str, ttls: Dict[str, float], commit_every: int = 500,
+                 writer: Optional[DBWriter] = None):
+        """
+        Inicializa la caché persistente de resultados sobre la tabla scanned_buckets.
+
+        Args:
+            db_path (str): Ruta de la base de datos SQLite (ya inicializada con init_db).
+            ttls (Dict[str, float]): Tiempo de vida en segundos por estado; 0 o ausente = no cachear.
+            commit_every (int): Número de escrituras antes de confirmar la transacción.
+            writer (DBWriter, optional): Escritor en segundo plano; si se indica, las escrituras se delegan en él
+                y la conexión propia solo se usa para leer.
+        """
+        self.ttls = ttls
+        self.writer = writer
+        self.commit_every = commit_every
+        self.pending = 0
+        self.hits = 0
+        self.misses = 0
+        # get_many se ejecuta en un hilo aparte (scan_stream): el lock serializa el uso de la conexión
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+
+    def _fresh(self, status: str, region: Optional[str], timestamp) -> Optional[Dict]:
+        ttl = self.ttls.get(status, 0)
+        if ttl > 0 and timestamp:
+            try:
+                age = (datetime.now() - datetime.fromisoformat(str(timestamp))).total_seconds()
+            except ValueError:
+                age = ttl
+            if age < ttl:
+                return {'status': status, 'region': region, 'cached': True}
+        return None
+
+    def get(self, bucket: str) -> Optional[Dict]:
+        """Devuelve el resultado cacheado de un bucket si sigue vigente según el TTL de su estado."""
+        return self.get_many([bucket]).get(bucket)
+
+    def get_many(self, buckets: List[str]) -> Dict[str, Dict]:
+        """Consulta varios buckets en una sola sentencia y devuelve solo los resultados vigentes."""
+        if not buckets:
+            return {}
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT bucket, status, region, timestamp FROM scanned_buckets WHERE bucket IN ({','.join('?' * len(buckets))})",
+                buckets
+            ).fetchall()
+        found = {}
+        for bucket, status, region, timestamp in rows:
+            cached = self._fresh(status, region, timestamp)
+            if cached:
+                found[bucket] = cached
+        self.hits += len(found)
+        self.misses += len(buckets) - len(found)
+        return found
+
+    def put(self, bucket: str, result: Dict) -> None:
+        """Guarda el estado de un bucket conservando owner y acls si ya existían."""
+        status = result.get('status')
+        if status not in self.ttls:
+            return
+        sql = """INSERT INTO scanned_buckets (bucket, status, region, timestamp) VALUES (?, ?, ?, ?)
+                 ON CONFLICT(bucket) DO UPDATE SET status = excluded.status, region = excluded.region, timestamp = excluded.timestamp"""
+        params = (bucket, status, result.get('region'), datetime.now())
+        if self.writer:
+            self.writer.write(sql, params)
+            return
+        with self.lock:
+            self.conn.execute(sql, params)
+            self.pending += 1
+        if self.pending >= self.commit_every:
+            self.flush()
+
+    def flush(self) -> None:
+        """Confirma las escrituras pendientes."""
+        with self.lock:
+            if self.pending:
+                self.conn.commit()
+                self.pending = 0
+
+    def close(self) -> None:
+        """Confirma lo pendiente y cierra la conexión."""
+        self.flush()
+        with self.lock:
+            self.conn.close()
+        logger.info(f"Caché de escaneo cerrada ({self.hits} aciertos, {self.misses} fallos)")
@@ -0,0 +1,174 @@
+import json
+import random
+import sqlite3
+import threading
+import logging
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Set
+from core.db_writer import DBWriter
+
+logger = logging.getLogger('S3Hunter-X')
+
+class ScanCheckpoint:
+    def __init__(self, db_path: str, writer: DBWriter, params: Dict, run_id: Optional[str] = None):
+        """
+        Progreso persistente de una ejecución para poder reanudarla con --resume.
+
+        Los candidatos se numeran en el orden en que salen del generador (reproducible con la semilla
+        guardada). Se persiste la marca de agua (todas las posiciones anteriores están terminadas), las
+        posiciones terminadas fuera de orden por encima de ella y las descargas pendientes. Las escrituras
+        pasan por el mismo DBWriter que los resultados, así que el progreso nunca se confirma antes que
+        las filas que lo respaldan.
+
+        Args:
+            db_path (str): Base de datos de resultados (las tablas del checkpoint se crean si no existen).
+            writer (DBWriter): Escritor compartido con los resultados.
+            params (Dict): Parámetros que determinan la lista de candidatos; al reanudar deben coincidir.
+            run_id (str, optional): Ejecución a reanudar; None = ejecución nueva.
+
+        Raises:
+            ValueError: Si la ejecución no existe o se reanuda con parámetros distintos.
+        """
+        self.writer = writer
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        with self.conn:
+            self.conn.execute('''CREATE TABLE IF NOT EXISTS scan_runs (
+                run_id TEXT PRIMARY KEY,
+                params TEXT NOT NULL,
+                seed INTEGER NOT NULL,
+                priority TEXT,
+                issued INTEGER NOT NULL DEFAULT 0,
+                watermark INTEGER NOT NULL DEFAULT 0,
+                finished INTEGER NOT NULL DEFAULT 0,
+                report_watermark INTEGER NOT NULL DEFAULT 0,
+                updated DATETIME
+            )''')
+            columns = [col[1] for col in self.conn.execute("PRAGMA table_info(scan_runs)")]
+            if 'report_watermark' not in columns:
+                self.conn.execute("ALTER TABLE scan_runs ADD COLUMN report_watermark INTEGER NOT NULL DEFAULT 0")
+            self.conn.execute('''CREATE TABLE IF NOT EXISTS run_completed (
+                run_id TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                PRIMARY KEY (run_id, position)
+            )''')
+            self.conn.execute('''CREATE TABLE IF NOT EXISTS run_downloads (
+                run_id TEXT NOT NULL,
+                bucket TEXT NOT NULL,
+                filename TEXT NOT NULL,
+                region TEXT,
+                size INTEGER,
+                PRIMARY KEY (run_id, bucket, filename)
+            )''')
+        self.positions: Dict[str, int] = {}
+        self.completed: Set[int] = set()
+        self.unsaved: Set[int] = set()
+        self.resumed = run_id is not None
+        if run_id:
+            row = self.conn.execute(
+                "SELECT params, seed, priority, issued, watermark, report_watermark FROM scan_runs WHERE run_id = ?", (run_id,)
+            ).fetchone()
+            if not row:
+                raise ValueError(f"No existe la ejecución {run_id}")
+            stored = json.loads(row[0])
+            changed = sorted(key for key in set(stored) | set(params) if stored.get(key) != params.get(key))
+            if changed:
+                raise ValueError(f"La ejecución {run_id} se lanzó con otros parámetros: {', '.join(changed)}")
+            self.run_id = run_id
+            self.seed = row[1]
+            self.priority: Optional[List[str]] = json.loads(row[2]) if row[2] is not None else None
+            self.issued = row[3]
+            self.watermark = row[4]
+            self.report_watermark = row[5]
+            self.completed = {r[0] for r in self.conn.execute(
+                "SELECT position FROM run_completed WHERE run_id = ?", (run_id,))}
+            logger.info(f"Reanudando ejecución {run_id}: {self.watermark} candidatos terminados en orden, "
+                        f"{len(self.completed)} fuera de orden")
+        else:
+            self.seed = random.randrange(2 ** 31)
+            self.run_id = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{self.seed % 0x10000:04x}"
+            self.priority = None
+            self.issued = 0
+            self.watermark = 0
+            self.report_watermark = 0
+            with self.conn:
+                self.conn.execute("INSERT INTO scan_runs (run_id, params, seed, updated) VALUES (?, ?, ?, ?)",
+                                  (self.run_id, json.dumps(params, sort_keys=True), self.seed, datetime.now()))
+            logger.info(f"Ejecución {self.run_id}: si se interrumpe, reanúdala con --resume {self.run_id}")
+
+    def set_priority(self, buckets: List[str]) -> None:
+        """Guarda los candidatos prioritarios (p. ej. los del rastreo web) para no repetir el rastreo al reanudar."""
+        self.priority = buckets
+        self.writer.write("UPDATE scan_runs SET priority = ? WHERE run_id = ?", (json.dumps(buckets), self.run_id))
+
+    def set_report_watermark(self, revision: int) -> None:
+        """Guarda la última revisión volcada a los reportes parciales, para continuarlos al reanudar."""
+        self.report_watermark = revision
+        self.writer.write("UPDATE scan_runs SET report_watermark = ? WHERE run_id = ?", (revision, self.run_id))
+
+    def track(self, candidates: Iterator[str]) -> Iterator[str]:
+        """Numera los candidatos y omite los que ya se terminaron en la ejecución interrumpida."""
+        skipped = 0
+        for position, bucket in enumerate(candidates):
+            with self.lock:
+                self.issued = max(self.issued, position + 1)
+                if position < self.watermark or position in self.completed:
+                    skipped += 1
+                    continue
+                self.positions[bucket] = position
+            yield bucket
+        if skipped:
+            logger.info(f"Omitidos {skipped} candidatos ya escaneados en la ejecución {self.run_id}")
+
+    def done(self, bucket: str) -> None:
+        """Marca un candidato como terminado (sus resultados ya están encolados en el escritor)."""
+        with self.lock:
+            position = self.positions.pop(bucket, None)
+            if position is None:
+                return
+            self.completed.add(position)
+            self.unsaved.add(position)
+            while self.watermark in self.completed:
+                self.completed.discard(self.watermark)
+                self.watermark += 1
+
+    def save(self) -> None:
+        """Encola el progreso actual; se confirma en la misma transacción o después que los resultados previos."""
+        with self.lock:
+            pending = [(self.run_id, position) for position in self.unsaved if position >= self.watermark]
+            self.unsaved.clear()
+            issued, watermark = self.issued, self.watermark
+        self.writer.write_many("INSERT OR IGNORE INTO run_completed (run_id, position) VALUES (?, ?)", pending)
+        self.writer.write("DELETE FROM run_completed WHERE run_id = ? AND position < ?", (self.run_id, watermark))
+        self.writer.write("UPDATE scan_runs SET issued = ?, watermark = ?, updated = ? WHERE run_id = ?",
+                          (issued, watermark, datetime.now(), self.run_id))
+
+    def finish(self) -> None:
+        """Guarda el progreso final y marca la ejecución como completada."""
+        self.save()
+        self.writer.write("UPDATE scan_runs SET finished = 1 WHERE run_id = ?", (self.run_id,))
+
+    def download_queued(self, job: Dict) -> None:
+        """Registra una descarga encolada para reintentarla si la ejecución se interrumpe."""
+        self.writer.write(
+            "INSERT OR REPLACE INTO run_downloads (run_id, bucket, filename, region, size) VALUES (?, ?, ?, ?, ?)",
+            (self.run_id, job['bucket'], job['filename'], job['region'], job.get('size'))
+        )
+
+    def download_done(self, job: Dict) -> None:
+        """Elimina una descarga terminada de las pendientes."""
+        self.writer.write("DELETE FROM run_downloads WHERE run_id = ? AND bucket = ? AND filename = ?",
+                          (self.run_id, job['bucket'], job['filename']))
+
+    def pending_downloads(self) -> List[Dict]:
+        """Descargas que quedaron pendientes en la ejecución interrumpida."""
+        if not self.resumed:
+            return []
+        rows = self.conn.execute("SELECT bucket, filename, region, size FROM run_downloads WHERE run_id = ?",
+                                 (self.run_id,)).fetchall()
+        return [{'bucket': bucket, 'filename': filename, 'region': region, 'size': size}
+                for bucket, filename, region, size in rows]
+
+    def close(self) -> None:
+        """Cierra la conexión de lectura."""
+        self.conn.close()
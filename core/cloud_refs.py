@@ -0,0 +1,165 @@
+import re
+from functools import lru_cache
+from urllib.parse import unquote
+from typing import List, NamedTuple, Optional, Pattern, Set, Tuple
+from config import settings
+from core.scanner import bucket_url
+
+class CloudBucket(NamedTuple):
+    """Bucket (o cuenta de almacenamiento) referenciado en una página, con su proveedor y región si se conocen."""
+    provider: str
+    bucket: str
+    region: Optional[str]
+
+# Piezas comunes. Las barras pueden venir escapadas (https:\/\/...) dentro de cadenas JS o JSON
+SLASH = rb'\\?/'
+NAME = rb'[a-z0-9][a-z0-9.\-]{1,61}[a-z0-9]'
+PATH_NAME = rb'[a-z0-9][a-z0-9._\-]{1,61}[a-z0-9]'
+AWS_REGION = rb'[a-z]{2}(?:-gov)?-[a-z]+-\d'
+
+# Una sola expresión, sin IGNORECASE y anclada en '//': las alternativas por proveedor con el esquema opcional
+# delante obligaban al motor a probar cada una en cada posición del cuerpo y multiplicaban el coste.
+# El host se clasifica después en Python con expresiones pequeñas y ancladas.
+URL = (SLASH + SLASH + rb'(?:(?P<s3_uri>(?<=s3://))|(?P<gs_uri>(?<=gs://)))?'
+       rb'(?P<host>[A-Za-z0-9][A-Za-z0-9._\-]{0,252})(?::\d{1,5})?'
+       rb'(?:' + SLASH + rb'(?P<segment>[A-Za-z0-9][A-Za-z0-9._\-]{1,61}[A-Za-z0-9]))?'
+       # Query de una URL prefirmada SigV4: la región va en X-Amz-Credential=<clave>/<fecha>/<región>/s3/...
+       rb'(?:[^\s"\'<>]{0,1024}?[?&]X-Amz-Credential=[^\s"\'<>&]{0,128}?(?:%2F|/)\d{8}(?:%2F|/)'
+       rb'(?P<signed>' + AWS_REGION + rb')(?:%2F|/)s3)?')
+# Nombres sueltos en la configuración de bundles JS (SDK de AWS, Amplify): Bucket: "nombre", "s3_bucket": "nombre"
+JS_CONFIG = (rb'(?:[Bb]ucket|BUCKET)(?:_?[Nn]ame|_NAME)?["\']?\s*[:=]\s*["\'](?P<js_config>' + NAME + rb')["\']')
+
+S3_HOST = rb's3(?:[.\-](?:website|dualstack|accelerate))?(?:[.\-](?P<region>' + AWS_REGION + rb'))?\.amazonaws\.com(?:\.cn)?'
+# Hosts de almacenamiento: proveedor, expresión y si el bucket va en el host (grupo 'bucket') o en el primer segmento
+HOSTS: Tuple[Tuple[str, Pattern, Pattern], ...] = tuple(
+    (provider, re.compile(host + rb'$'), re.compile(name + rb'$')) for provider, host, name in (
+        ('s3', rb'(?P<bucket>' + NAME + rb')\.' + S3_HOST, NAME),
+        ('s3', S3_HOST, PATH_NAME),
+        ('gcs', rb'(?P<bucket>' + PATH_NAME + rb')\.storage\.googleapis\.com', PATH_NAME),
+        ('gcs', rb'storage\.(?:googleapis|cloud\.google)\.com', PATH_NAME),
+        ('azure', rb'(?P<bucket>[a-z0-9]{3,24})\.blob\.core\.windows\.net', NAME),
+        ('digitalocean', rb'(?P<bucket>' + NAME + rb')\.(?P<region>[a-z]{3}\d)\.digitaloceanspaces\.com', NAME),
+        ('digitalocean', rb'(?P<region>[a-z]{3}\d)\.digitaloceanspaces\.com', NAME),
+        ('aliyun', rb'(?P<bucket>' + NAME + rb')\.(?P<region>oss-[a-z0-9\-]+?)(?:-internal)?\.aliyuncs\.com', NAME),
+    )
+)
+# Filtro rápido antes de probar las expresiones de HOSTS
+STORAGE_SUFFIXES = (b'.amazonaws.com', b'.amazonaws.com.cn', b'.googleapis.com', b'storage.cloud.google.com',
+                    b'.windows.net', b'.digitaloceanspaces.com', b'.aliyuncs.com')
+URI_NAMES = {'s3_uri': ('s3', re.compile(NAME + rb'$')), 'gs_uri': ('gcs', re.compile(PATH_NAME + rb'$'))}
+
+# Solapamiento entre fragmentos: mayor que la coincidencia más larga posible (URL prefirmada incluida)
+OVERLAP = 4096
+
+@lru_cache(maxsize=8)
+def compile_engine(endpoint: str = '') -> Pattern:
+    """
+    Compila la expresión única con la que se recorre cada cuerpo una sola vez.
+
+    Con un endpoint compatible con S3 ('s3_endpoint') se antepone su forma en estilo path.
+    """
+    forms = [URL, JS_CONFIG]
+    if endpoint:
+        prefix = re.escape(endpoint.rstrip('/')).encode().replace(b'/', SLASH)
+        forms.insert(0, prefix + SLASH + rb'(?P<endpoint_path>[A-Za-z0-9][A-Za-z0-9._\-]{1,61}[A-Za-z0-9])')
+    return re.compile(b'|'.join(forms))
+
+def classify(match: 're.Match') -> Optional[CloudBucket]:
+    """Referencia a la que corresponde una coincidencia del motor, o None si el host no es de almacenamiento."""
+    host = match.group('host')
+    if host is None:
+        name = match.group('js_config') or match.group('endpoint_path')
+        return CloudBucket('s3', name.decode().lower(), None)
+    host = host.rstrip(b'.').lower()
+    # La mayoría de URLs de un bundle no son de almacenamiento: se descartan antes de mirar el resto de grupos
+    if not host.endswith(STORAGE_SUFFIXES):
+        for uri, (provider, name) in URI_NAMES.items():
+            if match.group(uri) is not None:
+                return CloudBucket(provider, host.decode(), None) if name.match(host) else None
+        return None
+    segment = (match.group('segment') or b'').lower()
+    for provider, pattern, name in HOSTS:
+        found = pattern.match(host)
+        if not found:
+            continue
+        bucket = found.groupdict().get('bucket') or (segment if name.match(segment) else None)
+        if not bucket:
+            return None
+        region = found.groupdict().get('region') or (match.group('signed') if provider == 's3' else None)
+        return CloudBucket(provider, unquote(bucket.decode('ascii', 'replace')),
+                           region.decode().lower() if region else None)
+    return None
+
+class CloudRefExtractor:
+    def __init__(self):
+        """
+        Extractor incremental de buckets referenciados en HTML, JS o CSS.
+
+        Reconoce URLs virtual-hosted y estilo path de S3 (también prefirmadas, de donde toma la región),
+        URIs s3:// y gs://, GCS, Azure Blob, DigitalOcean Spaces, Alibaba OSS y nombres de bucket en la
+        configuración de bundles JS. El cuerpo se recorre por fragmentos con una sola expresión compilada
+        y entre fragmentos solo se conservan unos pocos KB (como mucho 2 * OVERLAP más el último fragmento),
+        así que un bundle de varios MB nunca se carga entero.
+        """
+        self.pattern = compile_engine(settings.SETTINGS.get('s3_endpoint', ''))
+        self.buffer = b''
+        self.seen: Set[Tuple[str, str]] = set()
+
+    def _scan(self, final: bool) -> List[CloudBucket]:
+        # Solo se aceptan coincidencias que empiezan antes del margen: las demás podrían continuar en el siguiente fragmento
+        limit = len(self.buffer) if final else len(self.buffer) - OVERLAP
+        resume = limit
+        position = 0
+        found: List[CloudBucket] = []
+        while True:
+            match = self.pattern.search(self.buffer, position)
+            if not match or match.start() >= limit:
+                break
+            ref = classify(match)
+            # Si el host no es de almacenamiento se sigue tras él: la query podría contener otra URL que sí lo sea
+            position = match.end() if ref else match.end('host')
+            resume = max(resume, position)
+            if ref and (ref.provider, ref.bucket) not in self.seen:
+                self.seen.add((ref.provider, ref.bucket))
+                found.append(ref)
+        self.buffer = self.buffer[resume:]
+        return found
+
+    def feed(self, chunk: bytes) -> List[CloudBucket]:
+        """Procesa un fragmento y devuelve los buckets nuevos cuya referencia ya está completa."""
+        self.buffer += chunk
+        # Se espera a tener al menos OVERLAP bytes nuevos: con fragmentos pequeños no se recorre el margen una y otra vez
+        if len(self.buffer) < 2 * OVERLAP:
+            return []
+        return self._scan(final=False)
+
+    def close(self) -> List[CloudBucket]:
+        """Procesa lo que queda en el búfer al terminar el cuerpo."""
+        return self._scan(final=True)
+
+def extract_cloud_refs(body: bytes) -> List[CloudBucket]:
+    """Buckets referenciados en un cuerpo completo, sin duplicados y en orden de aparición."""
+    extractor = CloudRefExtractor()
+    return extractor.feed(body) + extractor.close()
+
+def parse_cloud_url(url: str) -> Optional[CloudBucket]:
+    """
+    Bucket al que apunta una URL de almacenamiento en la nube (virtual-hosted, estilo path, s3:// o gs://).
+
+    Returns:
+        Optional[CloudBucket]: Referencia normalizada (nombre en minúsculas), o None si la URL no es de un proveedor conocido.
+    """
+    refs = extract_cloud_refs(url.strip().encode('utf-8', 'replace'))
+    return refs[0] if refs else None
+
+def bucket_root(ref: CloudBucket) -> str:
+    """URL de la raíz del bucket, usada para comprobar que existe."""
+    if ref.provider == 's3':
+        return bucket_url(ref.bucket, ref.region)
+    if ref.provider == 'gcs':
+        return f"https://storage.googleapis.com/{ref.bucket}"
+    if ref.provider == 'azure':
+        return f"https://{ref.bucket}.blob.core.windows.net/"
+    if ref.provider == 'digitalocean':
+        return f"https://{ref.bucket}.{ref.region}.digitaloceanspaces.com/"
+    return f"https://{ref.bucket}.{ref.region}.aliyuncs.com/"
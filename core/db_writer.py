@@ -0,0 +1,173 @@
+import asyncio
+import queue
+import sqlite3
+import threading
+import time
+import logging
+from typing import Any, Dict, Iterable, Optional, Sequence
+from core import metrics
+
+logger = logging.getLogger('S3Hunter-X')
+
+_STOP = object()
+
+class DBWriter:
+    def __init__(self, db_path: str, batch_size: int = 2000, flush_interval: float = 1.0,
+                 pragmas: Optional[Dict[str, Any]] = None, queue_size: int = 10000, retries: int = 3):
+        """
+        Escritor SQLite en un hilo dedicado que agrupa las escrituras en transacciones grandes.
+
+        Las corrutinas solo encolan sentencias y nunca esperan al disco; el hilo confirma la transacción
+        cuando acumula `batch_size` filas o cuando pasan `flush_interval` segundos desde el último commit.
+        Si un lote falla se reintenta y, si sigue fallando, se confirma sentencia a sentencia (y fila a
+        fila), de modo que una fila defectuosa solo se pierde a sí misma.
+
+        Args:
+            db_path (str): Ruta de la base de datos SQLite (ya inicializada con init_db).
+            batch_size (int): Filas máximas por transacción.
+            flush_interval (float): Segundos máximos que una escritura espera a ser confirmada.
+            pragmas (Dict[str, Any], optional): PRAGMAs aplicados a la conexión del escritor.
+            queue_size (int): Sentencias en espera como máximo; con la cola llena, write() se bloquea.
+            retries (int): Intentos de un lote ante bloqueos de la base de datos (SQLITE_BUSY/LOCKED).
+        """
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.pragmas = pragmas or {}
+        self.retries = retries
+        self.queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.written = 0
+        self.errors = 0
+        self.failure: Optional[BaseException] = None
+        metrics.REGISTRY.gauge_callback('db_writer_queue_depth', self.queue.qsize)
+        self.thread = threading.Thread(target=self._run, name='db-writer', daemon=True)
+        self.thread.start()
+
+    def _check_alive(self) -> None:
+        if not self.thread.is_alive():
+            raise sqlite3.OperationalError(f"El escritor de base de datos no está activo: {self.failure or 'detenido'}")
+
+    def write(self, sql: str, params: Sequence = ()) -> None:
+        """Encola una sentencia con sus parámetros."""
+        self._check_alive()
+        self.queue.put((sql, [params]))
+
+    def write_many(self, sql: str, rows: Iterable[Sequence]) -> None:
+        """Encola una sentencia para varias filas."""
+        rows = list(rows)
+        if rows:
+            self._check_alive()
+            self.queue.put((sql, rows))
+
+    async def drain(self) -> None:
+        """Espera, sin bloquear el bucle de eventos, a que se confirme todo lo encolado hasta ahora."""
+        self._check_alive()
+        done = threading.Event()
+        self.queue.put(done)
+        # Se comprueba periódicamente que el hilo sigue vivo: si muere, nadie marcaría el evento
+        while not await asyncio.to_thread(done.wait, 1.0):
+            self._check_alive()
+
+    def close(self) -> None:
+        """Confirma lo pendiente y detiene el hilo escritor."""
+        if self.thread.is_alive():
+            self.queue.put(_STOP)
+            self.thread.join()
+        logger.info(f"Escritor de base de datos cerrado ({self.written} filas escritas, {self.errors} errores)")
+
+    def _connect(self, attempts: int = 3) -> sqlite3.Connection:
+        for attempt in range(1, attempts + 1):
+            # Espera generosa ante bloqueos: en modo distribuido varios procesos escriben en la misma base de datos
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            try:
+                for name, value in self.pragmas.items():
+                    conn.execute(f"PRAGMA {name}={value}")
+                return conn
+            except sqlite3.OperationalError as e:
+                conn.close()
+                if attempt == attempts:
+                    raise
+                logger.warning(f"No se pudo preparar la conexión del escritor (intento {attempt}): {e}")
+                time.sleep(attempt)
+
+    @staticmethod
+    def _transient(error: sqlite3.Error) -> bool:
+        """Indica si el error es un bloqueo pasajero de la base de datos y merece repetir el lote."""
+        return isinstance(error, sqlite3.OperationalError) and ('locked' in str(error) or 'busy' in str(error))
+
+    def _commit(self, conn: sqlite3.Connection, batch: list) -> None:
+        rows = sum(len(params) for _, params in batch)
+        for attempt in range(1, self.retries + 1):
+            try:
+                with metrics.timed('db_flush_seconds'), conn:
+                    for sql, params in batch:
+                        conn.executemany(sql, params)
+                self.written += rows
+                metrics.inc('db_rows_written_total', rows)
+                return
+            except sqlite3.Error as e:
+                if not self._transient(e) or attempt == self.retries:
+                    logger.warning(f"Falló el lote de {rows} filas ({e}), se escribe sentencia a sentencia")
+                    break
+                logger.warning(f"Base de datos bloqueada al escribir {rows} filas (intento {attempt}): {e}")
+                time.sleep(attempt)
+        self._commit_one_by_one(conn, batch)
+
+    def _execute(self, conn: sqlite3.Connection, sql: str, rows: list) -> Optional[sqlite3.Error]:
+        """Confirma una sentencia en su propia transacción; devuelve el error si falla."""
+        try:
+            with conn:
+                conn.executemany(sql, rows)
+        except sqlite3.Error as e:
+            return e
+        self.written += len(rows)
+        metrics.inc('db_rows_written_total', len(rows))
+        return None
+
+    def _commit_one_by_one(self, conn: sqlite3.Connection, batch: list) -> None:
+        """Confirma cada sentencia por separado y, si falla, cada una de sus filas: solo se pierde lo defectuoso."""
+        for sql, params in batch:
+            if len(params) > 1 and not self._execute(conn, sql, params):
+                continue
+            for row in params:
+                error = self._execute(conn, sql, [row])
+                if error:
+                    self.errors += 1
+                    metrics.inc('db_errors_total')
+                    logger.error(f"Fila descartada al escribir en la base de datos ({error}): {' '.join(sql.split()[:4])} {row}")
+
+    def _run(self) -> None:
+        try:
+            conn = self._connect()
+        except sqlite3.Error as e:
+            self.failure = e
+            logger.error(f"El escritor de base de datos no pudo abrir {self.db_path}: {e}")
+            return
+        batch = []
+        rows = 0
+        deadline = time.monotonic() + self.flush_interval
+        try:
+            while True:
+                try:
+                    item = self.queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    item = None
+                if isinstance(item, tuple):
+                    batch.append(item)
+                    rows += len(item[1])
+                    if rows < self.batch_size and time.monotonic() < deadline:
+                        continue
+                # Lote lleno, intervalo vencido, petición de drain o parada: se confirma todo en una transacción
+                if batch:
+                    self._commit(conn, batch)
+                    batch, rows = [], 0
+                deadline = time.monotonic() + self.flush_interval
+                if isinstance(item, threading.Event):
+                    item.set()
+                elif item is _STOP:
+                    break
+        except Exception as e:
+            self.failure = e
+            logger.error(f"El escritor de base de datos se detuvo por un error inesperado: {e}")
+        finally:
+            conn.close()
@@ -0,0 +1,170 @@
+import asyncio
+import re
+import time
+import logging
+import dns.asyncresolver
+import dns.exception
+import dns.resolver
+from typing import Dict, Iterable, List, Optional, Tuple
+from config import settings
+from core import metrics
+
+logger = logging.getLogger('S3Hunter-X')
+
+# Saltos CNAME que se siguen como máximo (los resolvers recursivos devuelven la cadena completa)
+MAX_CHAIN = 8
+
+# Destino CNAME con el bucket en el nombre: <bucket>.s3[.-]<región>.amazonaws.com, s3-website, dualstack...
+S3_BUCKET_HOST = re.compile(
+    r'^(?P<bucket>[a-z0-9][a-z0-9.-]*?)\.s3(?:-website)?(?:[.-][a-z0-9-]+)*\.amazonaws\.com(?:\.cn)?$'
+)
+# Destino CNAME que es solo el endpoint: el bucket debe llamarse como el subdominio (sitios estáticos y estilo path)
+S3_ENDPOINT_HOST = re.compile(r'^s3(?:-website)?(?:[.-][a-z0-9-]+)*\.amazonaws\.com(?:\.cn)?$')
+# Otros almacenamientos y CDNs delante de buckets: el subdominio es el mejor candidato a nombre de bucket
+STORAGE_HOST = re.compile(
+    r'(?:\.cloudfront\.net|(?:^|\.)storage\.googleapis\.com|\.blob\.core\.windows\.net'
+    r'|\.digitaloceanspaces\.com|\.r2\.cloudflarestorage\.com|\.wasabisys\.com)$'
+)
+
+def storage_buckets(hostname: str, chain: List[str]) -> List[str]:
+    """
+    Candidatos a bucket deducidos de la cadena CNAME de un subdominio.
+
+    Args:
+        hostname (str): Subdominio consultado.
+        chain (List[str]): Destinos CNAME en orden, sin punto final.
+
+    Returns:
+        List[str]: Buckets candidatos (vacío si la cadena no llega a un almacenamiento conocido).
+    """
+    candidates: List[str] = []
+    for target in chain:
+        match = S3_BUCKET_HOST.match(target)
+        if match:
+            candidates.append(match.group('bucket'))
+        elif S3_ENDPOINT_HOST.match(target) or STORAGE_HOST.search(target):
+            candidates.extend([hostname, hostname.replace('.', '-')])
+    return list(dict.fromkeys(candidates))
+
+class DNSResolver:
+    def __init__(self, nameservers: Optional[List[str]] = None, port: int = 53, concurrency: Optional[int] = None,
+                 timeout: Optional[float] = None, max_ttl: Optional[int] = None, negative_ttl: Optional[int] = None):
+        """
+        Resolver asíncrono de cadenas CNAME con consultas en paralelo acotadas y caché con TTL.
+
+        Usa dns.asyncresolver, así que miles de subdominios se resuelven sin bloquear el bucle de eventos.
+        Las respuestas se guardan el TTL mínimo de la cadena (con `max_ttl` como techo) y las negativas
+        (NXDOMAIN, timeout) durante `negative_ttl`; las consultas simultáneas al mismo nombre se comparten.
+
+        Args:
+            nameservers (List[str], optional): Servidores DNS; None = los del sistema (/etc/resolv.conf).
+            port (int): Puerto de los servidores indicados.
+            concurrency (int, optional): Consultas simultáneas como máximo (por defecto 'dns_concurrency').
+            timeout (float, optional): Tiempo máximo por nombre en segundos (por defecto 'dns_timeout').
+            max_ttl (int, optional): Techo del TTL de la caché (por defecto 'dns_cache_ttl').
+            negative_ttl (int, optional): Vigencia de las respuestas negativas (por defecto 'dns_negative_ttl').
+        """
+        self.resolver = dns.asyncresolver.Resolver(configure=not nameservers)
+        if nameservers:
+            self.resolver.nameservers = nameservers
+            self.resolver.port = port
+        self.resolver.lifetime = timeout or settings.SETTINGS['dns_timeout']
+        self.concurrency = concurrency or settings.SETTINGS['dns_concurrency']
+        self.semaphore = asyncio.Semaphore(self.concurrency)
+        self.max_ttl = max_ttl if max_ttl is not None else settings.SETTINGS['dns_cache_ttl']
+        self.negative_ttl = negative_ttl if negative_ttl is not None else settings.SETTINGS['dns_negative_ttl']
+        self.cache: Dict[str, Tuple[float, List[str]]] = {}
+        self.inflight: Dict[str, asyncio.Future] = {}
+
+    @staticmethod
+    def _chain(response: 'dns.message.Message') -> Tuple[List[str], Optional[int]]:
+        """Destinos CNAME de una respuesta y su TTL mínimo."""
+        result = response.resolve_chaining()
+        chain = [rrset[0].target.to_text().rstrip('.').lower() for rrset in result.cnames][:MAX_CHAIN]
+        return chain, result.minimum_ttl
+
+    async def _query(self, name: str) -> Tuple[List[str], float]:
+        async with self.semaphore:
+            try:
+                answer = await self.resolver.resolve(name, 'A', raise_on_no_answer=False, search=False)
+                chain, ttl = self._chain(answer.response)
+                metrics.inc('dns_queries_total', result='ok')
+                return chain, min(ttl if ttl is not None else self.max_ttl, self.max_ttl)
+            except dns.resolver.NXDOMAIN as e:
+                # Un CNAME colgante (destino inexistente) sigue siendo útil: la respuesta conserva la cadena
+                metrics.inc('dns_queries_total', result='nxdomain')
+                response = next(iter((e.kwargs.get('responses') or {}).values()), None)
+                chain = self._chain(response)[0] if response is not None else []
+                return chain, self.negative_ttl
+            except (dns.exception.DNSException, OSError) as e:
+                metrics.inc('dns_queries_total', result='error')
+                logger.debug(f"Fallo al resolver {name}: {e}")
+                return [], self.negative_ttl
+
+    async def cname_chain(self, name: str) -> List[str]:
+        """Cadena CNAME de un nombre (vacía si no tiene o no resuelve), servida desde la caché si sigue vigente."""
+        name = name.rstrip('.').lower()
+        cached = self.cache.get(name)
+        if cached and cached[0] > time.monotonic():
+            metrics.inc('dns_cache_hits_total')
+            return cached[1]
+        if name in self.inflight:
+            return await asyncio.shield(self.inflight[name])
+        future = asyncio.get_running_loop().create_future()
+        self.inflight[name] = future
+        try:
+            chain, ttl = await self._query(name)
+            self.cache[name] = (time.monotonic() + ttl, chain)
+            future.set_result(chain)
+            return chain
+        except BaseException:
+            future.cancel()
+            raise
+        finally:
+            del self.inflight[name]
+
+    async def resolve_many(self, names: Iterable[str]) -> Dict[str, List[str]]:
+        """
+        Resuelve en bloque las cadenas CNAME de muchos nombres.
+
+        Un pool fijo de tareas (tantas como consultas simultáneas admitidas) va tomando los nombres
+        pendientes, así que no se crea una corrutina por subdominio.
+
+        Returns:
+            Dict[str, List[str]]: Cadena CNAME de cada nombre, en el orden de entrada.
+        """
+        names = list(dict.fromkeys(name.rstrip('.').lower() for name in names if name.strip()))
+        chains: Dict[str, List[str]] = dict.fromkeys(names)
+        pending = iter(names)
+
+        async def worker() -> None:
+            for name in pending:
+                chains[name] = await self.cname_chain(name)
+
+        workers = min(len(names), self.concurrency)
+        await asyncio.gather(*(worker() for _ in range(workers)))
+        return chains
+
+async def find_storage_buckets(hostnames: Iterable[str], resolver: Optional[DNSResolver] = None) -> List[str]:
+    """
+    Resuelve subdominios en bloque y devuelve los buckets deducidos de los CNAME que apuntan a almacenamiento.
+
+    Args:
+        hostnames (Iterable[str]): Subdominios a resolver.
+        resolver (DNSResolver, optional): Resolver a usar; por defecto uno con los servidores de 'dns_nameservers'.
+
+    Returns:
+        List[str]: Buckets candidatos, sin duplicados y en el orden de los subdominios.
+    """
+    resolver = resolver or DNSResolver(settings.SETTINGS['dns_nameservers'] or None)
+    started = time.perf_counter()
+    chains = await resolver.resolve_many(hostnames)
+    buckets: List[str] = []
+    for hostname, chain in chains.items():
+        found = storage_buckets(hostname, chain)
+        if found:
+            logger.info(f"CNAME de almacenamiento: {hostname} -> {' -> '.join(chain)}")
+            buckets.extend(found)
+    logger.info(f"Resueltos {len(chains)} subdominios en {time.perf_counter() - started:.1f}s: "
+                f"{len(buckets)} candidatos por CNAME de almacenamiento")
+    return list(dict.fromkeys(buckets))
@@ -1,52 +1,185 @@
 import aiohttp
+import asyncio
 import os
 import re
 import time
-from typing import Tuple, Optional
+from typing import Tuple, Optional, Dict, List, Callable, Awaitable
 from config import settings
+from core import http_client, metrics
+from core.scanner import bucket_url
 import logging
-from tenacity import retry, stop_after_attempt, wait_exponential
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_exponential
 
 logger = logging.getLogger('S3Hunter-X')
 
-@retry(stop=stop_after_attempt(5), wait=wait_exponential(multiplier=2, min=5, max=120))
+# Fallos transitorios que justifican repetir la descarga (red, timeout, 5xx de S3 como SlowDown)
+RETRYABLE = (aiohttp.ClientError, asyncio.TimeoutError)
+
+@retry(retry=retry_if_exception_type(RETRYABLE), stop=stop_after_attempt(3),
+       wait=wait_exponential(multiplier=1, min=1, max=10), reraise=True)
 async def download_file(bucket: str, filename: str, analyzer: 'Analyzer', region: str) -> Tuple[Optional[str], Optional[str]]:
-    """Descarga un archivo desde un bucket S3 y analiza su contenido."""
-    url = f"https://{bucket}.s3.{region}.amazonaws.com/{filename}"
+    """
+    Descarga un archivo desde un bucket S3 analizando su contenido en vuelo.
+
+    El contenido se analiza fragmento a fragmento mientras llega. Solo se conserva en disco si resulta
+    de alto riesgo y 'save_flagged_files' está activo; si no se guarda, la descarga se corta en el
+    primer hallazgo. Los fallos transitorios (RETRYABLE) se propagan para que @retry repita la descarga
+    desde el principio; agotados los intentos la excepción llega a quien llama.
+
+    Returns:
+        Tuple[Optional[str], Optional[str]]: Ruta local (None si no se conservó) y riesgo del contenido.
+    """
+    url = f"{bucket_url(bucket, region)}/{filename}"
+    save_flagged = settings.SETTINGS.get('save_flagged_files', False)
     download_dir = 'data/downloads'
-    os.makedirs(download_dir, exist_ok=True)
     base, ext = os.path.splitext(filename.replace('/', '_'))
     local_path = os.path.join(download_dir, f"{bucket}_{base}{ext}")
     if os.path.exists(local_path):
         local_path = os.path.join(download_dir, f"{bucket}_{base}_{int(time.time())}{ext}")
+    part_path = f"{local_path}.part"
     
+    started = time.perf_counter()
+    outcome = 'error'
+    # Tiempo de CPU del análisis de contenido, sin la espera de red entre fragmentos
+    analysis_seconds = None
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, timeout=settings.SETTINGS['request_timeout']) as response:
-                if response.status == 200:
-                    content_type = response.headers.get('Content-Type', '')
-                    content_length = int(response.headers.get('Content-Length', 0))
-                    max_size_bytes = settings.SETTINGS['max_file_size_mb'] * 1024 * 1024
-                    if content_length > max_size_bytes:
-                        logger.warning(f"Archivo {url} excede el tamaño máximo ({settings.SETTINGS['max_file_size_mb']} MB)")
-                        return None, None
-                    downloaded_bytes = 0
-                    with open(local_path, 'wb' if 'text' not in content_type else 'w', encoding='utf-8' if 'text' in content_type else None) as f:
-                        async for chunk in response.content.iter_chunked(1024 * 1024):
-                            downloaded_bytes += len(chunk)
-                            if downloaded_bytes > max_size_bytes:
-                                logger.warning(f"Archivo {url} excede el tamaño máximo durante la descarga")
-                                return None, None
-                            f.write(chunk.decode('utf-8', errors='ignore') if 'text' in content_type else chunk)
-                    content_risk = analyzer.analyze_content(local_path)
-                    logger.info(f"Archivo descargado: {local_path}, Riesgo: {content_risk}")
-                    return local_path, content_risk
-                else:
-                    logger.debug(f"Error al descargar {url}: Status {response.status}")
+        session = http_client.get_session('s3')
+        async with session.get(url, timeout=settings.SETTINGS['request_timeout']) as response:
+            metrics.inc('downloads_total', status=response.status)
+            if response.status >= 500:
+                raise aiohttp.ClientResponseError(response.request_info, response.history, status=response.status)
+            if response.status == 200:
+                content_length = int(response.headers.get('Content-Length', 0))
+                max_size_bytes = settings.SETTINGS['max_file_size_mb'] * 1024 * 1024
+                if content_length > max_size_bytes:
+                    logger.warning(f"Archivo {url} excede el tamaño máximo ({settings.SETTINGS['max_file_size_mb']} MB)")
+                    outcome = 'oversize'
                     return None, None
+                scanner = analyzer.content_scanner()
+                analysis_seconds = 0.0
+                downloaded_bytes = 0
+                f = None
+                if save_flagged:
+                    os.makedirs(download_dir, exist_ok=True)
+                    f = open(part_path, 'wb')
+                try:
+                    async for chunk in response.content.iter_chunked(1024 * 1024):
+                        downloaded_bytes += len(chunk)
+                        metrics.inc('download_bytes_total', len(chunk))
+                        if downloaded_bytes > max_size_bytes:
+                            logger.warning(f"Archivo {url} excede el tamaño máximo durante la descarga")
+                            outcome = 'oversize'
+                            # Un hallazgo en los bytes ya analizados sigue siendo válido
+                            return None, scanner.risk
+                        if f:
+                            f.write(chunk)
+                        scan_started = time.perf_counter()
+                        found = scanner.feed(chunk)
+                        analysis_seconds += time.perf_counter() - scan_started
+                        if found and not f:
+                            break
+                    else:
+                        scan_started = time.perf_counter()
+                        scanner.finish()
+                        analysis_seconds += time.perf_counter() - scan_started
+                finally:
+                    if f:
+                        f.close()
+                content_risk = scanner.risk
+                outcome = content_risk
+                if f and content_risk == 'HIGH':
+                    os.replace(part_path, local_path)
+                    logger.info(f"Archivo descargado: {local_path}, Riesgo: {content_risk} ({scanner.pattern})")
+                    return local_path, content_risk
+                logger.info(f"Archivo analizado en vuelo: {url}, Riesgo: {content_risk} ({downloaded_bytes} bytes)")
+                return None, content_risk
+            else:
+                logger.debug(f"Error al descargar {url}: Status {response.status}")
+                return None, None
+    except RETRYABLE as e:
+        logger.warning(f"Fallo transitorio al descargar {url}: {e!r}")
+        raise
     except Exception as e:
         logger.error(f"Error al descargar {url}: {e}")
         return None, None
+    finally:
+        metrics.observe('download_seconds', time.perf_counter() - started, result=outcome)
+        if analysis_seconds is not None:
+            metrics.observe('analysis_seconds', analysis_seconds, stage='content')
+        if os.path.exists(part_path):
+            os.remove(part_path)
+
+class DownloadPool:
+    def __init__(self, analyzer: 'Analyzer', on_result: Callable[[Dict, Optional[str], Optional[str]], Awaitable[None]],
+                 workers: int = 4, queue_size: int = 100, byte_budget_mb: float = 1024):
+        """
+        Pool de workers de descarga y análisis desacoplado del bucle de escaneo.
+
+        Args:
+            analyzer (Analyzer): Analizador compartido para el contenido.
+            on_result (Callable): Corrutina llamada con (job, local_path, content_risk) al terminar cada descarga.
+            workers (int): Número de descargas concurrentes.
+            queue_size (int): Trabajos en espera antes de bloquear a quien envía (backpressure).
+            byte_budget_mb (float): Presupuesto total de descarga de la ejecución; 0 = sin límite.
+        """
+        self.analyzer = analyzer
+        self.on_result = on_result
+        self.workers = workers
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.byte_budget = byte_budget_mb * 1024 * 1024
+        self.reserved_bytes = 0
+        self.skipped = 0
+        self.tasks: List[asyncio.Task] = []
+
+    def start(self) -> None:
+        """Arranca los workers en el bucle de eventos actual."""
+        self.tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        metrics.REGISTRY.gauge_callback('download_queue_depth', self.queue.qsize)
+        logger.info(f"Pool de descargas iniciado con {self.workers} workers")
+
+    async def submit(self, job: Dict) -> bool:
+        """
+        Encola un archivo para descargar; espera si la cola está llena.
+
+        Args:
+            job (Dict): Debe incluir 'bucket', 'filename' y 'region'; 'size' (bytes) se usa para el presupuesto.
+
+        Returns:
+            bool: False si el archivo se descarta por agotar el presupuesto de bytes.
+        """
+        size = job.get('size') or 0
+        if self.byte_budget and self.reserved_bytes + size > self.byte_budget:
+            self.skipped += 1
+            logger.warning(f"Presupuesto de descarga agotado, se omite {job['bucket']}/{job['filename']}")
+            return False
+        self.reserved_bytes += size
+        await self.queue.put(job)
+        return True
+
+    async def _worker(self, worker_id: int) -> None:
+        """Consume trabajos de la cola hasta ser cancelado."""
+        while True:
+            job = await self.queue.get()
+            try:
+                local_path, content_risk = await download_file(job['bucket'], job['filename'], self.analyzer, job['region'])
+                await self.on_result(job, local_path, content_risk)
+            except Exception as e:
+                logger.error(f"Worker de descarga {worker_id} falló con {job['bucket']}/{job['filename']}: {e}")
+            finally:
+                self.queue.task_done()
+
+    async def join(self) -> None:
+        """Espera a que se procesen todos los trabajos encolados."""
+        await self.queue.join()
+
+    async def close(self) -> None:
+        """Detiene los workers; los trabajos pendientes se descartan."""
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+        if self.skipped:
+            logger.info(f"{self.skipped} descargas omitidas por el presupuesto de bytes")
 
 @retry(stop=stop_after_attempt(5), wait=wait_exponential(multiplier=2, min=5, max=120))
 async def send_telegram_notification(message: str, token: str, chat_id: str) -> bool:
@@ -67,18 +200,18 @@ async def send_telegram_notification(message: str, token: str, chat_id: str) ->
         'parse_mode': 'Markdown'
     }
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.post(url, json=payload, timeout=10) as response:
-                if response.status == 200:
-                    logger.info("Notificación de Telegram enviada exitosamente")
-                    return True
-                elif response.status == 429:
-                    logger.warning("Límite de tasa de Telegram alcanzado, esperando...")
-                    raise aiohttp.ClientError("Rate limit")
-                else:
-                    response_text = await response.text()
-                    logger.error(f"Error al enviar notificación de Telegram: Status {response.status}, Respuesta: {response_text}")
-                    return False
+        session = http_client.get_session('api')
+        async with session.post(url, json=payload, timeout=10) as response:
+            if response.status == 200:
+                logger.info("Notificación de Telegram enviada exitosamente")
+                return True
+            elif response.status == 429:
+                logger.warning("Límite de tasa de Telegram alcanzado, esperando...")
+                raise aiohttp.ClientError("Rate limit")
+            else:
+                response_text = await response.text()
+                logger.error(f"Error al enviar notificación de Telegram: Status {response.status}, Respuesta: {response_text}")
+                return False
     except Exception as e:
         logger.error(f"Error al enviar notificación de Telegram: {e}")
         return False
\ No newline at end of file
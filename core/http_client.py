@@ -0,0 +1,48 @@
+import aiohttp
+import logging
+from typing import Dict
+from config import settings
+
+logger = logging.getLogger('S3Hunter-X')
+
+# Sesiones compartidas por perfil (s3, api, crawler); cada una con su propio pool de conexiones
+_sessions: Dict[str, aiohttp.ClientSession] = {}
+
+def get_session(profile: str = 's3', **overrides) -> aiohttp.ClientSession:
+    """
+    Devuelve la sesión HTTP compartida de un perfil, creándola en el primer uso.
+
+    Todas las sesiones usan keep-alive y caché DNS; los límites por perfil y por host
+    se leen de settings.SETTINGS['http_pools'].
+
+    Args:
+        profile (str): Perfil del pool ('s3', 'api' o 'crawler').
+        **overrides: Valores que sustituyen la configuración del perfil al crear la sesión.
+
+    Returns:
+        aiohttp.ClientSession: Sesión reutilizable; debe cerrarse con close_sessions().
+    """
+    session = _sessions.get(profile)
+    if session is not None and not session.closed:
+        return session
+    pool = dict(settings.SETTINGS['http_pools'].get(profile, settings.SETTINGS['http_pools']['s3']))
+    pool.update(overrides)
+    connector = aiohttp.TCPConnector(
+        limit=pool.get('limit', 100),
+        limit_per_host=pool.get('limit_per_host', 0),
+        keepalive_timeout=pool.get('keepalive_timeout', 30),
+        use_dns_cache=True,
+        ttl_dns_cache=settings.SETTINGS['dns_cache_ttl']
+    )
+    session = aiohttp.ClientSession(connector=connector)
+    _sessions[profile] = session
+    logger.debug(f"Pool HTTP '{profile}' creado: {pool}")
+    return session
+
+async def close_sessions() -> None:
+    """Cierra todas las sesiones compartidas."""
+    for profile, session in list(_sessions.items()):
+        if not session.closed:
+            await session.close()
+            logger.info(f"Sesión HTTP '{profile}' cerrada")
+    _sessions.clear()
@@ -0,0 +1,99 @@
+import re
+import logging
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger('S3Hunter-X')
+
+# Patrones compuestos solo por caracteres simples (el punto se trata como comodín, igual que en re)
+SIMPLE_PATTERN = re.compile(r'^[^*+?{}()\[\]|^$\\]{1,200}$')
+
+def build_trie_regex(patterns: List[str]) -> str:
+    """Construye una única alternancia en forma de trie a partir de patrones simples en minúsculas."""
+    trie: Dict = {}
+    for pattern in patterns:
+        node = trie
+        for char in pattern:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def render(node: Dict) -> str:
+        terminal = '' in node
+        branches = [('.' if char == '.' else re.escape(char)) + render(child)
+                    for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+        if terminal:
+            # Opcional y codicioso: se prefiere la coincidencia más larga, como un autómata Aho-Corasick
+            return f"(?:{body})?"
+        return body
+
+    return render(trie)
+
+class PatternMatcher:
+    def __init__(self, patterns: List[str]):
+        """
+        Compila una sola vez todos los patrones de riesgo.
+
+        Los patrones simples se combinan en una alternancia con forma de trie que recorre el texto
+        en una sola pasada; el resto (cuantificadores, anclas, grupos) se precompila individualmente.
+
+        Args:
+            patterns (List[str]): Patrones en sintaxis de expresiones regulares (sin distinción de mayúsculas).
+        """
+        self.patterns = list(dict.fromkeys(p for p in patterns if p))
+        self.literals: Dict[str, str] = {}
+        self.wildcards_by_length: Dict[int, List[Tuple[re.Pattern, str]]] = {}
+        self.complex: List[Tuple[re.Pattern, str]] = []
+        for pattern in self.patterns:
+            if SIMPLE_PATTERN.match(pattern):
+                self.literals.setdefault(pattern.lower(), pattern)
+                if '.' in pattern:
+                    self.wildcards_by_length.setdefault(len(pattern), []).append(
+                        (re.compile(re.escape(pattern).replace(r'\.', '.'), re.IGNORECASE), pattern))
+            else:
+                try:
+                    self.complex.append((re.compile(pattern, re.IGNORECASE), pattern))
+                except re.error as e:
+                    logger.warning(f"Patrón inválido ignorado: {pattern} ({e})")
+        self.simple_regex = re.compile(build_trie_regex(list(self.literals)), re.IGNORECASE) if self.literals else None
+        logger.debug(f"Matcher compilado: {len(self.literals)} patrones simples, {len(self.complex)} complejos")
+
+    def __len__(self) -> int:
+        return len(self.patterns)
+
+    def _pattern_for(self, matched: str) -> str:
+        """Identifica qué patrón simple produjo el texto coincidente."""
+        pattern = self.literals.get(matched.lower())
+        if pattern:
+            return pattern
+        for regex, pattern in self.wildcards_by_length.get(len(matched), []):
+            if regex.fullmatch(matched):
+                return pattern
+        return matched
+
+    def search(self, text: str, pos: int = 0, open_end: bool = False) -> Optional[str]:
+        """
+        Devuelve el primer patrón que coincide con el texto a partir de `pos`, o None.
+
+        Con `open_end` el texto es una ventana que continúa en el siguiente fragmento: los patrones
+        complejos se buscan con un centinela al final, así '$' no coincide con el corte de la ventana.
+        """
+        if self.simple_regex:
+            match = self.simple_regex.search(text, pos)
+            if match:
+                return self._pattern_for(match.group(0))
+        if self.complex and open_end:
+            text += '\x00'
+        for regex, pattern in self.complex:
+            if regex.search(text, pos):
+                return pattern
+        return None
+
+    def find_all(self, text: str) -> List[str]:
+        """Devuelve todos los patrones distintos que coinciden con el texto."""
+        found = []
+        if self.simple_regex:
+            found.extend(self._pattern_for(match.group(0)) for match in self.simple_regex.finditer(text))
+        found.extend(pattern for regex, pattern in self.complex if regex.search(text))
+        return list(dict.fromkeys(found))
@@ -0,0 +1,208 @@
+import asyncio
+import bisect
+import json
+import os
+import threading
+import time
+import logging
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger('S3Hunter-X')
+
+# Límites (segundos) de los histogramas de latencia: de una consulta SQLite a una descarga grande
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+class Histogram:
+    """Histograma acumulativo al estilo Prometheus; también estima percentiles para el snapshot JSON."""
+
+    def __init__(self, bounds: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Límite superior del bucket que contiene el percentil q (None si no hay observaciones)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.bounds + (float('inf'),), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+class Registry:
+    def __init__(self):
+        """
+        Registro de métricas del proceso: contadores, gauges e histogramas con etiquetas.
+
+        Es seguro entre hilos (el escritor SQLite y los pools de hilos también registran métricas) y
+        barato en el camino caliente: cada operación es un acceso a diccionario bajo un lock.
+        """
+        self.lock = threading.Lock()
+        self.counters: Dict[str, Dict[Labels, float]] = {}
+        self.gauges: Dict[str, Dict[Labels, float]] = {}
+        self.histograms: Dict[str, Dict[Labels, Histogram]] = {}
+        self.callbacks: Dict[str, Callable[[], float]] = {}
+        self.started = time.time()
+
+    @staticmethod
+    def _labels(labels: Dict) -> Labels:
+        return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        """Incrementa un contador."""
+        key = self._labels(labels)
+        with self.lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels) -> None:
+        """Fija el valor de un gauge."""
+        with self.lock:
+            self.gauges.setdefault(name, {})[self._labels(labels)] = value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        """Añade una observación a un histograma."""
+        key = self._labels(labels)
+        with self.lock:
+            series = self.histograms.setdefault(name, {})
+            if key not in series:
+                series[key] = Histogram()
+            series[key].observe(value)
+
+    def gauge_callback(self, name: str, callback: Callable[[], float]) -> None:
+        """Registra un gauge que se evalúa al exportar (p. ej. la profundidad de una cola)."""
+        with self.lock:
+            self.callbacks[name] = callback
+
+    @contextmanager
+    def timed(self, name: str, **labels) -> Iterator[Dict]:
+        """
+        Mide la duración del bloque y la añade al histograma `name`.
+
+        El diccionario devuelto permite completar etiquetas dentro del bloque (p. ej. el estado HTTP).
+        """
+        extra: Dict = {}
+        start = time.perf_counter()
+        try:
+            yield extra
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels, **extra)
+
+    def _sampled_gauges(self) -> Dict[str, Dict[Labels, float]]:
+        gauges = {name: dict(series) for name, series in self.gauges.items()}
+        for name, callback in self.callbacks.items():
+            try:
+                gauges[name] = {(): float(callback())}
+            except Exception as e:
+                logger.debug(f"No se pudo evaluar el gauge {name}: {e}")
+        return gauges
+
+    def render_prometheus(self) -> str:
+        """Exporta todas las métricas en formato de texto de Prometheus."""
+        def fmt(labels: Labels, extra: Labels = ()) -> str:
+            pairs = labels + extra
+            return '{' + ','.join(f'{key}="{value}"' for key, value in pairs) + '}' if pairs else ''
+
+        lines: List[str] = []
+        with self.lock:
+            for name, series in sorted(self.counters.items()):
+                lines.append(f"# TYPE s3hunter_{name} counter")
+                lines.extend(f"s3hunter_{name}{fmt(labels)} {value}" for labels, value in series.items())
+            for name, series in sorted(self._sampled_gauges().items()):
+                lines.append(f"# TYPE s3hunter_{name} gauge")
+                lines.extend(f"s3hunter_{name}{fmt(labels)} {value}" for labels, value in series.items())
+            for name, series in sorted(self.histograms.items()):
+                lines.append(f"# TYPE s3hunter_{name} histogram")
+                for labels, hist in series.items():
+                    cumulative = 0
+                    for bound, count in zip(hist.bounds + (float('inf'),), hist.counts):
+                        cumulative += count
+                        le = '+Inf' if bound == float('inf') else repr(bound)
+                        lines.append(f"s3hunter_{name}_bucket{fmt(labels, (('le', le),))} {cumulative}")
+                    lines.append(f"s3hunter_{name}_sum{fmt(labels)} {hist.sum}")
+                    lines.append(f"s3hunter_{name}_count{fmt(labels)} {hist.count}")
+        return '\n'.join(lines) + '\n'
+
+    def snapshot(self) -> Dict:
+        """Resumen en JSON: contadores, gauges y, por histograma, número, media, p50 y p99."""
+        def key(labels: Labels) -> str:
+            return ','.join(f"{k}={v}" for k, v in labels) or 'total'
+
+        with self.lock:
+            return {
+                'timestamp': time.time(),
+                'uptime_seconds': time.time() - self.started,
+                'counters': {name: {key(labels): value for labels, value in series.items()}
+                             for name, series in self.counters.items()},
+                'gauges': {name: {key(labels): value for labels, value in series.items()}
+                           for name, series in self._sampled_gauges().items()},
+                'histograms': {name: {key(labels): {'count': hist.count,
+                                                    'mean': hist.sum / hist.count if hist.count else None,
+                                                    'p50': hist.quantile(0.5), 'p99': hist.quantile(0.99)}
+                                      for labels, hist in series.items()}
+                               for name, series in self.histograms.items()}
+            }
+
+    def reset(self) -> None:
+        """Vacía el registro (usado en pruebas y benchmarks)."""
+        with self.lock:
+            self.counters.clear()
+            self.gauges.clear()
+            self.histograms.clear()
+            self.callbacks.clear()
+            self.started = time.time()
+
+# Registro global del proceso, como las sesiones compartidas de http_client
+REGISTRY = Registry()
+inc = REGISTRY.inc
+observe = REGISTRY.observe
+timed = REGISTRY.timed
+
+def write_snapshot(path: str) -> None:
+    """Escribe el snapshot JSON de forma atómica (archivo temporal y renombrado)."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(REGISTRY.snapshot(), f, indent=2)
+    os.replace(tmp_path, path)
+
+async def snapshot_loop(path: str, interval: float) -> None:
+    """Escribe el snapshot JSON cada `interval` segundos hasta ser cancelada (y una última vez al salir)."""
+    try:
+        while True:
+            await asyncio.sleep(interval)
+            await asyncio.to_thread(write_snapshot, path)
+    finally:
+        write_snapshot(path)
+
+async def start_server(host: str, port: int):
+    """
+    Arranca el endpoint HTTP /metrics en formato Prometheus.
+
+    Returns:
+        aiohttp.web.AppRunner: Debe liberarse con `await runner.cleanup()`.
+    """
+    from aiohttp import web
+
+    async def handle(request: web.Request) -> web.Response:
+        return web.Response(text=REGISTRY.render_prometheus(), content_type='text/plain', charset='utf-8')
+
+    app = web.Application()
+    app.router.add_get('/metrics', handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info(f"Métricas disponibles en http://{host}:{port}/metrics")
+    return runner
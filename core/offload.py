@@ -0,0 +1,74 @@
+import asyncio
+import multiprocessing
+import os
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, NamedTuple, Optional
+from core.matcher import PatternMatcher
+from core import metrics
+from core.scanner import parse_listing_page
+
+logger = logging.getLogger('S3Hunter-X')
+
+class KeyRecord(NamedTuple):
+    """Resultado compacto del análisis de una clave (barato de serializar entre procesos)."""
+    filename: str
+    risk: str
+    pattern: Optional[str]
+    size: Optional[int]
+
+# Estado de cada proceso del pool: los patrones se compilan una vez al arrancar el proceso, no por página
+_matcher: Optional[PatternMatcher] = None
+_key_filter: Optional[PatternMatcher] = None
+
+def _init_worker(patterns: List[str], filter_patterns: List[str]) -> None:
+    global _matcher, _key_filter
+    _matcher = PatternMatcher(patterns)
+    _key_filter = PatternMatcher(filter_patterns) if filter_patterns else None
+
+def analyze_page(body: bytes) -> List[KeyRecord]:
+    """Analiza una página ListBucketResult completa: extrae las claves, aplica el filtro y clasifica el riesgo."""
+    records = []
+    for record in parse_listing_page(body, _key_filter):
+        filename = record.get('Key')
+        if not filename:
+            continue
+        pattern = _matcher.search(filename)
+        records.append(KeyRecord(filename, 'HIGH' if pattern else 'LOW', pattern, record.get('Size')))
+    return records
+
+class AnalysisPool:
+    def __init__(self, patterns: List[str], filter_patterns: Optional[List[str]] = None, workers: Optional[int] = None):
+        """
+        Etapa de análisis de listados fuera del bucle de eventos.
+
+        El XML de cada página y la búsqueda de patrones en sus claves son trabajo de CPU; se reparten entre
+        procesos para usar todos los núcleos y que el bucle de E/S siga atendiendo la red.
+
+        Args:
+            patterns (List[str]): Patrones de riesgo (los del Analyzer).
+            filter_patterns (List[str], optional): Patrones que deben cumplir las claves para conservarse.
+            workers (int, optional): Procesos del pool; None = uno por núcleo, 0 = analizar en el propio proceso.
+        """
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.executor = None
+        if self.workers > 0:
+            # 'spawn': el proceso principal ya tiene hilos (escritor SQLite, boto3) y hacer fork con hilos no es seguro
+            self.executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'),
+                                                initializer=_init_worker, initargs=(patterns, filter_patterns or []))
+            logger.info(f"Pool de análisis iniciado con {self.workers} procesos")
+        else:
+            _init_worker(patterns, filter_patterns or [])
+
+    async def analyze(self, body: bytes) -> List[KeyRecord]:
+        """Analiza una página de listado sin bloquear el bucle de eventos."""
+        with metrics.timed('analysis_seconds', stage='listing'):
+            if not self.executor:
+                return analyze_page(body)
+            return await asyncio.get_running_loop().run_in_executor(self.executor, analyze_page, body)
+
+    def close(self) -> None:
+        """Detiene los procesos del pool."""
+        if self.executor:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+            self.executor = None
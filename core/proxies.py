@@ -0,0 +1,184 @@
+import asyncio
+import random
+import time
+import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+import aiohttp
+from config import settings
+from core import http_client
+
+logger = logging.getLogger('S3Hunter-X')
+
+# Resultado de la última comprobación por proxy: (funcional, instante monotónico de la comprobación)
+_health: Dict[str, Tuple[bool, float]] = {}
+
+async def check_proxy(session: aiohttp.ClientSession, proxy: str, test_url: str, timeout: float) -> bool:
+    """Comprueba si un proxy está funcional con una petición al endpoint de prueba."""
+    try:
+        async with session.get(test_url, proxy=proxy, timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+            return response.status == 200
+    except Exception as e:
+        logger.warning(f"Proxy {proxy} no funcional: {e}")
+        return False
+
+async def validate_proxies(proxies: List[str], test_url: Optional[str] = None, timeout: Optional[float] = None,
+                           max_age: Optional[float] = None, concurrency: int = 20) -> List[str]:
+    """
+    Valida proxies en paralelo y devuelve los funcionales, en el orden original.
+
+    Los resultados se cachean durante `max_age` segundos, así que llamadas repetidas no vuelven a
+    salir a la red.
+
+    Args:
+        proxies (List[str]): URLs de los proxies.
+        test_url (str, optional): Endpoint de prueba; por defecto settings['proxy_check_url'].
+        timeout (float, optional): Tiempo máximo por comprobación; por defecto settings['proxy_check_timeout'].
+        max_age (float, optional): Vigencia del resultado cacheado; por defecto settings['proxy_check_ttl'].
+        concurrency (int): Comprobaciones simultáneas como máximo.
+
+    Returns:
+        List[str]: Proxies que respondieron correctamente.
+    """
+    test_url = test_url or settings.SETTINGS['proxy_check_url']
+    timeout = timeout or settings.SETTINGS['proxy_check_timeout']
+    max_age = settings.SETTINGS['proxy_check_ttl'] if max_age is None else max_age
+    now = time.monotonic()
+    stale = [p for p in dict.fromkeys(proxies) if p not in _health or now - _health[p][1] >= max_age]
+    if stale:
+        session = http_client.get_session('api')
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def check(proxy: str) -> None:
+            async with semaphore:
+                _health[proxy] = (await check_proxy(session, proxy, test_url, timeout), time.monotonic())
+
+        await asyncio.gather(*(check(p) for p in stale))
+    healthy = [p for p in proxies if _health[p][0]]
+    logger.info(f"Proxies funcionales: {len(healthy)}/{len(proxies)}")
+    return healthy
+
+class ProxyLease:
+    """Ruta de salida asignada a una petición: proxy (None = conexión directa) y cabeceras."""
+
+    __slots__ = ('proxy', 'headers', 'ok')
+
+    def __init__(self, proxy: Optional[str], user_agent: Optional[str] = None):
+        self.proxy = proxy
+        self.headers = {'User-Agent': user_agent} if user_agent else None
+        self.ok = True
+
+    def key(self, endpoint: str) -> str:
+        """Clave del limitador: S3 limita por IP de origen, así que cada ruta tiene su propio ritmo."""
+        return f"{endpoint}@{self.proxy}" if self.proxy else endpoint
+
+    def failed(self) -> None:
+        """Marca la petición como fallida (throttling o respuesta anómala) para la puntuación del proxy."""
+        self.ok = False
+
+class ProxyStats:
+    __slots__ = ('success', 'latency', 'samples', 'inflight', 'ejected_until', 'ejections', 'probation')
+
+    def __init__(self):
+        self.success = 1.0
+        self.latency = 0.0
+        self.samples = 0
+        self.inflight = 0
+        self.ejected_until = 0.0
+        self.ejections = 0
+        self.probation = False
+
+class ProxyPool:
+    def __init__(self, proxies: List[Optional[str]], max_concurrency: int = 20, alpha: float = 0.2,
+                 eject_below: float = 0.5, min_samples: int = 5, eject_seconds: float = 30,
+                 user_agents: Optional[List[str]] = None):
+        """
+        Pool de rutas de salida con concurrencia limitada y puntuación por proxy.
+
+        Cada proxy mantiene medias móviles exponenciales (EWMA) de éxito y latencia. Se elige entre dos
+        proxies al azar el de mejor puntuación y menos carga; si la tasa de éxito cae por debajo de
+        `eject_below` se expulsa durante `eject_seconds` (el doble en cada expulsión consecutiva) y
+        después se readmite a prueba: recibe la siguiente petición y, si falla, vuelve a ser expulsado.
+
+        Args:
+            proxies (List[Optional[str]]): URLs de los proxies; None representa la conexión directa.
+            max_concurrency (int): Peticiones simultáneas por proxy.
+            alpha (float): Peso de la última muestra en las medias móviles.
+            eject_below (float): Tasa de éxito mínima antes de expulsar un proxy.
+            min_samples (int): Muestras necesarias antes de poder expulsar un proxy.
+            eject_seconds (float): Duración de la primera expulsión.
+            user_agents (List[str], optional): User-Agents que se rotan en cada petición.
+        """
+        if not proxies:
+            raise ValueError("El pool de proxies no puede estar vacío")
+        self.proxies = list(dict.fromkeys(proxies))
+        self.alpha = alpha
+        self.eject_below = eject_below
+        self.min_samples = min_samples
+        self.eject_seconds = eject_seconds
+        self.user_agents = user_agents or []
+        self.stats: Dict[Optional[str], ProxyStats] = {p: ProxyStats() for p in self.proxies}
+        self.semaphores = {p: asyncio.Semaphore(max_concurrency) for p in self.proxies}
+
+    def score(self, proxy: Optional[str]) -> float:
+        """Puntuación de un proxy: éxito por unidad de latencia, penalizado por su carga actual."""
+        stats = self.stats[proxy]
+        return stats.success / ((stats.latency or 0.1) * (1 + stats.inflight))
+
+    def _pick(self) -> Optional[str]:
+        now = time.monotonic()
+        available = [p for p in self.proxies if self.stats[p].ejected_until <= now]
+        if not available:
+            # Todos expulsados: se usa el que antes vaya a ser readmitido en lugar de detener el escaneo
+            return min(self.proxies, key=lambda p: self.stats[p].ejected_until)
+        # Los proxies readmitidos reciben una petición de prueba antes de competir por puntuación
+        for proxy in available:
+            if self.stats[proxy].probation and not self.stats[proxy].inflight:
+                return proxy
+        if len(available) == 1:
+            return available[0]
+        first, second = random.sample(available, 2)
+        return first if self.score(first) >= self.score(second) else second
+
+    def record(self, proxy: Optional[str], ok: bool, latency: float) -> None:
+        """Actualiza las medias móviles del proxy y lo expulsa si su tasa de éxito es demasiado baja."""
+        stats = self.stats[proxy]
+        stats.samples += 1
+        stats.success += self.alpha * ((1.0 if ok else 0.0) - stats.success)
+        stats.latency = latency if stats.samples == 1 else stats.latency + self.alpha * (latency - stats.latency)
+        if ok:
+            stats.ejections = 0
+            stats.probation = False
+        elif stats.probation or (stats.samples >= self.min_samples and stats.success < self.eject_below):
+            stats.ejections += 1
+            duration = self.eject_seconds * 2 ** (stats.ejections - 1)
+            stats.ejected_until = time.monotonic() + duration
+            # Al readmitirse parte justo del umbral y a prueba
+            stats.success = self.eject_below
+            stats.probation = True
+            logger.warning(f"Proxy {proxy or 'directo'} expulsado durante {duration:.0f}s por baja tasa de éxito")
+
+    @asynccontextmanager
+    async def lease(self) -> AsyncIterator[ProxyLease]:
+        """Reserva una ruta de salida para una petición y registra su resultado al terminar."""
+        proxy = self._pick()
+        async with self.semaphores[proxy]:
+            stats = self.stats[proxy]
+            lease = ProxyLease(proxy, random.choice(self.user_agents) if self.user_agents else None)
+            stats.inflight += 1
+            start = time.monotonic()
+            try:
+                yield lease
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                lease.failed()
+                raise
+            finally:
+                stats.inflight -= 1
+                self.record(proxy, lease.ok, time.monotonic() - start)
+
+    def summary(self) -> None:
+        """Registra en el log el estado de cada proxy."""
+        for proxy in self.proxies:
+            stats = self.stats[proxy]
+            logger.info(f"Proxy {proxy or 'directo'}: {stats.samples} peticiones, éxito {stats.success:.2f}, "
+                        f"latencia {stats.latency * 1000:.0f} ms")
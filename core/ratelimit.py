@@ -0,0 +1,98 @@
+import asyncio
+import time
+import logging
+from typing import Dict, Optional
+
+logger = logging.getLogger('S3Hunter-X')
+
+class RateLimiter:
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        """
+        Limitador token bucket compartido entre corrutinas.
+
+        Args:
+            rate (float): Tokens repuestos por segundo.
+            burst (float, optional): Capacidad máxima del bucket; por defecto, un segundo de tokens.
+        """
+        self.rate = rate
+        self.capacity = burst if burst is not None else max(rate, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, tokens: float = 1.0) -> None:
+        """Espera hasta disponer de `tokens` tokens y los consume."""
+        async with self.lock:
+            self._refill()
+            while self.tokens < tokens:
+                await asyncio.sleep((tokens - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= tokens
+
+class AdaptiveRateLimiter:
+    def __init__(self, rate: float, max_rate: Optional[float] = None, min_rate: float = 1.0,
+                 increase: float = 1.0, decrease: float = 0.5, cooldown: float = 1.0):
+        """
+        Limitador por endpoint con control AIMD (incremento aditivo, decremento multiplicativo).
+
+        Cada endpoint regional tiene su propio token bucket. Las respuestas 429/503 SlowDown reducen
+        su ritmo multiplicativamente (como mucho una vez por `cooldown`); cada éxito lo recupera poco a
+        poco, sumando unas `increase` peticiones/s por segundo de tráfico sin errores.
+
+        Args:
+            rate (float): Ritmo inicial por endpoint (peticiones/s).
+            max_rate (float, optional): Techo de ritmo; por defecto, el ritmo inicial.
+            min_rate (float): Suelo de ritmo tras reducciones sucesivas.
+            increase (float): Incremento aditivo por segundo de éxitos.
+            decrease (float): Factor multiplicativo aplicado al detectar throttling.
+            cooldown (float): Segundos mínimos entre dos reducciones del mismo endpoint.
+        """
+        self.initial_rate = rate
+        self.max_rate = max_rate or rate
+        self.min_rate = min_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.cooldown = cooldown
+        self.limiters: Dict[str, RateLimiter] = {}
+        self.last_decrease: Dict[str, float] = {}
+        self.throttled = 0
+
+    def _limiter(self, endpoint: str) -> RateLimiter:
+        limiter = self.limiters.get(endpoint)
+        if limiter is None:
+            limiter = self.limiters[endpoint] = RateLimiter(self.initial_rate)
+        return limiter
+
+    def rate(self, endpoint: str) -> float:
+        """Ritmo actual de un endpoint."""
+        return self._limiter(endpoint).rate
+
+    async def acquire(self, endpoint: str) -> None:
+        """Espera el turno para enviar una petición al endpoint."""
+        await self._limiter(endpoint).acquire()
+
+    def record_success(self, endpoint: str) -> None:
+        """Incremento aditivo tras una respuesta sin throttling."""
+        limiter = self._limiter(endpoint)
+        if limiter.rate < self.max_rate:
+            limiter.rate = min(self.max_rate, limiter.rate + self.increase / limiter.rate)
+            limiter.capacity = max(limiter.rate, 1.0)
+
+    def record_throttle(self, endpoint: str) -> None:
+        """Decremento multiplicativo tras un 429/503 SlowDown."""
+        self.throttled += 1
+        now = time.monotonic()
+        if now - self.last_decrease.get(endpoint, float('-inf')) < self.cooldown:
+            return
+        self.last_decrease[endpoint] = now
+        limiter = self._limiter(endpoint)
+        limiter.rate = max(self.min_rate, limiter.rate * self.decrease)
+        limiter.capacity = max(limiter.rate, 1.0)
+        # Se vacía el bucket para que las corrutinas en espera respeten el nuevo ritmo de inmediato
+        limiter.tokens = min(limiter.tokens, 0.0)
+        logger.warning(f"Throttling en {endpoint}: ritmo reducido a {limiter.rate:.1f} peticiones/s")
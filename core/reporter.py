@@ -3,87 +3,148 @@ import sqlite3
 import json
 import csv
 from datetime import datetime
-from typing import List
+from typing import List, Iterator, Tuple
 import logging
 from config import settings
 
 logger = logging.getLogger('S3Hunter-X')
 
+FIELDS = ['bucket', 'filename', 'risk', 'content_risk', 'url', 'region', 'timestamp']
+CSV_HEADERS = ['Bucket', 'Filename', 'Risk', 'Content Risk', 'URL', 'Region', 'Timestamp']
+MD_HEADER = ("| Bucket | Filename | Risk | Content Risk | URL | Region | Timestamp |\n"
+             "|--------|----------|------|--------------|-----|--------|-----------|\n")
+
+def _select_columns(conn: sqlite3.Connection) -> List[str]:
+    """Columnas a consultar, tolerando bases de datos antiguas sin 'url' o 'region'."""
+    columns = [col[1] for col in conn.execute("PRAGMA table_info(results)").fetchall()]
+    return ['id', 'bucket', 'filename', 'risk', 'content_risk',
+            'url' if 'url' in columns else "'' AS url",
+            'region' if 'region' in columns else "'unknown' AS region",
+            'timestamp']
+
+def iter_results(conn: sqlite3.Connection) -> Iterator[Tuple]:
+    """Recorre los resultados directamente desde el cursor, sin cargarlos en memoria."""
+    query = f"SELECT {', '.join(_select_columns(conn))} FROM results WHERE risk IS NOT NULL ORDER BY id"
+    return conn.execute(query)
+
+def iter_changes(conn: sqlite3.Connection, after: int = 0) -> Iterator[Tuple]:
+    """
+    Recorre las filas dadas de alta o modificadas después de la revisión `after`.
+
+    Cada fila lleva en primera posición su revisión. Con bases de datos antiguas sin columna
+    'revision' se usa el id (solo se ven las altas).
+    """
+    columns = _select_columns(conn)
+    has_revision = any(col[1] == 'revision' for col in conn.execute("PRAGMA table_info(results)"))
+    key = 'revision' if has_revision else 'id'
+    query = f"SELECT {key}, {', '.join(columns[1:])} FROM results WHERE risk IS NOT NULL AND {key} > ? ORDER BY {key}"
+    return conn.execute(query, (after,))
+
+def _md_row(row: Tuple) -> str:
+    return f"| {row[0]} | {row[1] or ''} | {row[2] or ''} | {row[3] or ''} | {row[4] or ''} | {row[5] or 'unknown'} | {row[6]} |\n"
+
 def generate_report(formats: List[str], output_prefix: str) -> None:
-    """Genera reportes en los formatos especificados."""
+    """Genera reportes completos en los formatos especificados, escribiendo fila a fila."""
     try:
         with sqlite3.connect(settings.SETTINGS['database'], check_same_thread=False) as conn:
-            c = conn.cursor()
-            # Verificar si las columnas existen
-            c.execute("PRAGMA table_info(results)")
-            columns = [col[1] for col in c.fetchall()]
-            select_columns = ['bucket', 'filename', 'risk', 'content_risk']
-            if 'url' in columns:
-                select_columns.append('url')
-            if 'region' in columns:
-                select_columns.append('region')
-            else:
-                select_columns.append("'unknown' AS region")
-            select_columns.append('timestamp')
-            query = f"SELECT {', '.join(select_columns)} FROM results WHERE risk IS NOT NULL"
-            
-            c.execute(query)
-            results = c.fetchall()
-            if not results:
+            if not conn.execute("SELECT 1 FROM results WHERE risk IS NOT NULL LIMIT 1").fetchone():
                 logger.info(f"No hay resultados para generar reportes en {output_prefix}")
                 return
-            
-            os.makedirs(os.path.dirname(output_prefix), exist_ok=True)
-            
+
+            os.makedirs(os.path.dirname(output_prefix) or '.', exist_ok=True)
+
             if 'md' in formats:
-                md_content = "# S3Hunter-X Report\n\n"
-                md_content += f"**Generated**: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n"
-                md_content += "| Bucket | Filename | Risk | Content Risk | {'URL' if 'url' in columns else ''} | {'Region' if 'region' in columns else 'Region'} | Timestamp |\n"
-                md_content += "|--------|----------|------|--------------|{'---' if 'url' in columns else ''}|{'---' if 'region' in columns else '---'}|-----------|\n"
-                for row in results:
-                    row = list(row)
-                    if 'url' not in columns:
-                        row.insert(4, '')
-                    if 'region' not in columns:
-                        row[5] = 'unknown'
-                    md_content += f"| {row[0]} | {row[1] or ''} | {row[2] or ''} | {row[3] or ''} | {row[4] or ''} | {row[5] or 'unknown'} | {row[6]} |\n"
                 with open(f"{output_prefix}.md", 'w', encoding='utf-8') as f:
-                    f.write(md_content)
+                    f.write("# S3Hunter-X Report\n\n")
+                    f.write(f"**Generated**: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
+                    f.write(MD_HEADER)
+                    for row in iter_results(conn):
+                        f.write(_md_row(row[1:]))
                 logger.info(f"Reporte Markdown generado: {output_prefix}.md")
-            
+
             if 'json' in formats:
-                json_data = []
-                for row in results:
-                    row_dict = {
-                        'bucket': row[0],
-                        'filename': row[1],
-                        'risk': row[2],
-                        'content_risk': row[3],
-                        'url': row[4] if 'url' in columns else '',
-                        'region': row[5] if 'region' in columns else 'unknown',
-                        'timestamp': row[6]
-                    }
-                    json_data.append(row_dict)
                 with open(f"{output_prefix}.json", 'w', encoding='utf-8') as f:
-                    json.dump(json_data, f, indent=2, ensure_ascii=False)
+                    f.write('[')
+                    for i, row in enumerate(iter_results(conn)):
+                        f.write(',\n  ' if i else '\n  ')
+                        f.write(json.dumps(dict(zip(FIELDS, row[1:])), ensure_ascii=False))
+                    f.write('\n]\n')
                 logger.info(f"Reporte JSON generado: {output_prefix}.json")
-            
+
             if 'csv' in formats:
                 with open(f"{output_prefix}.csv", 'w', encoding='utf-8', newline='') as f:
                     writer = csv.writer(f)
-                    headers = ['Bucket', 'Filename', 'Risk', 'Content Risk', 'URL' if 'url' in columns else '', 'Region', 'Timestamp']
-                    if not 'url' in columns:
-                        headers[4] = ''
-                    writer.writerow([h for h in headers if h])
-                    for row in results:
-                        row = list(row)
-                        if 'url' not in columns:
-                            row.insert(4, '')
-                        if 'region' not in columns:
-                            row[5] = 'unknown'
-                        writer.writerow(row)
+                    writer.writerow(CSV_HEADERS)
+                    writer.writerows(row[1:] for row in iter_results(conn))
                 logger.info(f"Reporte CSV generado: {output_prefix}.csv")
-    
+
     except sqlite3.Error as e:
         logger.error(f"Error al generar reportes: {e}")
-        raise
\ No newline at end of file
+        raise
+
+class IncrementalReporter:
+    def __init__(self, formats: List[str], output_prefix: str, watermark: int = 0):
+        """
+        Reportes parciales que solo añaden las filas nuevas o modificadas desde la última llamada.
+
+        La marca de agua es la última revisión de 'results' emitida (ver init_db): las altas y los
+        cambios de riesgo, como el content_risk que se fija al terminar una descarga, reciben una
+        revisión nueva. Los reportes parciales son por tanto un registro de cambios: una fila modificada
+        se añade otra vez y la última línea de cada (bucket, filename) es la vigente. El formato 'json'
+        se escribe como JSON Lines para poder añadir registros sin reescribir el archivo.
+
+        Args:
+            formats (List[str]): Formatos a generar (md, json, csv).
+            output_prefix (str): Prefijo de los archivos de salida.
+            watermark (int): Última revisión ya reportada; con un valor mayor que 0 se continúan los
+                archivos existentes en lugar de truncarlos (al reanudar con --resume).
+        """
+        self.formats = formats
+        self.output_prefix = output_prefix
+        self.watermark = watermark
+        os.makedirs(os.path.dirname(output_prefix) or '.', exist_ok=True)
+        if 'md' in formats and self._restart(f"{output_prefix}.md"):
+            with open(f"{output_prefix}.md", 'w', encoding='utf-8') as f:
+                f.write("# S3Hunter-X Report (parcial)\n\n")
+                f.write(MD_HEADER)
+        if 'json' in formats and self._restart(f"{output_prefix}.jsonl"):
+            open(f"{output_prefix}.jsonl", 'w', encoding='utf-8').close()
+        if 'csv' in formats and self._restart(f"{output_prefix}.csv"):
+            with open(f"{output_prefix}.csv", 'w', encoding='utf-8', newline='') as f:
+                csv.writer(f).writerow(CSV_HEADERS)
+
+    def _restart(self, path: str) -> bool:
+        """Indica si un archivo se empieza de cero: en una ejecución nueva o si falta el de la interrumpida."""
+        return self.watermark == 0 or not os.path.exists(path)
+
+    def append_new(self) -> int:
+        """Añade a los reportes parciales las filas nuevas o modificadas y devuelve cuántas se añadieron."""
+        added = 0
+        last_id = self.watermark
+        try:
+            with sqlite3.connect(settings.SETTINGS['database'], check_same_thread=False) as conn:
+                md = open(f"{self.output_prefix}.md", 'a', encoding='utf-8') if 'md' in self.formats else None
+                jsonl = open(f"{self.output_prefix}.jsonl", 'a', encoding='utf-8') if 'json' in self.formats else None
+                csv_file = open(f"{self.output_prefix}.csv", 'a', encoding='utf-8', newline='') if 'csv' in self.formats else None
+                try:
+                    writer = csv.writer(csv_file) if csv_file else None
+                    for row in iter_changes(conn, self.watermark):
+                        last_id = row[0]
+                        if md:
+                            md.write(_md_row(row[1:]))
+                        if jsonl:
+                            jsonl.write(json.dumps(dict(zip(FIELDS, row[1:])), ensure_ascii=False) + '\n')
+                        if writer:
+                            writer.writerow(row[1:])
+                        added += 1
+                finally:
+                    for f in (md, jsonl, csv_file):
+                        if f:
+                            f.close()
+        except sqlite3.Error as e:
+            logger.error(f"Error al actualizar reportes parciales: {e}")
+            raise
+        self.watermark = last_id
+        if added:
+            logger.info(f"Reportes parciales actualizados: {added} filas nuevas o modificadas en {self.output_prefix}.*")
+        return added
@@ -1,84 +1,424 @@
 import aiohttp
 import asyncio
-import xmltodict
-from typing import List, Tuple, Dict
-from tenacity import retry, stop_after_attempt, wait_exponential
+import re
+import time
+import xml.etree.ElementTree as ET
+from xml.sax.saxutils import unescape
+from contextlib import nullcontext
+from urllib.parse import urlsplit
+from typing import List, Tuple, Dict, Optional, Set, AsyncIterator, AsyncIterable, Iterable, Union
 import logging
 from config import settings
+from core.proxies import ProxyLease
+from core import metrics
 
 logger = logging.getLogger('S3Hunter-X')
 
-@retry(stop=stop_after_attempt(5), wait=wait_exponential(multiplier=2, min=5, max=120))
-async def check_bucket(session: aiohttp.ClientSession, bucket: str, region: str) -> Dict:
-    """Verifica la accesibilidad de un bucket S3 en una región específica."""
-    url = f"https://{bucket}.s3.{region}.amazonaws.com"
+# Los redirects de S3 apuntan al endpoint regional (bucket.s3.<región>.amazonaws.com, s3-<región> o, en estilo path, s3.<región>/bucket)
+REGION_FROM_HOST = re.compile(r'[/.]s3[.-]([a-z0-9-]+)\.amazonaws\.com', re.IGNORECASE)
+
+# Claves por página de ListObjectsV2 (máximo admitido por S3); acota la memoria de cada página
+LISTING_PAGE_SIZE = 1000
+
+# Paginación de ListObjectsV2 extraída de los bytes sin analizar el resto del documento
+IS_TRUNCATED = re.compile(rb'<IsTruncated>\s*true\s*</IsTruncated>', re.IGNORECASE)
+NEXT_TOKEN = re.compile(rb'<NextContinuationToken>([^<]+)</NextContinuationToken>')
+
+# Candidatos consultados en la caché persistente por cada lectura de SQLite
+CACHE_LOOKUP_BATCH = 100
+
+# Respuestas con las que S3 pide bajar el ritmo (429 Too Many Requests, 503 SlowDown)
+THROTTLE_STATUSES = (429, 503)
+
+# Respuestas de un endpoint regional en estilo path que obligan a reintentar en virtual-hosted
+# (redirect a otra región u otro host, o petición rechazada para ese bucket)
+PATH_STYLE_FALLBACK = (301, 307, 400)
+
+# Buckets que rechazaron el estilo path en esta ejecución; a partir de ahí se usan siempre con virtual-hosted
+_virtual_hosted_only: Set[str] = set()
+
+def uses_path_style(bucket: str) -> bool:
+    """Indica si las peticiones a AWS de este bucket van en estilo path (s3_path_style y sin fallback previo)."""
+    return (bool(settings.SETTINGS.get('s3_path_style')) and not settings.SETTINGS.get('s3_endpoint')
+            and bucket not in _virtual_hosted_only)
+
+def fall_back_to_virtual_hosted(bucket: str, status: int) -> None:
+    """Marca un bucket para usar virtual-hosted en el resto de la ejecución (sondas, listado y descargas)."""
+    _virtual_hosted_only.add(bucket)
+    metrics.inc('s3_path_style_fallbacks_total', status=status)
+    logger.debug(f"{bucket} rechazó el estilo path (Status {status}), se reintenta con virtual-hosted")
+
+def bucket_url(bucket: str, region: Optional[str] = None) -> str:
+    """
+    URL base de un bucket.
+
+    Por defecto usa el estilo virtual-hosted de AWS (global si no hay región): cada bucket es un host
+    distinto y cada sonda paga DNS, TCP y TLS. Con 's3_path_style' se usa el endpoint regional
+    (s3.<región>.amazonaws.com/<bucket>), de modo que miles de sondas comparten unas pocas conexiones
+    keep-alive del pool. Con 's3_endpoint' (MinIO, LocalStack o el S3 simulado de los benchmarks) se usa
+    estilo path sobre ese endpoint.
+    """
+    endpoint = settings.SETTINGS.get('s3_endpoint')
+    if endpoint:
+        return f"{endpoint.rstrip('/')}/{bucket}"
+    if uses_path_style(bucket):
+        return f"https://{endpoint_for(region)}/{bucket}"
+    return f"https://{bucket}.s3.{region}.amazonaws.com" if region else f"https://{bucket}.s3.amazonaws.com"
+
+def endpoint_for(region: Optional[str]) -> str:
+    """
+    Clave del endpoint S3 usada por el limitador de ritmo (y host del estilo path).
+
+    Con 's3_endpoint' todas las peticiones van a ese servidor, así que su netloc es la clave: no
+    tendría sentido repartir el ritmo entre endpoints regionales de AWS que nunca se contactan.
+    """
+    endpoint = settings.SETTINGS.get('s3_endpoint')
+    if endpoint:
+        return urlsplit(endpoint).netloc
+    return f"s3.{region}.amazonaws.com" if region else "s3.amazonaws.com"
+
+# Ruta de salida cuando no hay pool de proxies: conexión directa con las cabeceras por defecto
+DIRECT = ProxyLease(None)
+
+def egress(proxy_pool: Optional['ProxyPool']):
+    """Reserva una ruta de salida del pool, o la conexión directa si no hay pool."""
+    return proxy_pool.lease() if proxy_pool else nullcontext(DIRECT)
+
+def record_request(op: str, region: Optional[str], status: int, started: float) -> None:
+    """Registra la latencia (hasta recibir las cabeceras) y el estado de una petición a S3."""
+    labels = {'op': op, 'region': region or 'global'}
+    metrics.observe('s3_request_seconds', time.perf_counter() - started, **labels)
+    metrics.inc('s3_requests_total', status=status, **labels)
+    if status in THROTTLE_STATUSES:
+        metrics.inc('s3_throttled_total', status=status, **labels)
+
+async def throttle_backoff(limiter: Optional['AdaptiveRateLimiter'], endpoint: str, attempt: int) -> None:
+    """Registra un throttling; sin limitador compartido, espera con backoff exponencial."""
+    if limiter:
+        limiter.record_throttle(endpoint)
+    else:
+        await asyncio.sleep(min(2 ** attempt, 30))
+
+async def discover_bucket_region(session: aiohttp.ClientSession, bucket: str,
+                                 limiter: Optional['AdaptiveRateLimiter'] = None,
+                                 proxy_pool: Optional['ProxyPool'] = None) -> Dict:
+    """Resuelve la región de un bucket con un único HEAD al endpoint global."""
+    url = bucket_url(bucket)
+    endpoint = endpoint_for(None)
+    try:
+        for attempt in range(settings.SETTINGS['max_retries']):
+            async with egress(proxy_pool) as route:
+                key = route.key(endpoint)
+                if limiter:
+                    await limiter.acquire(key)
+                started = time.perf_counter()
+                async with session.head(url, allow_redirects=False, proxy=route.proxy, headers=route.headers,
+                                        timeout=settings.SETTINGS['request_timeout']) as response:
+                    record_request('discover', None, response.status, started)
+                    if response.status in THROTTLE_STATUSES:
+                        logger.debug(f"Throttling ({response.status}) en {url}, reintento {attempt + 1}")
+                        metrics.inc('s3_retries_total', op='discover')
+                        route.failed()
+                        await throttle_backoff(limiter, key, attempt)
+                        continue
+                    if limiter:
+                        limiter.record_success(key)
+                    headers = response.headers
+                    status = response.status
+            region = headers.get('x-amz-bucket-region')
+            if not region and 'Location' in headers:
+                match = REGION_FROM_HOST.search(headers['Location'])
+                region = match.group(1) if match else None
+            if status == 404:
+                return {'status': 'NOT_FOUND', 'region': region}
+            elif status == 403:
+                return {'status': 'PRIVATE', 'region': region}
+            logger.debug(f"Región de {bucket} resuelta como {region} (estado {status})")
+            return {'status': 'FOUND', 'region': region}
+        logger.warning(f"Rate limit persistente para {url} durante el descubrimiento de región")
+        return {'status': 'ERROR', 'error': 'Rate limit', 'region': None}
+    except Exception as e:
+        metrics.inc('s3_errors_total', op='discover')
+        logger.debug(f"Error al resolver la región de {url}: {e}")
+        return {'status': 'ERROR', 'error': str(e), 'region': None}
+
+async def check_bucket(session: aiohttp.ClientSession, bucket: str, region: str,
+                       limiter: Optional['AdaptiveRateLimiter'] = None,
+                       proxy_pool: Optional['ProxyPool'] = None) -> Dict:
+    """
+    Verifica la accesibilidad de un bucket S3 en una región específica.
+
+    En estilo path, si el endpoint regional redirige o rechaza la petición, se repite una vez con la URL
+    virtual-hosted y el bucket queda marcado para el resto de la ejecución.
+    """
+    url = bucket_url(bucket, region)
+    endpoint = endpoint_for(region)
     try:
-        async with session.get(url, timeout=settings.SETTINGS['request_timeout']) as response:
-            if response.status == 200:
-                content = await response.text()
-                return {'status': 'PUBLIC', 'data': xmltodict.parse(content) if 'ListBucketResult' in content else None, 'region': region}
-            elif response.status == 403:
+        for attempt in range(settings.SETTINGS['max_retries']):
+            path_style = uses_path_style(bucket)
+            url = bucket_url(bucket, region)
+            async with egress(proxy_pool) as route:
+                key = route.key(endpoint)
+                if limiter:
+                    await limiter.acquire(key)
+                # max-keys=0 confirma el permiso de listado sin descargar la primera página; el contenido se enumera con list_bucket_pages
+                started = time.perf_counter()
+                async with session.get(url, params={'list-type': '2', 'max-keys': '0'}, proxy=route.proxy, headers=route.headers,
+                                       timeout=settings.SETTINGS['request_timeout']) as response:
+                    record_request('check', region, response.status, started)
+                    if response.status in THROTTLE_STATUSES:
+                        logger.debug(f"Throttling ({response.status}) en {url}, reintento {attempt + 1}")
+                        metrics.inc('s3_retries_total', op='check')
+                        route.failed()
+                        await throttle_backoff(limiter, key, attempt)
+                        continue
+                    if limiter:
+                        limiter.record_success(key)
+                    status = response.status
+            if path_style and status in PATH_STYLE_FALLBACK:
+                fall_back_to_virtual_hosted(bucket, status)
+                continue
+            if status == 200:
+                return {'status': 'PUBLIC', 'region': region}
+            elif status == 403:
                 return {'status': 'PRIVATE', 'region': region}
-            elif response.status == 404:
+            elif status == 404:
                 return {'status': 'NOT_FOUND', 'region': region}
-            elif response.status == 429:
-                logger.warning(f"Rate limit alcanzado para {url}, reintentando...")
-                raise aiohttp.ClientResponseError(
-                    request_info=response.request_info,
-                    history=response.history,
-                    status=429,
-                    message="Rate limit"
-                )
             else:
-                logger.debug(f"Estado inesperado para {url}: {response.status}")
+                logger.debug(f"Estado inesperado para {url}: {status}")
                 return {'status': 'UNKNOWN', 'region': region}
+        logger.warning(f"Rate limit persistente para {url}")
+        return {'status': 'ERROR', 'error': 'Rate limit', 'region': region}
     except Exception as e:
+        metrics.inc('s3_errors_total', op='check')
         logger.debug(f"Error al verificar {url}: {e}")
         return {'status': 'ERROR', 'error': str(e), 'region': region}
 
-async def scan_buckets_async(buckets: List[str], max_workers: int, session: aiohttp.ClientSession, grep_list: List[str] = None) -> List[Tuple[str, Dict]]:
-    """Escanea una lista de buckets S3 de forma asíncrona."""
-    results = []
-    semaphore = asyncio.Semaphore(max_workers)
-    cache = {}  # Caché en memoria para evitar reescaneos
-    
-    async def scan_with_semaphore(bucket: str) -> Tuple[str, Dict]:
-        async with semaphore:
-            if bucket in cache:
-                logger.debug(f"Usando caché para {bucket}")
-                return bucket, cache[bucket]
-            
-            result = {'status': 'UNKNOWN'}
-            for region in settings.SETTINGS['s3_regions']:
-                bucket_result = await check_bucket(session, bucket, region)
-                if bucket_result['status'] == 'PUBLIC':
-                    result = bucket_result
-                    break
-                elif bucket_result['status'] in ('PRIVATE', 'NOT_FOUND'):
-                    result = bucket_result
-                else:
-                    result = bucket_result
-            
-            if result.get('data') and grep_list:
-                contents = result['data'].get('ListBucketResult', {}).get('Contents', [])
-                if not isinstance(contents, list):
-                    contents = [contents]
-                filtered_contents = []
-                for item in contents:
-                    key = item.get('Key', '')
-                    if any(re.search(pattern, key, re.IGNORECASE) for pattern in grep_list):
-                        filtered_contents.append(item)
-                result['data']['Contents'] = filtered_contents
-            
-            cache[bucket] = result
-            return bucket, result
-    
-    tasks = [scan_with_semaphore(bucket) for bucket in buckets]
-    results = await asyncio.gather(*tasks, return_exceptions=True)
-    
-    for bucket, result in results:
-        if isinstance(result, Exception):
-            logger.error(f"Error al escanear {bucket}: {result}")
-            results.append((bucket, {'status': 'ERROR', 'error': str(result)}))
-    
-    return [r for r in results if not isinstance(r[1], Exception)]
\ No newline at end of file
+class ListingParser:
+    """Parser incremental de una página ListBucketResult que emite cada clave en cuanto se cierra su elemento."""
+
+    def __init__(self):
+        self.parser = ET.XMLPullParser(events=('end',))
+        self.next_token = None
+        self.is_truncated = False
+
+    def feed(self, data: bytes) -> List[Dict]:
+        """Procesa un fragmento de la respuesta y devuelve los registros completos encontrados."""
+        self.parser.feed(data)
+        records = []
+        for _, elem in self.parser.read_events():
+            tag = elem.tag.rsplit('}', 1)[-1]
+            if tag == 'Contents':
+                record = {child.tag.rsplit('}', 1)[-1]: child.text for child in elem if len(child) == 0}
+                if 'Size' in record:
+                    record['Size'] = int(record['Size'] or 0)
+                records.append(record)
+                elem.clear()
+            elif tag == 'NextContinuationToken':
+                self.next_token = elem.text
+            elif tag == 'IsTruncated':
+                self.is_truncated = (elem.text or '').lower() == 'true'
+        return records
+
+def page_continuation(body: bytes) -> Optional[str]:
+    """Token de continuación de una página ListBucketResult, o None si es la última."""
+    if not IS_TRUNCATED.search(body):
+        return None
+    match = NEXT_TOKEN.search(body)
+    return unescape(match.group(1).decode('utf-8')) if match else None
+
+def parse_listing_page(body: bytes, key_filter: Optional['PatternMatcher'] = None) -> List[Dict]:
+    """Extrae los registros de una página completa, aplicando el filtro de claves si se indica."""
+    return [record for record in ListingParser().feed(body)
+            if not key_filter or key_filter.search(record.get('Key', ''))]
+
+async def list_bucket_pages(session: aiohttp.ClientSession, bucket: str, region: str,
+                            limiter: Optional['AdaptiveRateLimiter'] = None,
+                            proxy_pool: Optional['ProxyPool'] = None) -> AsyncIterator[bytes]:
+    """
+    Recorre las páginas de ListObjectsV2 de un bucket público y entrega el XML de cada una sin analizar.
+
+    Solo se busca el token de continuación (una expresión sobre bytes); el análisis de las claves queda en
+    manos del consumidor, que puede hacerlo fuera del bucle de eventos (ver core.offload).
+    """
+    url = bucket_url(bucket, region)
+    endpoint = endpoint_for(region)
+    token = None
+    pages = 0
+    throttles = 0
+    while True:
+        params = {'list-type': '2', 'max-keys': str(LISTING_PAGE_SIZE)}
+        if token:
+            params['continuation-token'] = token
+        chunks: List[bytes] = []
+        try:
+            async with egress(proxy_pool) as route:
+                key = route.key(endpoint)
+                if limiter:
+                    await limiter.acquire(key)
+                started = time.perf_counter()
+                async with session.get(url, params=params, proxy=route.proxy, headers=route.headers,
+                                       timeout=settings.SETTINGS['request_timeout']) as response:
+                    record_request('list', region, response.status, started)
+                    if response.status in THROTTLE_STATUSES and throttles < settings.SETTINGS['max_retries']:
+                        throttles += 1
+                        metrics.inc('s3_retries_total', op='list')
+                        route.failed()
+                        await throttle_backoff(limiter, key, throttles)
+                        continue
+                    if response.status in PATH_STYLE_FALLBACK and uses_path_style(bucket):
+                        fall_back_to_virtual_hosted(bucket, response.status)
+                        url = bucket_url(bucket, region)
+                        continue
+                    if response.status != 200:
+                        logger.warning(f"Listado de {bucket} interrumpido en la página {pages + 1}: Status {response.status}")
+                        return
+                    if limiter:
+                        limiter.record_success(key)
+                    throttles = 0
+                    async for chunk in response.content.iter_chunked(64 * 1024):
+                        chunks.append(chunk)
+            metrics.inc('s3_listing_bytes_total', sum(len(chunk) for chunk in chunks))
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            metrics.inc('s3_errors_total', op='list')
+            logger.error(f"Error al listar {bucket} en la página {pages + 1}: {e}")
+            return
+        # La página (como mucho LISTING_PAGE_SIZE claves) se entrega con la respuesta y la ruta de salida ya
+        # liberadas: un consumidor lento no puede agotar el timeout de la petición y truncar el listado
+        body = b''.join(chunks)
+        yield body
+        pages += 1
+        token = page_continuation(body)
+        if not token:
+            break
+    logger.debug(f"Listado de {bucket} completado en {pages} páginas")
+
+async def scan_all_regions(session: aiohttp.ClientSession, bucket: str,
+                           limiter: Optional['AdaptiveRateLimiter'] = None,
+                           proxy_pool: Optional['ProxyPool'] = None) -> Dict:
+    """Verifica un bucket región por región hasta encontrarlo público."""
+    result = {'status': 'UNKNOWN'}
+    for region in settings.SETTINGS['s3_regions']:
+        result = await check_bucket(session, bucket, region, limiter, proxy_pool)
+        if result['status'] == 'PUBLIC':
+            break
+    return result
+
+async def scan_bucket(session: aiohttp.ClientSession, bucket: str,
+                      limiter: Optional['AdaptiveRateLimiter'] = None,
+                      proxy_pool: Optional['ProxyPool'] = None) -> Dict:
+    """Determina el estado de un bucket, resolviendo primero su región si está habilitado."""
+    if settings.SETTINGS.get('region_discovery', True):
+        discovery = await discover_bucket_region(session, bucket, limiter, proxy_pool)
+        if discovery['status'] in ('NOT_FOUND', 'PRIVATE'):
+            return discovery
+        if discovery.get('region'):
+            return await check_bucket(session, bucket, discovery['region'], limiter, proxy_pool)
+        logger.debug(f"No se pudo resolver la región de {bucket}, probando todas las regiones")
+    return await scan_all_regions(session, bucket, limiter, proxy_pool)
+
+async def scan_stream(buckets: Union[Iterable[str], AsyncIterable[str]], max_workers: int, session: aiohttp.ClientSession,
+                      cache: Optional['ScanCache'] = None, limiter: Optional['AdaptiveRateLimiter'] = None,
+                      proxy_pool: Optional['ProxyPool'] = None) -> AsyncIterator[Tuple[str, Dict]]:
+    """
+    Escanea candidatos con un pool fijo de workers y entrega cada resultado en cuanto termina.
+
+    Los candidatos se consumen de forma perezosa desde una cola acotada, de modo que un bucket lento
+    solo ocupa a su worker y no retiene al resto. La cola de resultados también está acotada: si quien
+    consume se bloquea (por ejemplo, esperando sitio en la cola de descargas), los workers se detienen
+    en lugar de acumular resultados en memoria. La caché se consulta por bloques, fuera del bucle
+    de eventos, antes de encolar.
+
+    Args:
+        buckets: Iterable (síncrono o asíncrono) de nombres de buckets.
+        max_workers (int): Número de workers concurrentes.
+        session (aiohttp.ClientSession): Sesión HTTP compartida.
+        cache (ScanCache, optional): Caché persistente de resultados.
+        limiter (AdaptiveRateLimiter, optional): Limitador por endpoint que marca el ritmo de escaneo.
+        proxy_pool (ProxyPool, optional): Rutas de salida entre las que se reparten las peticiones.
+
+    Yields:
+        Tuple[str, Dict]: Bucket y resultado, en orden de finalización.
+    """
+    pending: asyncio.Queue = asyncio.Queue(maxsize=max_workers * 2)
+    results: asyncio.Queue = asyncio.Queue(maxsize=max_workers * 2)
+    metrics.REGISTRY.gauge_callback('scan_pending_depth', pending.qsize)
+    metrics.REGISTRY.gauge_callback('scan_results_depth', results.qsize)
+    finished = object()
+
+    async def enqueue(chunk: List[str]) -> None:
+        # La caché se consulta por bloques en un hilo aparte: el bucle de eventos no espera a SQLite
+        cached = await asyncio.to_thread(cache.get_many, chunk) if cache else {}
+        for bucket in chunk:
+            if bucket in cached:
+                logger.debug(f"Usando caché para {bucket}: {cached[bucket]['status']}")
+                metrics.inc('buckets_scanned_total', status=cached[bucket]['status'], source='cache')
+                await results.put((bucket, cached[bucket]))
+            else:
+                await pending.put(bucket)
+
+    async def producer() -> None:
+        chunk: List[str] = []
+        if hasattr(buckets, '__aiter__'):
+            async for bucket in buckets:
+                chunk.append(bucket)
+                if len(chunk) >= CACHE_LOOKUP_BATCH:
+                    await enqueue(chunk)
+                    chunk = []
+        else:
+            for bucket in buckets:
+                chunk.append(bucket)
+                if len(chunk) >= CACHE_LOOKUP_BATCH:
+                    await enqueue(chunk)
+                    chunk = []
+        if chunk:
+            await enqueue(chunk)
+        for _ in range(max_workers):
+            await pending.put(None)
+
+    async def worker() -> None:
+        while True:
+            bucket = await pending.get()
+            if bucket is None:
+                return
+            try:
+                result = await scan_bucket(session, bucket, limiter, proxy_pool)
+            except Exception as e:
+                logger.error(f"Error al escanear {bucket}: {e}")
+                result = {'status': 'ERROR', 'error': str(e)}
+            metrics.inc('buckets_scanned_total', status=result.get('status'), source='network')
+            if cache:
+                cache.put(bucket, result)
+            await results.put((bucket, result))
+
+    tasks = [asyncio.create_task(producer())] + [asyncio.create_task(worker()) for _ in range(max_workers)]
+
+    async def supervise() -> None:
+        try:
+            await asyncio.gather(*tasks)
+        except Exception as e:
+            await results.put(e)
+        await results.put(finished)
+
+    supervisor = asyncio.create_task(supervise())
+    try:
+        while True:
+            item = await results.get()
+            if item is finished:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        for task in tasks + [supervisor]:
+            task.cancel()
+        await asyncio.gather(*tasks, supervisor, return_exceptions=True)
+        if cache:
+            cache.flush()
+
+async def scan_buckets_async(buckets: List[str], max_workers: int, session: aiohttp.ClientSession,
+                             cache: Optional['ScanCache'] = None,
+                             limiter: Optional['AdaptiveRateLimiter'] = None,
+                             proxy_pool: Optional['ProxyPool'] = None) -> List[Tuple[str, Dict]]:
+    """Escanea una lista de buckets S3 de forma asíncrona, consultando la caché persistente antes de la red."""
+    return [item async for item in scan_stream(buckets, max_workers, session, cache=cache, limiter=limiter, proxy_pool=proxy_pool)]
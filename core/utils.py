@@ -1,4 +1,6 @@
 import importlib
+import hashlib
+import math
 import logging
 from typing import List, Optional
 
@@ -18,5 +20,35 @@ def is_authorized_domain(bucket: str, authorized_domains: List[str]) -> bool:
     if not authorized_domains:
         return True
     bucket_clean = bucket.lower()
+    # Se acepta el dominio con guiones (ejemplo-com-backup) y tal cual (assets.ejemplo.com, típico de los CNAME)
     authorized_domains_clean = [domain.replace('.', '-').lower() for domain in authorized_domains]
-    return any(domain in bucket_clean for domain in authorized_domains_clean)
\ No newline at end of file
+    return (any(domain in bucket_clean for domain in authorized_domains_clean)
+            or any(domain.lower() in bucket_clean for domain in authorized_domains))
+
+class BloomFilter:
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        """
+        Filtro de Bloom para deduplicar flujos grandes con memoria constante.
+
+        Args:
+            capacity (int): Número de elementos esperado.
+            error_rate (float): Probabilidad de falso positivo con `capacity` elementos.
+        """
+        capacity = max(capacity, 1)
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, item: str) -> None:
+        """Añade un elemento al filtro."""
+        for pos in self._positions(item):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
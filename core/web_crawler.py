@@ -1,106 +1,291 @@
 import aiohttp
 import asyncio
+import itertools
 import re
-from urllib.parse import urlparse
-from typing import List, Optional
+from contextlib import asynccontextmanager
+from urllib.parse import urljoin, urlsplit, urlunsplit, parse_qsl, urlencode
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Set, Tuple
 import logging
+from config import settings
+from core import http_client, metrics
+from core.cloud_refs import CloudBucket, CloudRefExtractor, bucket_root, extract_cloud_refs
 
 logger = logging.getLogger('S3Hunter-X')
 
-async def gather_cloud_links(html: str, cloud_domains: Optional[List[str]] = None) -> List[str]:
+# Enlaces a seguir: atributos href/src de HTML (páginas, scripts y hojas de estilo)
+LINK_ATTR = re.compile(r'''(?:href|src)\s*=\s*["']?([^"'\s>]+)''', re.IGNORECASE)
+
+# Tipos de contenido de los que se extraen enlaces; el resto (JS, CSS, JSON) solo se analiza en busca de URLs de nube
+HTML_TYPES = ('text/html', 'application/xhtml+xml')
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+# Recursos binarios que no se descargan: no contienen enlaces ni referencias a buckets legibles
+SKIP_EXTENSIONS = re.compile(r'\.(?:png|jpe?g|gif|webp|ico|bmp|svgz|woff2?|ttf|otf|eot|mp[34]|webm|avi|mov|pdf|zip|gz|tar|rar|7z|exe|dmg|iso)$',
+                             re.IGNORECASE)
+
+def normalize_url(url: str, base: Optional[str] = None) -> Optional[str]:
+    """
+    Forma canónica de una URL para deduplicar el frontier.
+
+    Resuelve la URL relativa contra `base`, descarta el fragmento, pasa esquema y host a minúsculas,
+    quita el puerto por defecto y ordena los parámetros de la query.
+
+    Returns:
+        Optional[str]: URL normalizada, o None si no es HTTP(S) o está mal formada.
+    """
+    try:
+        parts = urlsplit(urljoin(base, url.strip()) if base else url.strip())
+        scheme = parts.scheme.lower()
+        if scheme not in DEFAULT_PORTS or not parts.hostname:
+            return None
+        port = parts.port
+    except ValueError:
+        return None
+    netloc = parts.hostname.lower() if port in (None, DEFAULT_PORTS[scheme]) else f"{parts.hostname.lower()}:{port}"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, netloc, parts.path or '/', query, ''))
+
+def gather_cloud_links(html: str, providers: Optional[Iterable[str]] = None) -> List[CloudBucket]:
     """
-    Extrae URLs relacionadas con servicios en la nube desde contenido HTML.
-    
+    Extrae los buckets de almacenamiento en la nube referenciados en el contenido de una página.
+
     Args:
-        html (str): Contenido HTML a analizar.
-        cloud_domains (List[str], optional): Dominios de proveedores de nube.
-    
+        html (str): Contenido HTML (o JS, CSS) a analizar.
+        providers (Iterable[str], optional): Proveedores a conservar ('s3', 'gcs', 'azure', 'digitalocean', 'aliyun'); None = todos.
+
     Returns:
-        List[str]: Lista de URLs válidas relacionadas con la nube.
+        List[CloudBucket]: Buckets referenciados, sin duplicados y sin validar.
     """
-    if not cloud_domains:
-        cloud_domains = [
-            r"amazonaws\.com",
-            r"digitaloceanspaces\.com",
-            r"windows\.net",
-            r"storage\.googleapis\.com",
-            r"aliyuncs\.com"
-        ]
-    
-    url_pattern = r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\(\), ]|(?:%[0-9a-fA-F][0-9a-fA-F]))+'
-    urls = re.findall(url_pattern, html)
-    cloud_urls = [url for url in urls if any(re.search(domain, url, re.IGNORECASE) for domain in cloud_domains)]
-    
-    valid_urls = []
-    async with aiohttp.ClientSession() as session:
-        for url in set(cloud_urls):
+    refs = extract_cloud_refs(html.encode('utf-8', 'replace'))
+    return [ref for ref in refs if providers is None or ref.provider in providers]
+
+class CloudValidator:
+    def __init__(self, session: aiohttp.ClientSession, concurrency: int):
+        """
+        Validación de buckets de nube compartida por todo el rastreo.
+
+        Cada bucket (proveedor y nombre normalizado) se comprueba una sola vez, aunque aparezca en cientos
+        de páginas; las comprobaciones corren en segundo plano, acotadas por un semáforo, sin frenar a los
+        workers del rastreo.
+
+        Args:
+            session (aiohttp.ClientSession): Sesión HTTP.
+            concurrency (int): Comprobaciones simultáneas como máximo.
+        """
+        self.session = session
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.refs: Dict[Tuple[str, str], CloudBucket] = {}
+        self.checks: Dict[Tuple[str, str], asyncio.Task] = {}
+
+    def submit(self, ref: CloudBucket) -> None:
+        """Programa la comprobación de un bucket si no se había pedido antes."""
+        key = (ref.provider, ref.bucket)
+        if key in self.checks:
+            metrics.inc('crawl_validation_cache_hits_total')
+            return
+        self.refs[key] = ref
+        self.checks[key] = asyncio.create_task(self._validate(ref))
+
+    async def _validate(self, ref: CloudBucket) -> bool:
+        url = bucket_root(ref)
+        async with self.semaphore:
             try:
-                async with session.head(url, timeout=3) as response:
-                    if response.status < 400:
-                        valid_urls.append(url)
-                        logger.info(f"Encontrada URL de nube válida: {url}")
+                async with self.session.head(url, allow_redirects=False,
+                                             timeout=aiohttp.ClientTimeout(total=settings.SETTINGS['request_timeout'])) as response:
+                    # 403 o un redirect a otra región también confirman que el bucket existe
+                    valid = response.status != 404
             except Exception as e:
-                logger.debug(f"URL inválida {url}: {e}")
-    
-    return valid_urls
+                logger.debug(f"No se pudo validar {url}: {e}")
+                metrics.inc('crawl_validations_total', result='error')
+                return False
+        metrics.inc('crawl_validations_total', result='valid' if valid else 'missing')
+        if valid:
+            logger.info(f"Encontrado bucket de nube válido: {ref.provider}:{ref.bucket} ({url})")
+        return valid
+
+    async def results(self) -> List[CloudBucket]:
+        """Espera a las comprobaciones pendientes y devuelve los buckets válidos en orden de descubrimiento."""
+        valid = await asyncio.gather(*self.checks.values())
+        return [ref for ref, ok in zip(self.refs.values(), valid) if ok]
+
+    def cancel(self) -> None:
+        """Cancela las comprobaciones pendientes (rastreo interrumpido)."""
+        for task in self.checks.values():
+            task.cancel()
 
-async def spider_cloud_resources(start_url: str, depth: int = 5, workers: int = 2, cloud_domains: Optional[List[str]] = None) -> List[str]:
+class Frontier:
+    def __init__(self, max_depth: int):
+        """
+        Frontier del rastreo: cola de prioridad por profundidad con deduplicación al encolar.
+
+        Cada URL normalizada entra una sola vez, así que una página enlazada desde cientos de otras no
+        se vuelve a encolar; las de menor profundidad salen primero (recorrido en anchura).
+
+        Args:
+            max_depth (int): Saltos máximos desde la URL inicial.
+        """
+        self.max_depth = max_depth
+        self.queue: asyncio.PriorityQueue = asyncio.PriorityQueue()
+        self.seen: Set[str] = set()
+        self.order = itertools.count()
+
+    def push(self, url: str, depth: int) -> bool:
+        """Encola una URL normalizada si no se había visto y no supera la profundidad máxima."""
+        if depth > self.max_depth or url in self.seen:
+            return False
+        self.seen.add(url)
+        self.queue.put_nowait((depth, next(self.order), url))
+        return True
+
+class HostPoliteness:
+    def __init__(self, concurrency: int, delay: float):
+        """
+        Cortesía por host: peticiones simultáneas como máximo y separación mínima entre peticiones.
+
+        Args:
+            concurrency (int): Peticiones simultáneas por host.
+            delay (float): Segundos mínimos entre el inicio de dos peticiones al mismo host.
+        """
+        self.concurrency = concurrency
+        self.delay = delay
+        self.slots: Dict[str, asyncio.Semaphore] = {}
+        self.next_start: Dict[str, float] = {}
+
+    @asynccontextmanager
+    async def slot(self, host: str) -> AsyncIterator[None]:
+        """Reserva un turno para `host`, esperando a que haya hueco y a que pase el intervalo mínimo."""
+        semaphore = self.slots.setdefault(host, asyncio.Semaphore(self.concurrency))
+        async with semaphore:
+            if self.delay:
+                now = asyncio.get_running_loop().time()
+                start = max(now, self.next_start.get(host, 0.0))
+                self.next_start[host] = start + self.delay
+                if start > now:
+                    await asyncio.sleep(start - now)
+            yield
+
+async def spider_cloud_resources(start_url: str, depth: int = 5, workers: int = 2, providers: Optional[Iterable[str]] = None,
+                                 max_pages: Optional[int] = None, max_bytes: Optional[int] = None) -> List[CloudBucket]:
     """
-    Rastrea un sitio web para descubrir URLs relacionadas con servicios en la nube.
-    
+    Rastrea un sitio web para descubrir buckets de almacenamiento en la nube.
+
+    Un pool fijo de workers toma URLs del frontier de forma continua (una página lenta solo ocupa a su
+    worker), respetando la cortesía por host y el presupuesto de páginas y bytes. Solo se siguen los
+    enlaces del mismo host que la URL inicial. Los buckets referenciados se validan en segundo plano,
+    una sola vez cada uno (ver CloudValidator).
+
     Args:
         start_url (str): URL inicial para el rastreo.
-        depth (int): Profundidad máxima de rastreo.
+        depth (int): Saltos máximos desde la URL inicial.
         workers (int): Número de workers concurrentes.
-        cloud_domains (List[str], optional): Dominios de proveedores de nube.
-    
+        providers (Iterable[str], optional): Proveedores de almacenamiento a considerar; None = todos.
+        max_pages (int, optional): Páginas máximas a descargar (por defecto 'crawl_max_pages').
+        max_bytes (int, optional): Bytes máximos a descargar en total (por defecto 'crawl_max_mb').
+
     Returns:
-        List[str]: Lista de URLs relacionadas con la nube.
+        List[CloudBucket]: Buckets que existen, listos para pasarlos al escáner como candidatos.
     """
-    crawled_urls = set()
-    cloud_urls = set()
-    to_crawl = [start_url]
-    target_domain = urlparse(start_url).netloc
-    
-    async with aiohttp.ClientSession() as session:
-        while to_crawl:
-            tasks = []
-            for url in to_crawl[:workers]:
-                if url in crawled_urls or urlparse(url).netloc != target_domain or url.count("/") > depth + 2:
+    max_pages = max_pages or settings.SETTINGS['crawl_max_pages']
+    max_bytes = max_bytes or int(settings.SETTINGS['crawl_max_mb'] * 1024 * 1024)
+    page_limit = int(settings.SETTINGS['crawl_page_max_mb'] * 1024 * 1024)
+    politeness = HostPoliteness(settings.SETTINGS['crawl_host_concurrency'], settings.SETTINGS['crawl_host_delay'])
+    frontier = Frontier(depth)
+    first = normalize_url(start_url)
+    if not first:
+        logger.error(f"URL inicial no válida para el rastreo: {start_url}")
+        return []
+    target_host = urlsplit(first).netloc
+    frontier.push(first, 0)
+    budget = {'pages': 0, 'bytes': 0}
+    session = http_client.get_session('crawler')
+    validator = CloudValidator(session, settings.SETTINGS['crawl_validation_workers'])
+    metrics.REGISTRY.gauge_callback('crawl_frontier_depth', frontier.queue.qsize)
+
+    async def worker() -> None:
+        while True:
+            page_depth, _, url = await frontier.queue.get()
+            try:
+                # Agotado el presupuesto, el resto del frontier se descarta sin descargar
+                if budget['pages'] >= max_pages or budget['bytes'] >= max_bytes:
                     continue
-                tasks.append(crawl_page(session, url, cloud_domains))
-                crawled_urls.add(url)
-            
-            to_crawl = to_crawl[workers:]
-            results = await asyncio.gather(*tasks, return_exceptions=True)
-            
-            for new_urls in results:
-                if isinstance(new_urls, list):
-                    cloud_urls.update([url for url in new_urls if urlparse(url).netloc in cloud_domains])
-                    to_crawl.extend([url for url in new_urls if url not in crawled_urls and urlparse(url).netloc == target_domain])
-            
-            logger.info(f"Rastreadas {len(crawled_urls)} URLs, encontradas {len(cloud_urls)} URLs de nube, {len(to_crawl)} URLs por rastrear")
-    
-    return list(cloud_urls)
-
-async def crawl_page(session: aiohttp.ClientSession, url: str, cloud_domains: Optional[List[str]]) -> List[str]:
+                budget['pages'] += 1
+                async with politeness.slot(urlsplit(url).netloc):
+                    links, found, size = await crawl_page(session, url, providers,
+                                                          min(page_limit, max_bytes - budget['bytes']))
+                budget['bytes'] += size
+                for ref in found:
+                    validator.submit(ref)
+                for link in links:
+                    if urlsplit(link).netloc == target_host:
+                        frontier.push(link, page_depth + 1)
+                if budget['pages'] % 100 == 0:
+                    logger.info(f"Rastreadas {budget['pages']} URLs, {len(validator.checks)} buckets de nube referenciados, "
+                                f"{frontier.queue.qsize()} URLs por rastrear")
+            except Exception as e:
+                logger.error(f"Error al procesar {url}: {e}")
+            finally:
+                frontier.queue.task_done()
+
+    tasks = [asyncio.create_task(worker()) for _ in range(max(workers, 1))]
+    try:
+        await frontier.queue.join()
+        found = await validator.results()
+    finally:
+        for task in tasks:
+            task.cancel()
+        validator.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    if budget['pages'] >= max_pages or budget['bytes'] >= max_bytes:
+        logger.warning(f"Rastreo detenido por presupuesto ({budget['pages']} páginas, {budget['bytes'] / 1024 / 1024:.1f} MB)")
+    logger.info(f"Rastreadas {budget['pages']} URLs ({len(frontier.seen)} descubiertas), "
+                f"{len(found)} de {len(validator.checks)} buckets de nube referenciados existen")
+    return found
+
+async def crawl_page(session: aiohttp.ClientSession, url: str, providers: Optional[Iterable[str]],
+                     max_bytes: int) -> Tuple[List[str], List[CloudBucket], int]:
     """
-    Rastrea una página individual y extrae URLs relacionadas con la nube.
-    
+    Rastrea una página individual y extrae sus enlaces y los buckets de nube referenciados.
+
+    Los buckets se extraen sobre la marcha, fragmento a fragmento; solo el HTML se acumula (para sacar los
+    enlaces), de modo que los bundles JS grandes no se cargan enteros en memoria.
+
     Args:
         session (aiohttp.ClientSession): Sesión HTTP.
         url (str): URL a rastrear.
-        cloud_domains (List[str], optional): Dominios de proveedores de nube.
-    
+        providers (Iterable[str], optional): Proveedores de almacenamiento a considerar; None = todos.
+        max_bytes (int): Bytes máximos a leer de la respuesta.
+
     Returns:
-        List[str]: Lista de URLs encontradas.
+        Tuple[List[str], List[CloudBucket], int]: Enlaces normalizados (solo de páginas HTML), buckets y bytes leídos.
     """
     try:
-        async with session.get(url, timeout=5) as response:
-            if response.status == 200:
-                html = await response.text()
-                return await gather_cloud_links(html, cloud_domains)
-            return []
+        async with session.get(url, timeout=aiohttp.ClientTimeout(total=settings.SETTINGS['request_timeout'])) as response:
+            metrics.inc('crawl_pages_total', status=response.status)
+            if response.status != 200:
+                return [], [], 0
+            is_html = response.content_type in HTML_TYPES
+            extractor = CloudRefExtractor()
+            refs: List[CloudBucket] = []
+            chunks: List[bytes] = []
+            size = 0
+            async for chunk in response.content.iter_chunked(64 * 1024):
+                chunk = chunk[:max_bytes - size]
+                size += len(chunk)
+                refs.extend(extractor.feed(chunk))
+                if is_html:
+                    chunks.append(chunk)
+                if size >= max_bytes:
+                    logger.debug(f"{url} supera el límite de {max_bytes} bytes, se analiza solo el principio")
+                    break
+            refs.extend(extractor.close())
+            metrics.inc('crawl_bytes_total', size)
+            links: List[str] = []
+            if is_html:
+                text = b''.join(chunks).decode('utf-8', errors='replace')
+                links = [link for link in (normalize_url(href, str(response.url)) for href in LINK_ATTR.findall(text))
+                         if link and not SKIP_EXTENSIONS.search(urlsplit(link).path)]
+            return links, [ref for ref in refs if providers is None or ref.provider in providers], size
     except Exception as e:
         logger.error(f"Error al rastrear {url}: {e}")
-        return []
\ No newline at end of file
+        return [], [], 0
@@ -0,0 +1,177 @@
+import asyncio
+import bisect
+import hashlib
+import sqlite3
+import threading
+import time
+import logging
+from typing import AsyncIterator, Dict, Iterable, List, Optional
+
+logger = logging.getLogger('S3Hunter-X')
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'big')
+
+class HashRing:
+    def __init__(self, shards: int, replicas: int = 64):
+        """
+        Anillo de hash consistente que asigna cada bucket a un shard.
+
+        Args:
+            shards (int): Número de shards.
+            replicas (int): Nodos virtuales por shard, para repartir la carga de forma uniforme.
+        """
+        self.shards = shards
+        points = sorted((_hash(f"shard-{shard}-{replica}"), shard) for shard in range(shards) for replica in range(replicas))
+        self.keys = [point for point, _ in points]
+        self.nodes = [shard for _, shard in points]
+
+    def shard_for(self, bucket: str) -> int:
+        """Shard responsable de un bucket."""
+        index = bisect.bisect(self.keys, _hash(bucket)) % len(self.keys)
+        return self.nodes[index]
+
+class WorkQueue:
+    def __init__(self, db_path: str, lease_seconds: float = 300, max_attempts: int = 3):
+        """
+        Cola de trabajo persistente en SQLite compartida por el coordinador y los workers.
+
+        Cada bucket se guarda una sola vez (encolar es idempotente). Un worker lo reserva durante
+        `lease_seconds`; si no lo confirma a tiempo, otro worker puede reservarlo de nuevo, hasta
+        `max_attempts` intentos. Las escrituras de resultados son upserts, así que repetir un bucket
+        no duplica filas.
+
+        Args:
+            db_path (str): Ruta de la base de datos de la cola (en almacenamiento compartido si hay varios hosts).
+            lease_seconds (float): Duración de una reserva.
+            max_attempts (int): Reservas máximas por bucket antes de darlo por fallido.
+        """
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        with self.lock, self.conn:
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.execute('''CREATE TABLE IF NOT EXISTS work_items (
+                bucket TEXT PRIMARY KEY,
+                shard INTEGER NOT NULL,
+                state TEXT NOT NULL DEFAULT 'pending',
+                worker TEXT,
+                lease_until REAL,
+                attempts INTEGER NOT NULL DEFAULT 0
+            )''')
+            self.conn.execute('CREATE INDEX IF NOT EXISTS idx_work_state ON work_items (state, shard)')
+            self.conn.execute('CREATE TABLE IF NOT EXISTS queue_meta (key TEXT PRIMARY KEY, value TEXT)')
+
+    def _set_meta(self, key: str, value: str) -> None:
+        self.conn.execute("INSERT OR REPLACE INTO queue_meta (key, value) VALUES (?, ?)", (key, value))
+
+    def _get_meta(self, key: str) -> Optional[str]:
+        row = self.conn.execute("SELECT value FROM queue_meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def reset(self, shards: int) -> None:
+        """Vacía la cola para una nueva ejecución del coordinador."""
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM work_items")
+            self._set_meta('shards', str(shards))
+            self._set_meta('producer_done', '0')
+
+    @property
+    def shards(self) -> int:
+        with self.lock:
+            return int(self._get_meta('shards') or 1)
+
+    def enqueue_many(self, buckets: Iterable[str], ring: HashRing) -> int:
+        """Encola buckets asignando su shard; los ya presentes se ignoran. Devuelve cuántos se añadieron."""
+        with self.lock, self.conn:
+            before = self.conn.total_changes
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO work_items (bucket, shard) VALUES (?, ?)",
+                ((bucket, ring.shard_for(bucket)) for bucket in buckets)
+            )
+            return self.conn.total_changes - before
+
+    def finish_producing(self) -> None:
+        """Indica a los workers que no se encolarán más buckets."""
+        with self.lock, self.conn:
+            self._set_meta('producer_done', '1')
+
+    def lease(self, worker_id: str, shard: int, limit: int) -> List[str]:
+        """
+        Reserva hasta `limit` buckets para un worker.
+
+        Se sirven primero los del shard propio; cuando se agotan, el worker roba trabajo de otros shards
+        para que ningún proceso quede ocioso mientras quede cola.
+        """
+        now = time.time()
+        with self.lock, self.conn:
+            rows = self.conn.execute(
+                """UPDATE work_items SET state = 'leased', worker = ?, lease_until = ?, attempts = attempts + 1
+                   WHERE bucket IN (
+                       SELECT bucket FROM work_items
+                       WHERE (state = 'pending' OR (state = 'leased' AND lease_until < ?)) AND attempts < ?
+                       ORDER BY shard != ?, rowid LIMIT ?
+                   ) RETURNING bucket""",
+                (worker_id, now + self.lease_seconds, now, self.max_attempts, shard, limit)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def complete(self, worker_id: str, buckets: List[str]) -> None:
+        """Marca buckets como terminados; repetir la confirmación no tiene efecto."""
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "UPDATE work_items SET state = 'done', worker = ? WHERE bucket = ? AND state != 'done'",
+                ((worker_id, bucket) for bucket in buckets)
+            )
+
+    def drained(self) -> bool:
+        """True si el productor terminó y no queda trabajo pendiente ni reservas vivas o reintentables."""
+        now = time.time()
+        with self.lock:
+            if self._get_meta('producer_done') != '1':
+                return False
+            row = self.conn.execute(
+                """SELECT 1 FROM work_items
+                   WHERE state = 'pending' OR (state = 'leased' AND (lease_until >= ? OR attempts < ?)) LIMIT 1""",
+                (now, self.max_attempts)
+            ).fetchone()
+        return row is None
+
+    def counts(self) -> Dict[str, int]:
+        """Número de buckets por estado."""
+        with self.lock:
+            return dict(self.conn.execute("SELECT state, COUNT(*) FROM work_items GROUP BY state").fetchall())
+
+    def close(self) -> None:
+        with self.lock:
+            self.conn.close()
+
+async def enqueue_candidates(queue: WorkQueue, ring: HashRing, candidates: Iterable[str], chunk_size: int = 1000) -> int:
+    """Encola candidatos por bloques sin bloquear el bucle de eventos y marca el fin de la producción."""
+    total = 0
+    chunk: List[str] = []
+    for bucket in candidates:
+        chunk.append(bucket)
+        if len(chunk) >= chunk_size:
+            total += await asyncio.to_thread(queue.enqueue_many, chunk, ring)
+            chunk = []
+    if chunk:
+        total += await asyncio.to_thread(queue.enqueue_many, chunk, ring)
+    await asyncio.to_thread(queue.finish_producing)
+    logger.info(f"Coordinador: {total} buckets encolados en {ring.shards} shards")
+    return total
+
+async def leased_buckets(queue: WorkQueue, worker_id: str, batch_size: int = 100,
+                         poll_interval: float = 1.0) -> AsyncIterator[str]:
+    """Entrega los buckets reservados por un worker hasta que la cola se vacía."""
+    worker_index = int(worker_id) if worker_id.isdigit() else _hash(worker_id)
+    while True:
+        buckets = await asyncio.to_thread(queue.lease, worker_id, worker_index % queue.shards, batch_size)
+        if buckets:
+            for bucket in buckets:
+                yield bucket
+            continue
+        if await asyncio.to_thread(queue.drained):
+            return
+        await asyncio.sleep(poll_interval)
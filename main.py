@@ -2,23 +2,33 @@ import os
 import sys
 import asyncio
 import sqlite3
+import json
 import logging
 import argparse
 import re
 import time
+import itertools
 from datetime import datetime
 from tabulate import tabulate
-from tenacity import retry, stop_after_attempt, wait_exponential
 import aiohttp
 import signal
-from typing import List
+from typing import AsyncIterator, List, Iterator, Optional
 from config import settings
 from core.utils import load_module, is_authorized_domain
 from core.analyzer import Analyzer
+from core.offload import AnalysisPool
 from core.downloader import send_telegram_notification
 from core.logger import setup_logger
-from core.aws_utils import check_bucket_access
+from core.aws_utils import ACLChecker
 from core.web_crawler import spider_cloud_resources
+from core.dns_resolver import DNSResolver, find_storage_buckets
+from core.cache import ScanCache
+from core.db_writer import DBWriter
+from core.checkpoint import ScanCheckpoint
+from core.ratelimit import AdaptiveRateLimiter
+from core import http_client, metrics
+from core.proxies import validate_proxies, ProxyPool
+from core.work_queue import WorkQueue, HashRing, enqueue_candidates, leased_buckets
 
 def parse_args() -> argparse.Namespace:
     """Parsea los argumentos de la línea de comandos."""
@@ -27,14 +37,24 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument('--buckets-file', type=str, default='data/buckets.txt', help='Archivo con lista de buckets')
     parser.add_argument('--wordlist', type=str, default=None, help='Archivo de wordlist para fuzzing')
     parser.add_argument('--subdomains', type=str, default=None, help='Archivo con subdominios')
+    parser.add_argument('--dns-servers', nargs='+', default=settings.SETTINGS['dns_nameservers'], metavar='IP', help='Servidores DNS para resolver los subdominios (por defecto, los del sistema)')
+    parser.add_argument('--dns-concurrency', type=int, default=settings.SETTINGS['dns_concurrency'], help='Consultas DNS simultáneas al resolver los subdominios')
     parser.add_argument('--permutations', type=str, default=None, help='Archivo con patrones de permutaciones')
     parser.add_argument('--crawl-url', type=str, default=None, help='URL para rastrear en busca de buckets S3')
+    parser.add_argument('--crawl-max-pages', type=int, default=settings.SETTINGS['crawl_max_pages'], help='Páginas máximas a descargar durante el rastreo web')
+    parser.add_argument('--crawl-max-mb', type=float, default=settings.SETTINGS['crawl_max_mb'], help='Megabytes máximos a descargar durante el rastreo web')
     parser.add_argument('--exhaustive', action='store_true', help='Modo exhaustivo para generar más buckets')
     parser.add_argument('--max-buckets', type=int, default=10000, help='Máximo número de buckets a generar')
-    parser.add_argument('--batch-size', type=int, default=1000, help='Tamaño del lote para escaneo')
-    parser.add_argument('--delay', type=float, default=1.0, help='Retraso entre lotes (segundos)')
+    parser.add_argument('--batch-size', type=int, default=1000, help='Intervalo de buckets procesados entre reportes de progreso')
+    parser.add_argument('--delay', type=float, default=1.0, help='Obsoleto: el ritmo se controla con --rate')
+    parser.add_argument('--rate', type=float, default=settings.SETTINGS['scan_rate'], help='Ritmo inicial de peticiones por segundo y endpoint S3 (0 = sin límite)')
+    parser.add_argument('--max-rate', type=float, default=settings.SETTINGS['scan_max_rate'], help='Ritmo máximo por endpoint al que puede crecer el limitador adaptativo')
     parser.add_argument('--max-workers', type=int, default=20, help='Número máximo de workers concurrentes')
     parser.add_argument('--max-file-size', type=int, default=50, help='Tamaño máximo de archivo a descargar (MB)')
+    parser.add_argument('--analysis-workers', type=int, default=settings.SETTINGS['analysis_workers'], help='Procesos para analizar los listados (por defecto uno por núcleo, 0 = en el proceso principal)')
+    parser.add_argument('--download-workers', type=int, default=4, help='Número de descargas concurrentes')
+    parser.add_argument('--download-budget', type=float, default=1024, help='Presupuesto total de descarga por ejecución (MB, 0 = sin límite)')
+    parser.add_argument('--save-files', action='store_true', help='Guardar en disco los archivos de alto riesgo (descarga completa en lugar de cortar en el primer hallazgo)')
     parser.add_argument('--output', type=str, default='results', help='Prefijo para archivos de salida')
     parser.add_argument('--report-formats', nargs='+', default=['md', 'json', 'csv'], help='Formatos de reporte')
     parser.add_argument('--log-level', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'], default='INFO', help='Nivel de logging')
@@ -42,6 +62,21 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument('--telegram-chat-id', type=str, default=os.getenv('TELEGRAM_CHAT_ID'), help='Chat ID de Telegram')
     parser.add_argument('--aws-access-key', type=str, default=os.getenv('AWS_ACCESS_KEY'), help='Clave de acceso AWS')
     parser.add_argument('--aws-secret-key', type=str, default=os.getenv('AWS_SECRET_KEY'), help='Clave secreta AWS')
+    parser.add_argument('--s3-endpoint', type=str, default=settings.SETTINGS['s3_endpoint'], help='Endpoint compatible con S3 (MinIO, LocalStack); se accede con estilo path')
+    parser.add_argument('--path-style', action='store_true', default=settings.SETTINGS['s3_path_style'], help='Sondear en estilo path (s3.<región>.amazonaws.com/<bucket>) reutilizando conexiones; vuelve a virtual-hosted si el bucket lo exige')
+    parser.add_argument('--no-region-discovery', action='store_true', help='Probar todas las regiones en lugar de resolver la región con un HEAD')
+    parser.add_argument('--cache-ttl', nargs='+', default=[], metavar='ESTADO=HORAS', help='TTL de la caché de escaneo por estado (ej. NOT_FOUND=168 PRIVATE=24)')
+    parser.add_argument('--no-cache', action='store_true', help='Ignorar la caché de escaneo persistente')
+    parser.add_argument('--proxies', nargs='+', default=settings.SETTINGS['proxies'], metavar='URL', help='Proxies HTTP de salida (se validan al iniciar)')
+    parser.add_argument('--proxy-check-url', type=str, default=settings.SETTINGS['proxy_check_url'], help='Endpoint usado para comprobar los proxies')
+    parser.add_argument('--mode', choices=['standalone', 'coordinator', 'worker'], default='standalone', help='Modo de ejecución: proceso único, coordinador que reparte la cola o worker que la consume')
+    parser.add_argument('--queue-db', type=str, default=settings.SETTINGS['queue_database'], help='Base de datos SQLite de la cola de trabajo compartida')
+    parser.add_argument('--shards', type=int, default=None, help='Número de shards del anillo de hash (por defecto, uno por worker local)')
+    parser.add_argument('--worker-id', type=str, default='0', help='Identificador del worker (su número determina el shard preferente)')
+    parser.add_argument('--local-workers', type=int, default=0, help='Workers que el coordinador lanza como procesos locales')
+    parser.add_argument('--metrics-port', type=int, default=settings.SETTINGS['metrics_port'], help='Puerto del endpoint /metrics en formato Prometheus (0 = desactivado)')
+    parser.add_argument('--metrics-file', type=str, default=settings.SETTINGS['metrics_file'], help='Archivo JSON donde se vuelcan las métricas periódicamente')
+    parser.add_argument('--resume', type=str, default=None, metavar='RUN_ID', help='Reanudar una ejecución interrumpida desde su último checkpoint')
     parser.add_argument('--purge-db', action='store_true', help='Purgar la base de datos antes de iniciar')
     parser.add_argument('--verbose', action='store_true', help='Mostrar información detallada')
     
@@ -54,6 +89,37 @@ def parse_args() -> argparse.Namespace:
         parser.error("batch-size debe ser mayor que 0")
     if args.max_workers <= 0:
         parser.error("max-workers debe ser mayor que 0")
+    for proxy in args.proxies:
+        if not re.match(r'^https?://[^\s/]+', proxy):
+            parser.error(f"Proxy no válido: {proxy}")
+    if args.rate < 0:
+        parser.error("rate no puede ser negativo")
+    if args.rate and args.max_rate < args.rate:
+        parser.error("max-rate debe ser mayor o igual que rate")
+    if args.shards is not None and args.shards <= 0:
+        parser.error("shards debe ser mayor que 0")
+    if args.local_workers < 0:
+        parser.error("local-workers no puede ser negativo")
+    if args.resume and args.mode != 'standalone':
+        parser.error("--resume solo está disponible en modo standalone (la cola compartida ya es persistente)")
+    if args.resume and args.purge_db:
+        parser.error("--resume no se puede combinar con --purge-db")
+    if not 0 <= args.metrics_port <= 65535:
+        parser.error("metrics-port debe estar entre 0 y 65535")
+    if args.analysis_workers is not None and args.analysis_workers < 0:
+        parser.error("analysis-workers no puede ser negativo")
+    if args.download_workers <= 0:
+        parser.error("download-workers debe ser mayor que 0")
+    cache_ttl = dict(settings.SETTINGS['cache_ttl'])
+    for item in args.cache_ttl:
+        status, _, hours = item.partition('=')
+        try:
+            cache_ttl[status.strip().upper()] = float(hours) * 3600
+        except ValueError:
+            parser.error(f"Valor de --cache-ttl no válido: {item}")
+        if cache_ttl[status.strip().upper()] < 0:
+            parser.error(f"El TTL de caché no puede ser negativo: {item}")
+    args.cache_ttl = cache_ttl
     return args
 
 def init_db(db_path: str) -> None:
@@ -82,46 +148,195 @@ def init_db(db_path: str) -> None:
             if 'region' not in columns:
                 c.execute("ALTER TABLE results ADD COLUMN region TEXT")
                 logging.getLogger('S3Hunter-X').info("Columna 'region' añadida a la tabla 'results'")
+            if 'revision' not in columns:
+                c.execute("ALTER TABLE results ADD COLUMN revision INTEGER")
+                logging.getLogger('S3Hunter-X').info("Columna 'revision' añadida a la tabla 'results'")
+            # Cada alta o cambio de riesgo recibe una revisión creciente: es la marca de agua de los reportes parciales
+            for trigger, event in (('results_revision_insert', 'INSERT'),
+                                   ('results_revision_update', 'UPDATE OF risk, content_risk, url, region')):
+                c.execute(f'''CREATE TRIGGER IF NOT EXISTS {trigger} AFTER {event} ON results BEGIN
+                    UPDATE results SET revision = (SELECT IFNULL(MAX(revision), 0) + 1 FROM results) WHERE id = NEW.id;
+                END''')
             c.execute('''CREATE TABLE IF NOT EXISTS scanned_buckets (
                 bucket TEXT PRIMARY KEY,
                 status TEXT,
                 region TEXT,
                 owner TEXT,
                 acls TEXT,
+                policy_public INTEGER,
+                public_access_block TEXT,
                 timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
             )''')
+            c.execute("PRAGMA table_info(scanned_buckets)")
+            bucket_columns = [col[1] for col in c.fetchall()]
+            for column, column_type in (('policy_public', 'INTEGER'), ('public_access_block', 'TEXT')):
+                if column not in bucket_columns:
+                    c.execute(f"ALTER TABLE scanned_buckets ADD COLUMN {column} {column_type}")
+                    logging.getLogger('S3Hunter-X').info(f"Columna '{column}' añadida a la tabla 'scanned_buckets'")
             c.execute('CREATE INDEX IF NOT EXISTS idx_bucket ON results (bucket)')
             c.execute('CREATE INDEX IF NOT EXISTS idx_risk ON results (risk)')
+            c.execute('CREATE INDEX IF NOT EXISTS idx_revision ON results (revision)')
             conn.commit()
         logging.getLogger('S3Hunter-X').info("Base de datos inicializada con WAL y índices")
     except sqlite3.Error as e:
         logging.getLogger('S3Hunter-X').error(f"Error al inicializar base de datos: {e}")
         raise
 
-async def cleanup(session: aiohttp.ClientSession = None, db_conn: sqlite3.Connection = None):
-    """Cierra recursos abiertos (sesión HTTP y conexión a la base de datos)."""
+def worker_command(argv: List[str], worker_id: int) -> List[str]:
+    """Línea de comandos de un worker local: la del coordinador sin las opciones propias del coordinador."""
+    with_value = {'--mode', '--local-workers', '--worker-id', '--shards'}
+    flags = {'--purge-db'}
+    command = []
+    skip = False
+    for arg in argv:
+        if skip:
+            skip = False
+            continue
+        name = arg.split('=', 1)[0]
+        if name in with_value:
+            skip = '=' not in arg
+            continue
+        if name in flags:
+            continue
+        command.append(arg)
+    return [sys.executable, os.path.abspath(__file__), *command, '--mode', 'worker', '--worker-id', str(worker_id)]
+
+async def run_coordinator(args: argparse.Namespace, work_queue: WorkQueue, candidates: Iterator[str],
+                          stop: Optional[asyncio.Event] = None) -> None:
+    """
+    Reparte los candidatos en shards de la cola, lanza los workers locales y espera a que la cola se vacíe.
+
+    Si se activa `stop` (SIGINT/SIGTERM), se envía SIGTERM a los workers locales para que guarden su progreso
+    y se deja de esperar; los buckets no confirmados siguen en la cola para la próxima ejecución.
+    """
+    logger = logging.getLogger('S3Hunter-X')
+    stop = stop or asyncio.Event()
+    shards = args.shards or max(args.local_workers, 1)
+    ring = HashRing(shards)
+    work_queue.reset(shards)
+    # Los workers arrancan antes de terminar de encolar: empiezan a escanear con los primeros bloques. Van en su
+    # propia sesión para que un Ctrl+C en la terminal no les llegue dos veces (directo y reenviado por forward_stop)
+    workers = [await asyncio.create_subprocess_exec(*worker_command(sys.argv[1:], i), start_new_session=True)
+               for i in range(args.local_workers)]
+    logger.info(f"Coordinador: {len(workers)} workers locales lanzados sobre {shards} shards")
+
+    async def forward_stop() -> None:
+        await stop.wait()
+        for worker in workers:
+            if worker.returncode is None:
+                worker.terminate()
+
+    forwarder = asyncio.create_task(forward_stop())
+    try:
+        await enqueue_candidates(work_queue, ring, candidates)
+        if workers:
+            codes = await asyncio.gather(*(worker.wait() for worker in workers))
+            failed = [i for i, code in enumerate(codes) if code != 0]
+            if failed:
+                logger.error(f"Workers terminados con error: {failed}")
+        else:
+            logger.info("Coordinador: esperando a workers externos")
+        while not stop.is_set() and not await asyncio.to_thread(work_queue.drained):
+            if workers:
+                logger.warning(f"Quedan buckets sin procesar tras terminar los workers locales: {work_queue.counts()}")
+                break
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=5)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        forwarder.cancel()
+    logger.info(f"Coordinador: cola finalizada {work_queue.counts()}")
+
+async def until_stopped(items: AsyncIterator, stop: asyncio.Event) -> AsyncIterator:
+    """Entrega los elementos de un iterador asíncrono hasta que se agota o se activa `stop`, sin esperar al siguiente."""
+    stopper = asyncio.ensure_future(stop.wait())
+    try:
+        while True:
+            step = asyncio.ensure_future(items.__anext__())
+            await asyncio.wait({step, stopper}, return_when=asyncio.FIRST_COMPLETED)
+            if not step.done():
+                # Cancelar la espera ejecuta el finally del generador (en scan_stream, cancela las sondas y vacía la caché)
+                step.cancel()
+                await asyncio.gather(step, return_exceptions=True)
+                return
+            try:
+                yield step.result()
+            except StopAsyncIteration:
+                return
+    finally:
+        stopper.cancel()
+
+def stream_candidates(priority: List[str], generated: Iterator[str], authorized: List[str], output_file: str,
+                      recorded: int = 0) -> Iterator[str]:
+    """
+    Encadena los candidatos prioritarios y los generados, filtra los no autorizados y los registra en output_file.
+
+    Con `recorded` > 0 (ejecución reanudada) el archivo no se trunca: los primeros `recorded` candidatos ya
+    están escritos y solo se añaden los siguientes.
+    """
+    logger = logging.getLogger('S3Hunter-X')
+    seen = set(priority)
+    os.makedirs(os.path.dirname(output_file) or '.', exist_ok=True)
+    with open(output_file, 'a' if recorded else 'w', encoding='utf-8') as f:
+        position = 0
+        for bucket in itertools.chain(priority, (b for b in generated if b not in seen)):
+            if not is_authorized_domain(bucket, authorized):
+                logger.debug(f"Bucket no autorizado descartado: {bucket}")
+                continue
+            if position >= recorded:
+                f.write(f"{bucket}\n")
+            position += 1
+            yield bucket
+
+async def cleanup(db_conn: sqlite3.Connection = None, scan_cache: ScanCache = None, db_writer: DBWriter = None,
+                  checkpoint: ScanCheckpoint = None):
+    """Cierra recursos abiertos (sesiones HTTP compartidas, caché de escaneo, checkpoint, escritor y conexión a la base de datos)."""
     logger = logging.getLogger('S3Hunter-X')
-    if session and not session.closed:
-        await session.close()
-        logger.info("Sesión HTTP cerrada")
+    await http_client.close_sessions()
+    if scan_cache:
+        scan_cache.close()
+    if checkpoint:
+        # El progreso se encola antes de cerrar el escritor, que lo confirma junto a los últimos resultados
+        try:
+            checkpoint.save()
+        except Exception as e:
+            logger.error(f"No se pudo guardar el checkpoint de la ejecución {checkpoint.run_id}: {e}")
+        checkpoint.close()
+    if db_writer:
+        db_writer.close()
     if db_conn:
         db_conn.close()
         logger.info("Conexión a la base de datos cerrada")
 
-def handle_shutdown(loop, session, db_conn):
-    """Maneja la señal de interrupción (SIGINT)."""
+def install_shutdown_handlers(stop: asyncio.Event) -> None:
+    """
+    Convierte SIGINT y SIGTERM en una parada ordenada.
+
+    La primera señal activa `stop`: el bucle de escaneo deja de consumir candidatos y el bloque finally de
+    main guarda el checkpoint y vacía el escritor y la caché, así que un worker detenido por un orquestador
+    puede reanudarse. Una segunda señal cancela la tarea principal (la limpieza se ejecuta igualmente).
+    """
     logger = logging.getLogger('S3Hunter-X')
-    logger.info("Interrupción detectada (Ctrl+C), cerrando recursos...")
-    tasks = [task for task in asyncio.all_tasks(loop) if task is not asyncio.current_task()]
-    for task in tasks:
-        task.cancel()
-    loop.run_until_complete(loop.create_task(cleanup(session, db_conn)))
-    loop.run_until_complete(loop.shutdown_asyncgens())
-    loop.close()
-    logger.info("Programa terminado limpiamente")
-    sys.exit(0)
+    loop = asyncio.get_running_loop()
+    main_task = asyncio.current_task()
+
+    def request_stop(signum: int) -> None:
+        name = signal.Signals(signum).name
+        if stop.is_set():
+            logger.warning(f"{name} recibida de nuevo, cancelando sin esperar")
+            main_task.cancel()
+            return
+        logger.info(f"{name} recibida, deteniendo el escaneo y guardando el progreso...")
+        stop.set()
+
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(signum, request_stop, signum)
+        except (NotImplementedError, RuntimeError):
+            # Windows no admite add_signal_handler: la señal se reenvía al bucle desde el manejador clásico
+            signal.signal(signum, lambda s, f: loop.call_soon_threadsafe(request_stop, s))
 
-@retry(stop=stop_after_attempt(5), wait=wait_exponential(multiplier=2, min=4, max=60))
 async def main() -> None:
     """Punto de entrada de S3Hunter-X."""
     print("""
@@ -131,6 +346,8 @@ async def main() -> None:
     
     args = parse_args()
     logger = setup_logger(log_level=args.log_level)
+    stop = asyncio.Event()
+    install_shutdown_handlers(stop)
     
     telegram_enabled = False
     if args.telegram_token and args.telegram_chat_id:
@@ -141,14 +358,15 @@ async def main() -> None:
         else:
             telegram_enabled = True
             logger.info("Configuración de Telegram validada")
-            logger.debug("Enviando notificación de prueba a Telegram")
-            success = await send_telegram_notification(
-                f"🚀 S3Hunter-X iniciado para el dominio: {args.target_domain}",
-                args.telegram_token,
-                args.telegram_chat_id
-            )
-            if not success:
-                logger.warning("Fallo al enviar notificación de prueba a Telegram. Verifica el token y chat ID.")
+            if args.mode != 'worker':
+                logger.debug("Enviando notificación de prueba a Telegram")
+                success = await send_telegram_notification(
+                    f"🚀 S3Hunter-X iniciado para el dominio: {args.target_domain}",
+                    args.telegram_token,
+                    args.telegram_chat_id
+                )
+                if not success:
+                    logger.warning("Fallo al enviar notificación de prueba a Telegram. Verifica el token y chat ID.")
     
     aws_enabled = bool(args.aws_access_key and args.aws_secret_key)
     if aws_enabled:
@@ -158,22 +376,51 @@ async def main() -> None:
         'buckets_file': args.buckets_file,
         'max_workers': min(args.max_workers, 100),
         'max_file_size_mb': args.max_file_size,
+        'save_flagged_files': args.save_files,
         'telegram_token': args.telegram_token if telegram_enabled else '',
         'telegram_chat_id': args.telegram_chat_id if telegram_enabled else '',
         'aws_access_key': args.aws_access_key if aws_enabled else '',
         'aws_secret_key': args.aws_secret_key if aws_enabled else '',
         'request_timeout': 10,
-        's3_regions': ['us-east-1', 'us-west-2', 'eu-west-1', 'ap-southeast-1', 'ap-northeast-1', 'sa-east-1']
+        's3_regions': ['us-east-1', 'us-west-2', 'eu-west-1', 'ap-southeast-1', 'ap-northeast-1', 'sa-east-1'],
+        'region_discovery': not args.no_region_discovery,
+        'cache_ttl': args.cache_ttl,
+        'proxy_check_url': args.proxy_check_url,
+        's3_endpoint': args.s3_endpoint,
+        's3_path_style': args.path_style
     })
     
-    session = None
+    # La comprobación de proxies es un paso explícito y concurrente (importar settings no accede a la red)
+    settings.SETTINGS['proxies'] = await validate_proxies(args.proxies) if args.proxies else []
+    
     db_conn = None
+    scan_cache = None
+    db_writer = None
+    work_queue = None
+    checkpoint = None
+    metrics_server = None
+    metrics_task = None
     try:
         if args.purge_db and os.path.exists(settings.SETTINGS['database']):
             os.remove(settings.SETTINGS['database'])
             logger.info("Base de datos purgada")
         
         init_db(settings.SETTINGS['database'])
+        # Métricas por proceso: en modo distribuido cada worker debe usar su propio puerto o archivo
+        if args.metrics_port:
+            metrics_server = await metrics.start_server(settings.SETTINGS['metrics_host'], args.metrics_port)
+        if args.metrics_file:
+            metrics_task = asyncio.create_task(metrics.snapshot_loop(args.metrics_file, settings.SETTINGS['metrics_interval']))
+        # Todas las escrituras pasan por un hilo dedicado: el bucle de eventos nunca espera a un fsync de SQLite
+        db_writer = DBWriter(
+            settings.SETTINGS['database'],
+            batch_size=settings.SETTINGS['db_writer_batch'],
+            flush_interval=settings.SETTINGS['db_writer_interval'],
+            pragmas=settings.SETTINGS['sqlite_pragmas'],
+            queue_size=settings.SETTINGS['db_writer_queue_size']
+        )
+        if not args.no_cache:
+            scan_cache = ScanCache(settings.SETTINGS['database'], settings.SETTINGS['cache_ttl'], writer=db_writer)
         bucket_generator = load_module('core.bucket_generator')
         scanner = load_module('core.scanner')
         analyzer = Analyzer(settings.SETTINGS['patterns_file'])
@@ -184,127 +431,279 @@ async def main() -> None:
             logger.error("No se pudieron cargar todos los módulos necesarios")
             sys.exit(1)
         
-        buckets_list: List[str] = []
-        # Generar buckets
-        success = bucket_generator.generate_buckets_file(
-            target_domain=args.target_domain,
-            output_file=args.buckets_file,
-            max_buckets=args.max_buckets,
-            wordlist_file=args.wordlist,
-            subdomains_file=args.subdomains,
-            permutations_file=args.permutations,
-            exhaustive=args.exhaustive
-        )
-        if not success:
-            logger.error("No se pudo generar buckets.txt")
-            sys.exit(1)
+        if args.mode != 'standalone':
+            work_queue = WorkQueue(
+                args.queue_db,
+                lease_seconds=settings.SETTINGS['queue_lease_seconds'],
+                max_attempts=settings.SETTINGS['queue_max_attempts']
+            )
         
-        with open(args.buckets_file, 'r', encoding='utf-8') as f:
-            buckets_list = [line.strip() for line in f if line.strip()]
-        if not buckets_list:
-            logger.error(f"El archivo {args.buckets_file} está vacío")
-            sys.exit(1)
+        if args.mode == 'standalone':
+            # Progreso persistente: la semilla del generador y el rastreo se guardan para reproducir la misma lista
+            try:
+                checkpoint = ScanCheckpoint(settings.SETTINGS['database'], db_writer, {
+                    'target_domain': args.target_domain, 'wordlist': args.wordlist, 'subdomains': args.subdomains,
+                    'permutations': args.permutations, 'crawl_url': args.crawl_url,
+                    'max_buckets': args.max_buckets, 'exhaustive': args.exhaustive
+                }, run_id=args.resume)
+            except ValueError as e:
+                logger.error(str(e))
+                sys.exit(1)
         
-        # Rastreo web para descubrir buckets adicionales
-        if args.crawl_url:
-            logger.info(f"Rastreando {args.crawl_url} en busca de buckets S3")
-            cloud_urls = await spider_cloud_resources(args.crawl_url, depth=5, workers=args.max_workers)
-            for url in cloud_urls:
-                if url.endswith('.s3.amazonaws.com'):
-                    bucket_name = url.split('.')[0].replace('https://', '')
-                    if is_authorized_domain(bucket_name, [args.target_domain] + settings.SETTINGS['authorized_domains']):
-                        buckets_list.append(bucket_name)
-            buckets_list = list(set(buckets_list))
-            logger.info(f"Encontrados {len(cloud_urls)} URLs de nube, {len(buckets_list)} buckets totales tras rastreo")
+        if args.mode == 'worker':
+            # Los candidatos llegan de la cola compartida; el coordinador ya los generó y filtró
+            candidates = leased_buckets(work_queue, args.worker_id, settings.SETTINGS['queue_batch_size'])
+        else:
+            authorized = [args.target_domain] + settings.SETTINGS['authorized_domains']
+            # Candidatos prioritarios: CNAMEs de almacenamiento de los subdominios y buckets del rastreo web
+            priority: List[str] = []
+            if checkpoint and checkpoint.priority is not None:
+                priority = checkpoint.priority
+                logger.info(f"Usando {len(priority)} buckets prioritarios de la ejecución {checkpoint.run_id}")
+            else:
+                hostnames = bucket_generator.load_subdomains(args.target_domain, args.subdomains)
+                resolver = DNSResolver(args.dns_servers or None, concurrency=args.dns_concurrency)
+                for bucket_name in await find_storage_buckets(hostnames, resolver):
+                    if bucket_generator.is_valid_s3_bucket_name(bucket_name) and is_authorized_domain(bucket_name, authorized):
+                        priority.append(bucket_name)
+                if args.crawl_url:
+                    logger.info(f"Rastreando {args.crawl_url} en busca de buckets S3")
+                    cloud_buckets = await spider_cloud_resources(args.crawl_url, depth=5, workers=args.max_workers,
+                                                                 max_pages=args.crawl_max_pages,
+                                                                 max_bytes=int(args.crawl_max_mb * 1024 * 1024))
+                    # Solo los buckets S3 pasan al escáner; el resto de proveedores queda en el log del rastreo
+                    crawled = [ref.bucket for ref in cloud_buckets
+                               if ref.provider == 's3' and is_authorized_domain(ref.bucket, authorized)]
+                    priority.extend(crawled)
+                    logger.info(f"Encontrados {len(cloud_buckets)} buckets de nube válidos, {len(crawled)} buckets S3 tras rastreo")
+                priority = list(dict.fromkeys(priority))
+                if checkpoint:
+                    checkpoint.set_priority(priority)
+            
+            # Generación perezosa: el escaneo empieza con el primer candidato y la memoria no crece con la wordlist
+            generated = bucket_generator.iter_bucket_names(
+                target_domain=args.target_domain,
+                wordlist_file=args.wordlist,
+                subdomains_file=args.subdomains,
+                permutations_file=args.permutations,
+                max_buckets=args.max_buckets,
+                exhaustive=args.exhaustive,
+                seed=checkpoint.seed if checkpoint else None
+            )
+            candidates = stream_candidates(priority, generated, authorized, args.buckets_file,
+                                           recorded=checkpoint.issued if checkpoint else 0)
+            if checkpoint:
+                candidates = checkpoint.track(candidates)
         
-        buckets_list = [b for b in buckets_list if is_authorized_domain(b, [args.target_domain] + settings.SETTINGS['authorized_domains'])]
-        if not buckets_list:
-            logger.error("No hay buckets autorizados para escanear")
-            sys.exit(1)
-        logger.info(f"Filtrados {len(buckets_list)} buckets autorizados")
+        if args.mode == 'coordinator':
+            # El coordinador no escanea: reparte la cola y genera el reporte final con lo que escriben los workers
+            await run_coordinator(args, work_queue, candidates, stop)
+            try:
+                reporter.generate_report(formats=args.report_formats, output_prefix=args.output)
+            except Exception as e:
+                logger.error(f"Fallo al generar reporte final: {e}")
+            logger.info(f"¡Proceso completado! Revisa los reportes en {args.output}.*")
+            return
         
-        loop = asyncio.get_running_loop()
-        session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=args.max_workers))
+        # En estilo path todas las sondas van a unos pocos endpoints regionales: el límite por host no debe frenar a los workers
+        session = http_client.get_session('s3', limit=args.max_workers, **({'limit_per_host': 0} if args.path_style else {}))
         db_conn = sqlite3.connect(settings.SETTINGS['database'], check_same_thread=False)
-        signal.signal(signal.SIGINT, lambda s, f: handle_shutdown(loop, session, db_conn))
+        
+        # Usar bucket_generator.load_wordlist si --wordlist está definido para filtrar las claves listadas
+        grep_list = bucket_generator.load_wordlist(args.wordlist)[:100] if args.wordlist else []
+        # El XML de los listados y los patrones se evalúan en otros procesos: el bucle solo hace E/S
+        analysis_pool = AnalysisPool(analyzer.patterns, grep_list, workers=args.analysis_workers)
+        
+        async def on_download(job: dict, local_path: str, content_risk: str) -> None:
+            """Registra el riesgo del contenido descargado y notifica el hallazgo."""
+            if checkpoint:
+                checkpoint.download_done(job)
+            if not content_risk:
+                return
+            db_writer.write(
+                "UPDATE results SET content_risk = ? WHERE bucket = ? AND filename = ?",
+                (content_risk, job['bucket'], job['filename'])
+            )
+            logger.debug(f"Enviando notificación de Telegram para {job['bucket']}/{job['filename']}")
+            await send_telegram_notification(
+                f"🚨 Bucket público de alto riesgo encontrado: https://{job['bucket']}.s3.{job['region']}.amazonaws.com/{job['filename']} (Riesgo: {content_risk})",
+                args.telegram_token,
+                args.telegram_chat_id
+            )
+        
+        # Las descargas se solapan con el escaneo; la cola acotada frena al escáner si se quedan atrás
+        download_pool = downloader.DownloadPool(
+            analyzer, on_download,
+            workers=args.download_workers,
+            queue_size=settings.SETTINGS['download_queue_size'],
+            byte_budget_mb=args.download_budget
+        )
+        download_pool.start()
+        
+        async def submit_download(job: dict) -> None:
+            """Encola una descarga y la registra en el checkpoint hasta que termine."""
+            if checkpoint:
+                checkpoint.download_queued(job)
+            await download_pool.submit(job)
+        
+        # Las llamadas de boto3 corren en un pool de hilos con clientes reutilizados por región
+        acl_checker = ACLChecker(
+            {'access_key': args.aws_access_key, 'secret_key': args.aws_secret_key},
+            max_workers=settings.SETTINGS['acl_workers']
+        ) if aws_enabled else None
+        
+        async def process_public_bucket(bucket: str, data: dict) -> None:
+            """Registra un bucket público, enumera sus claves y encola las descargas de alto riesgo."""
+            # Verificar ACLs con AWS SDK si están habilitadas
+            acls = None
+            owner = None
+            policy_public = None
+            access_block = None
+            if acl_checker:
+                aws_result = await acl_checker.check(bucket, data.get('region'))
+                acls = aws_result.get('acls', 'unknown')
+                owner = aws_result.get('owner', 'unknown')
+                policy_public = aws_result.get('policy_public')
+                if aws_result.get('public_access_block') is not None:
+                    access_block = json.dumps(aws_result['public_access_block'])
+                if policy_public:
+                    logger.warning(f"La política de {bucket} lo hace público")
+            
+            db_writer.write(
+                """INSERT OR REPLACE INTO scanned_buckets (bucket, status, region, owner, acls, policy_public, public_access_block, timestamp)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                (bucket, data['status'], data.get('region', 'unknown'), owner, str(acls), policy_public, access_block, datetime.now())
+            )
+            # Enumeración paginada: se analiza y guarda página a página para mantener la memoria plana
+            region = data.get('region') or 'us-east-1'
+            
+            async def store(analysis: asyncio.Future) -> None:
+                analyzed_files = await analysis
+                db_writer.write_many(
+                    # Upsert en lugar de INSERT OR REPLACE: la fila conserva su id y su content_risk, y solo cambia
+                    # de revisión (y vuelve a los reportes parciales) si cambia algo
+                    """INSERT INTO results (bucket, filename, risk, source, url, region) VALUES (?, ?, ?, ?, ?, ?)
+                       ON CONFLICT (bucket, filename) DO UPDATE SET risk = excluded.risk, source = excluded.source,
+                           url = excluded.url, region = excluded.region
+                       WHERE results.risk IS NOT excluded.risk OR results.url IS NOT excluded.url
+                           OR results.region IS NOT excluded.region""",
+                    [(bucket, file.filename, file.risk, 'S3Hunter-X',
+                      f"https://{bucket}.s3.{region}.amazonaws.com/{file.filename}", region) for file in analyzed_files]
+                )
+                for file in analyzed_files:
+                    if file.risk == 'HIGH' and telegram_enabled:
+                        logger.debug(f"Encolando archivo {file.filename} de bucket {bucket} para análisis")
+                        await submit_download({'bucket': bucket, 'filename': file.filename, 'region': region, 'size': file.size})
+            
+            # Cada página se analiza en el pool mientras se descarga la siguiente
+            previous = None
+            try:
+                async for body in scanner.list_bucket_pages(session, bucket, region, limiter=limiter, proxy_pool=proxy_pool):
+                    analysis = asyncio.ensure_future(analysis_pool.analyze(body))
+                    if previous:
+                        await store(previous)
+                    previous = analysis
+                if previous:
+                    await store(previous)
+            except Exception as e:
+                logger.error(f"Error al analizar el listado de {bucket}: {e}")
+        
+        # Sin lotes ni barreras: un pool fijo de workers escanea continuamente y el ritmo lo marca el limitador,
+        # que se adapta por endpoint regional ante respuestas 429/503
+        limiter = AdaptiveRateLimiter(
+            args.rate, max_rate=args.max_rate, min_rate=settings.SETTINGS['scan_min_rate']
+        ) if args.rate > 0 else None
+        # Con proxies, las peticiones se reparten entre varias IPs de origen y cada una tiene su propio ritmo
+        egress_routes = settings.SETTINGS['proxies'] + ([None] if settings.SETTINGS['proxy_include_direct'] else [])
+        proxy_pool = ProxyPool(
+            egress_routes,
+            max_concurrency=settings.SETTINGS['proxy_max_concurrency'],
+            eject_seconds=settings.SETTINGS['proxy_eject_seconds'],
+            user_agents=settings.SETTINGS['user_agents']
+        ) if settings.SETTINGS['proxies'] else None
+        if args.delay != 1.0:
+            logger.warning("--delay está obsoleto y se ignora; usa --rate para limitar el ritmo de escaneo")
+        
+        # Los reportes de progreso solo añaden las filas nuevas; el reporte completo se genera una vez al final
+        # Al reanudar se continúan los reportes parciales desde la última revisión volcada
+        partial_reporter = reporter.IncrementalReporter(
+            args.report_formats, f"{args.output}_partial", watermark=checkpoint.report_watermark if checkpoint else 0
+        ) if args.mode == 'standalone' else None
+        
+        async def complete_leased(buckets: List[str]) -> None:
+            """Confirma en la cola los buckets procesados una vez sus resultados están en disco."""
+            await db_writer.drain()
+            await asyncio.to_thread(work_queue.complete, args.worker_id, buckets)
         
         try:
-            for i in range(0, len(buckets_list), args.batch_size):
-                batch = buckets_list[i:i + args.batch_size]
-                logger.info(f"Escaneando lote {i+1} a {min(i+args.batch_size, len(buckets_list))} de {len(buckets_list)}")
-                
-                # Corregido: Usar bucket_generator.load_wordlist si --wordlist está definido
-                if args.wordlist:
-                    grep_list = bucket_generator.load_wordlist(args.wordlist)[:100]
-                else:
-                    grep_list = []
-                
-                # Llamada a scan_buckets_async con grep_list
-                results = await scanner.scan_buckets_async(batch, args.max_workers, session, grep_list=grep_list)
+            public_buckets_found = 0
+            processed = 0
+            completed: List[str] = []
+            if checkpoint:
+                pending_downloads = checkpoint.pending_downloads()
+                if pending_downloads:
+                    logger.info(f"Reanudando {len(pending_downloads)} descargas pendientes")
+                for job in pending_downloads:
+                    await download_pool.submit(job)
+            results = scanner.scan_stream(candidates, args.max_workers, session, cache=scan_cache, limiter=limiter, proxy_pool=proxy_pool)
+            async for bucket, data in until_stopped(results, stop):
+                processed += 1
+                if data['status'] == 'PUBLIC':
+                    public_buckets_found += 1
+                    await process_public_bucket(bucket, data)
+                logger.debug(f"Procesado bucket {bucket}: {data.get('status', 'UNKNOWN')}")
+                if checkpoint:
+                    checkpoint.done(bucket)
+                if work_queue:
+                    completed.append(bucket)
+                    if len(completed) >= settings.SETTINGS['queue_batch_size']:
+                        await complete_leased(completed)
+                        completed = []
                 
-                c = db_conn.cursor()
-                public_buckets_found = 0
-                for bucket, data in results:
-                    if data and data['status'] == 'PUBLIC':
-                        public_buckets_found += 1
-                        # Verificar ACLs con AWS SDK si están habilitadas
-                        acls = None
-                        owner = None
-                        if aws_enabled:
-                            aws_result = check_bucket_access(f"{bucket}.s3.amazonaws.com", 
-                                                            {'access_key': args.aws_access_key, 'secret_key': args.aws_secret_key})
-                            acls = aws_result.get('acls', 'unknown')
-                            owner = aws_result.get('owner', 'unknown')
-                        
-                        c.execute(
-                            "INSERT OR REPLACE INTO scanned_buckets (bucket, status, region, owner, acls, timestamp) VALUES (?, ?, ?, ?, ?, ?)",
-                            (bucket, data['status'], data.get('region', 'unknown'), owner, str(acls), datetime.now())
-                        )
-                        if 'data' in data and data['data']:
-                            files = data['data'].get('Contents', [])
-                            if not isinstance(files, list):
-                                files = [files]
-                            analyzed_files = analyzer.analyze_files(bucket, files)
-                            results_data = [
-                                (file['bucket'], file['filename'], file['risk'], 'S3Hunter-X', 
-                                 f"https://{bucket}.s3.{data.get('region', 'us-east-1')}.amazonaws.com/{file['filename']}", 
-                                 data.get('region', 'unknown'))
-                                for file in analyzed_files
-                            ]
-                            c.executemany(
-                                "INSERT OR REPLACE INTO results (bucket, filename, risk, source, url, region) VALUES (?, ?, ?, ?, ?, ?)",
-                                results_data
-                            )
-                            for file in analyzed_files:
-                                if file['risk'] == 'HIGH' and telegram_enabled:
-                                    logger.debug(f"Intentando descargar archivo {file['filename']} de bucket {bucket} para análisis")
-                                    local_path, content_risk = await downloader.download_file(
-                                        file['bucket'], file['filename'], analyzer, data.get('region', 'us-east-1')
-                                    )
-                                    if local_path:
-                                        c.execute(
-                                            "UPDATE results SET content_risk = ? WHERE bucket = ? AND filename = ?",
-                                            (content_risk, file['bucket'], file['filename'])
-                                        )
-                                        logger.debug(f"Enviando notificación de Telegram para {bucket}/{file['filename']}")
-                                        await send_telegram_notification(
-                                            f"🚨 Bucket público de alto riesgo encontrado: https://{bucket}.s3.{data.get('region', 'us-east-1')}.amazonaws.com/{file['filename']} (Riesgo: {content_risk})",
-                                            args.telegram_token,
-                                            args.telegram_chat_id
-                                        )
-                        db_conn.commit()
-                    logger.debug(f"Procesado bucket {bucket}: {data.get('status', 'UNKNOWN')}")
-                logger.info(f"Lote {i//args.batch_size+1} completado. Buckets públicos encontrados: {public_buckets_found}")
-                
-                try:
-                    reporter.generate_report(formats=args.report_formats, output_prefix=f"{args.output}_batch_{i//args.batch_size+1}")
-                except Exception as e:
-                    logger.error(f"Fallo al generar reporte para lote {i//args.batch_size+1}: {e}")
-                
-                if i + args.batch_size < len(buckets_list):
-                    logger.info(f"Esperando {args.delay} segundos antes del siguiente lote...")
-                    await asyncio.sleep(args.delay)
+                if processed % args.batch_size == 0:
+                    logger.info(f"Procesados {processed} buckets. Buckets públicos encontrados: {public_buckets_found}")
+                    metrics.REGISTRY.set('buckets_processed', processed)
+                    metrics.REGISTRY.set('public_buckets_found', public_buckets_found)
+                    if checkpoint:
+                        checkpoint.save()
+                    if partial_reporter:
+                        try:
+                            await db_writer.drain()
+                            # Consultas a SQLite y escritura de archivos: fuera del bucle de eventos
+                            await asyncio.to_thread(partial_reporter.append_new)
+                            if checkpoint:
+                                checkpoint.set_report_watermark(partial_reporter.watermark)
+                        except Exception as e:
+                            logger.error(f"Fallo al actualizar reportes parciales: {e}")
+            
+            await results.aclose()
+            if stop.is_set():
+                # Parada ordenada: lo terminado se confirma y el resto (candidatos y descargas pendientes) queda
+                # en el checkpoint o en la cola compartida; el cierre lo hace el finally de main
+                logger.info(f"Escaneo detenido tras {processed} buckets")
+                if checkpoint:
+                    logger.info(f"Reanúdalo con --resume {checkpoint.run_id}")
+                await db_writer.drain()
+                if completed:
+                    await complete_leased(completed)
+                return
+            if processed == 0 and args.mode != 'worker' and not (checkpoint and checkpoint.resumed):
+                logger.error("No hay buckets autorizados para escanear")
+                sys.exit(1)
+            logger.info(f"Escaneo completado: {processed} buckets procesados")
             
+            await download_pool.join()
+            if checkpoint:
+                checkpoint.finish()
+            await db_writer.drain()
+            if completed:
+                await complete_leased(completed)
+            if proxy_pool:
+                proxy_pool.summary()
+            if args.mode == 'worker':
+                # El reporte final lo genera el coordinador cuando todos los workers terminan
+                logger.info(f"Worker {args.worker_id}: {public_buckets_found} buckets públicos encontrados")
+                return
             try:
                 reporter.generate_report(formats=args.report_formats, output_prefix=args.output)
             except Exception as e:
@@ -312,10 +711,11 @@ async def main() -> None:
             
             if args.verbose:
                 c = db_conn.cursor()
-                c.execute("SELECT bucket, status, region, owner, acls, timestamp FROM scanned_buckets")
-                table = [[r[0], r[1], r[2], r[3] or 'N/A', r[4] or 'N/A', r[5]] for r in c.fetchall()]
+                c.execute("SELECT bucket, status, region, owner, acls, policy_public, public_access_block, timestamp FROM scanned_buckets")
+                table = [[r[0], r[1], r[2], r[3] or 'N/A', r[4] or 'N/A', 'N/A' if r[5] is None else bool(r[5]), r[6] or 'N/A', r[7]]
+                         for r in c.fetchall()]
                 print("\nResumen de buckets escaneados:")
-                print(tabulate(table, headers=["Bucket", "Estado", "Región", "Propietario", "ACLs", "Timestamp"], tablefmt="grid"))
+                print(tabulate(table, headers=["Bucket", "Estado", "Región", "Propietario", "ACLs", "Política pública", "Bloqueo público", "Timestamp"], tablefmt="grid"))
             
             logger.info(f"¡Proceso completado! Revisa los reportes en {args.output}.*")
             if public_buckets_found == 0:
@@ -330,12 +730,24 @@ async def main() -> None:
         except asyncio.CancelledError:
             logger.info("Tareas canceladas debido a interrupción")
             raise
+        finally:
+            await download_pool.close()
+            analysis_pool.close()
+            if acl_checker:
+                acl_checker.close()
         
     except Exception as e:
         logger.error(f"Error inesperado: {type(e).__name__} - {e}")
         raise
     finally:
-        await cleanup(session, db_conn)
+        if metrics_task:
+            metrics_task.cancel()
+            await asyncio.gather(metrics_task, return_exceptions=True)
+        if metrics_server:
+            await metrics_server.cleanup()
+        await cleanup(db_conn, scan_cache, db_writer, checkpoint)
+        if work_queue:
+            work_queue.close()
 
 if __name__ == '__main__':
     asyncio.run(main())
\ No newline at end of file
@@ -1,38 +1,68 @@
 import unittest
 import os
+import tempfile
 from core.analyzer import Analyzer
-from config import settings
 
 class TestAnalyzer(unittest.TestCase):
     def setUp(self):
-        with open('data/test_patterns.txt', 'w', encoding='utf-8') as f:
-            f.write("password\nsecret\n")
-        settings.SETTINGS['patterns_file'] = 'data/test_patterns.txt'
-        self.analyzer = Analyzer('data/test_patterns.txt')
+        self.tmp = tempfile.TemporaryDirectory()
+        patterns_file = os.path.join(self.tmp.name, 'patterns.txt')
+        with open(patterns_file, 'w', encoding='utf-8') as f:
+            f.write("password\nsecret\n\\.env$\n")
+        self.analyzer = Analyzer(patterns_file)
+
+    def classify(self, filename):
+        return self.analyzer.analyze_files('bucket', [{'Key': filename, 'Size': 10}])[0]
 
     def test_classify_high_risk(self):
-        self.assertEqual(self.analyzer.classify_file("password.txt"), 'HIGH')
+        result = self.classify("password.txt")
+        self.assertEqual((result['risk'], result['pattern']), ('HIGH', 'password'))
 
-    def test_classify_medium_risk(self):
-        self.assertEqual(self.analyzer.classify_file("config.env"), 'MEDIUM')
+    def test_classify_regex_pattern(self):
+        self.assertEqual(self.classify("prod/config.env")['pattern'], '\\.env$')
+        self.assertEqual(self.classify("prod/config.env.bak")['risk'], 'LOW')
 
     def test_classify_low_risk(self):
-        self.assertEqual(self.analyzer.classify_file("image.png"), 'LOW')
+        self.assertEqual(self.classify("image.png"), {'bucket': 'bucket', 'filename': 'image.png', 'risk': 'LOW', 'pattern': None, 'size': 10})
+
+    def test_skips_records_without_key(self):
+        self.assertEqual(self.analyzer.analyze_files('bucket', [{'Size': 1}, {'Key': ''}]), [])
 
     def test_analyze_content(self):
-        with open('data/test_file.txt', 'w', encoding='utf-8') as f:
+        path = os.path.join(self.tmp.name, 'file.txt')
+        with open(path, 'w', encoding='utf-8') as f:
             f.write("secret_key=123")
-        self.assertEqual(self.analyzer.analyze_content('data/test_file.txt'), 'HIGH')
+        self.assertEqual(self.analyzer.analyze_content(path), 'HIGH')
+
+    def test_content_scanner_across_chunks(self):
+        scanner = self.analyzer.content_scanner()
+        self.assertIsNone(scanner.feed(b"x" * 100 + b"sec"))
+        self.assertEqual(scanner.feed(b"ret_key=123"), 'secret')
+        self.assertEqual(scanner.risk, 'HIGH')
+
+    def test_content_scanner_low(self):
+        scanner = self.analyzer.content_scanner()
+        scanner.feed("contraseña".encode('utf-8')[:-1])
+        scanner.feed("contraseña".encode('utf-8')[-1:])
+        scanner.finish()
+        self.assertEqual(scanner.risk, 'LOW')
+
+    def test_content_scanner_end_anchor_only_at_real_end(self):
+        scanner = self.analyzer.content_scanner()
+        self.assertIsNone(scanner.feed(b"path=prod/config.env"))
+        self.assertIsNone(scanner.feed(b".bak"))
+        self.assertIsNone(scanner.finish())
+        scanner = self.analyzer.content_scanner()
+        scanner.feed(b"path=prod/")
+        scanner.feed(b"config.env")
+        self.assertEqual(scanner.finish(), '\\.env$')
 
-    def test_cache(self):
-        self.analyzer.classify_file("password.txt")
-        self.assertIn("password.txt", self.analyzer.cache)
-        self.assertEqual(self.analyzer.cache["password.txt"], 'HIGH')
+    def test_missing_patterns_file(self):
+        analyzer = Analyzer(os.path.join(self.tmp.name, 'missing.txt'))
+        self.assertEqual(analyzer.patterns, [])
 
     def tearDown(self):
-        for file in ['data/test_patterns.txt', 'data/test_file.txt']:
-            if os.path.exists(file):
-                os.remove(file)
+        self.tmp.cleanup()
 
 if __name__ == '__main__':
-    unittest.main()
\ No newline at end of file
+    unittest.main()
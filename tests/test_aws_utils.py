@@ -0,0 +1,79 @@
+import unittest
+import asyncio
+import os
+import sqlite3
+import tempfile
+from unittest.mock import MagicMock, patch
+from botocore.exceptions import ClientError
+from core.aws_utils import ACLChecker, check_bucket_access, get_s3_client
+from main import init_db
+
+CREDS = {'access_key': 'AKIAEXAMPLE', 'secret_key': 'secret'}
+
+def fake_client(all_users=True):
+    client = MagicMock()
+    grants = [{'Grantee': {'Type': 'Group', 'URI': 'http://acs.amazonaws.com/groups/global/AllUsers'}, 'Permission': 'READ'}] if all_users else []
+    client.get_bucket_acl.return_value = {'Owner': {'DisplayName': 'owner'}, 'Grants': grants}
+    client.get_bucket_policy_status.side_effect = ClientError({'Error': {'Code': 'NoSuchBucketPolicy'}}, 'GetBucketPolicyStatus')
+    client.get_public_access_block.return_value = {'PublicAccessBlockConfiguration': {'BlockPublicAcls': False}}
+    return client
+
+class TestACLChecker(unittest.TestCase):
+    def test_client_reused_per_credentials_and_region(self):
+        self.assertIs(get_s3_client(CREDS, 'eu-west-1'), get_s3_client(CREDS, 'eu-west-1'))
+        self.assertIsNot(get_s3_client(CREDS, 'eu-west-1'), get_s3_client(CREDS, 'us-west-2'))
+
+    @patch('core.aws_utils.get_s3_client')
+    def test_async_check(self, get_client):
+        get_client.return_value = fake_client()
+        checker = ACLChecker(CREDS, max_workers=2)
+        try:
+            result = asyncio.run(checker.check('open-bucket', 'us-east-1'))
+        finally:
+            checker.close()
+        self.assertTrue(result['exists'])
+        self.assertTrue(result['is_public'])
+        self.assertEqual(result['owner'], 'owner')
+        self.assertFalse(result['policy_public'])
+        self.assertEqual(result['public_access_block'], {'BlockPublicAcls': False})
+
+    @patch('core.aws_utils.get_s3_client')
+    def test_private_acl_not_public(self, get_client):
+        get_client.return_value = fake_client(all_users=False)
+        result = check_bucket_access('closed-bucket.s3.amazonaws.com', CREDS)
+        self.assertFalse(result['is_public'])
+        self.assertEqual(result['acls']['AllUsers'], 'AllUsers: (none)')
+
+    @patch('core.aws_utils.get_s3_client')
+    def test_public_policy_with_private_acl(self, get_client):
+        client = fake_client(all_users=False)
+        client.get_bucket_policy_status.side_effect = None
+        client.get_bucket_policy_status.return_value = {'PolicyStatus': {'IsPublic': True}}
+        get_client.return_value = client
+        checker = ACLChecker(CREDS, max_workers=3)
+        try:
+            result = asyncio.run(checker.check('policy-bucket'))
+        finally:
+            checker.close()
+        self.assertTrue(result['policy_public'])
+        self.assertTrue(result['is_public'])
+        self.assertNotIn('acl_public', result)
+
+    def test_init_db_adds_policy_columns(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, 'test.db')
+            init_db(db_path)
+            with sqlite3.connect(db_path) as conn:
+                columns = [col[1] for col in conn.execute("PRAGMA table_info(scanned_buckets)")]
+        self.assertIn('policy_public', columns)
+        self.assertIn('public_access_block', columns)
+
+    def test_without_credentials(self):
+        checker = ACLChecker({})
+        try:
+            self.assertFalse(asyncio.run(checker.check('bucket'))['exists'])
+        finally:
+            checker.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+import unittest
+import itertools
+import os
+import tempfile
+from core.bucket_generator import iter_bucket_names, is_valid_s3_bucket_name, load_subdomains
+from core.utils import BloomFilter
+
+class TestBucketGenerator(unittest.TestCase):
+    def test_high_priority_first(self):
+        first = list(itertools.islice(iter_bucket_names('example.com'), 3))
+        self.assertEqual(first, ['example-com', 's3-example-com', 'example-com-s3'])
+
+    def test_unique_valid_and_limited(self):
+        names = list(iter_bucket_names('example.com', max_buckets=500, seed=7))
+        self.assertEqual(len(names), 500)
+        self.assertEqual(len(set(names)), 500)
+        self.assertTrue(all(is_valid_s3_bucket_name(n) for n in names))
+
+    def test_seed_is_reproducible(self):
+        self.assertEqual(list(iter_bucket_names('example.com', seed=1)), list(iter_bucket_names('example.com', seed=1)))
+
+    def test_subdomains_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'subdomains.txt')
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write("assets\nCDN.example.com.\n\nassets\n")
+            self.assertEqual(load_subdomains('example.com', path), ['example.com', 'assets.example.com', 'cdn.example.com'])
+            self.assertIn('assets-example-com-backup', list(iter_bucket_names('example.com', subdomains_file=path)))
+
+class TestBloomFilter(unittest.TestCase):
+    def test_membership(self):
+        bloom = BloomFilter(1000, 0.01)
+        for i in range(1000):
+            bloom.add(f"bucket-{i}")
+        self.assertTrue(all(f"bucket-{i}" in bloom for i in range(1000)))
+        false_positives = sum(f"other-{i}" in bloom for i in range(1000))
+        self.assertLess(false_positives, 50)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import unittest
+import os
+import sqlite3
+import tempfile
+from datetime import datetime, timedelta
+from core.cache import ScanCache
+from main import init_db
+
+class TestScanCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, 'test_cache.db')
+        init_db(self.db_path)
+        self.cache = ScanCache(self.db_path, {'NOT_FOUND': 3600, 'PRIVATE': 60, 'PUBLIC': 0})
+
+    def test_hit_within_ttl(self):
+        self.cache.put('missing-bucket', {'status': 'NOT_FOUND', 'region': None})
+        self.cache.flush()
+        self.assertEqual(self.cache.get('missing-bucket')['status'], 'NOT_FOUND')
+
+    def test_public_always_rechecked(self):
+        self.cache.put('open-bucket', {'status': 'PUBLIC', 'region': 'us-east-1'})
+        self.assertIsNone(self.cache.get('open-bucket'))
+
+    def test_expired_entry(self):
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("INSERT INTO scanned_buckets (bucket, status, region, timestamp) VALUES (?, ?, ?, ?)",
+                         ('old-bucket', 'PRIVATE', 'eu-west-1', datetime.now() - timedelta(minutes=5)))
+        self.assertIsNone(self.cache.get('old-bucket'))
+
+    def test_errors_not_cached(self):
+        self.cache.put('flaky-bucket', {'status': 'ERROR', 'error': 'timeout'})
+        self.assertIsNone(self.cache.get('flaky-bucket'))
+
+    def test_preserves_acls(self):
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("INSERT INTO scanned_buckets (bucket, status, region, owner, acls) VALUES (?, ?, ?, ?, ?)",
+                         ('acl-bucket', 'PUBLIC', 'us-east-1', 'owner', 'AllUsers: READ'))
+        self.cache.put('acl-bucket', {'status': 'PRIVATE', 'region': 'us-east-1'})
+        self.cache.flush()
+        with sqlite3.connect(self.db_path) as conn:
+            row = conn.execute("SELECT status, owner, acls FROM scanned_buckets WHERE bucket = 'acl-bucket'").fetchone()
+        self.assertEqual(row, ('PRIVATE', 'owner', 'AllUsers: READ'))
+
+    def tearDown(self):
+        self.cache.close()
+        self.tmp.cleanup()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import unittest
+import asyncio
+import os
+import signal
+import tempfile
+from core.checkpoint import ScanCheckpoint
+from core.db_writer import DBWriter
+from main import init_db, install_shutdown_handlers, stream_candidates
+
+PARAMS = {'target_domain': 'example.com', 'max_buckets': 10}
+
+class TestScanCheckpoint(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, 'test.db')
+        init_db(self.db_path)
+        self.writer = DBWriter(self.db_path, flush_interval=60)
+
+    def tearDown(self):
+        self.writer.close()
+        self.tmp.cleanup()
+
+    def interrupted_run(self):
+        checkpoint = ScanCheckpoint(self.db_path, self.writer, PARAMS)
+        candidates = checkpoint.track(iter(['b0', 'b1', 'b2', 'b3', 'b4']))
+        issued = [next(candidates) for _ in range(4)]
+        # Terminan fuera de orden: b2 queda pendiente cuando se interrumpe la ejecución
+        for bucket in ('b0', 'b1', 'b3'):
+            checkpoint.done(bucket)
+        checkpoint.download_queued({'bucket': 'b1', 'filename': 'a.env', 'region': 'us-east-1', 'size': 5})
+        checkpoint.set_report_watermark(7)
+        checkpoint.save()
+        asyncio.run(self.writer.drain())
+        checkpoint.close()
+        self.assertEqual(issued, ['b0', 'b1', 'b2', 'b3'])
+        return checkpoint
+
+    def test_resume_skips_completed_candidates(self):
+        first = self.interrupted_run()
+        resumed = ScanCheckpoint(self.db_path, self.writer, PARAMS, run_id=first.run_id)
+        self.assertEqual(resumed.seed, first.seed)
+        self.assertEqual(resumed.watermark, 2)
+        self.assertEqual(resumed.report_watermark, 7)
+        self.assertEqual(list(resumed.track(iter(['b0', 'b1', 'b2', 'b3', 'b4']))), ['b2', 'b4'])
+        self.assertEqual(resumed.pending_downloads(), [{'bucket': 'b1', 'filename': 'a.env', 'region': 'us-east-1', 'size': 5}])
+        resumed.done('b2')
+        self.assertEqual(resumed.watermark, 4)
+        resumed.close()
+
+    def test_resume_with_other_params_fails(self):
+        first = self.interrupted_run()
+        with self.assertRaises(ValueError):
+            ScanCheckpoint(self.db_path, self.writer, dict(PARAMS, max_buckets=20), run_id=first.run_id)
+
+    def test_unknown_run(self):
+        with self.assertRaises(ValueError):
+            ScanCheckpoint(self.db_path, self.writer, PARAMS, run_id='missing')
+
+    def test_buckets_file_appended_on_resume(self):
+        path = os.path.join(self.tmp.name, 'buckets.txt')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write("b0\nb1\n")
+        self.assertEqual(list(stream_candidates([], iter(['b0', 'b1', 'b2']), [], path, recorded=2)), ['b0', 'b1', 'b2'])
+        with open(path, encoding='utf-8') as f:
+            self.assertEqual(f.read().split(), ['b0', 'b1', 'b2'])
+
+class TestShutdownSignals(unittest.IsolatedAsyncioTestCase):
+    async def test_first_signal_stops_second_cancels(self):
+        loop = asyncio.get_running_loop()
+        stop = asyncio.Event()
+
+        async def scan():
+            install_shutdown_handlers(stop)
+            self.addCleanup(loop.remove_signal_handler, signal.SIGINT)
+            self.addCleanup(loop.remove_signal_handler, signal.SIGTERM)
+            os.kill(os.getpid(), signal.SIGTERM)
+            await stop.wait()
+            os.kill(os.getpid(), signal.SIGINT)
+            await asyncio.sleep(10)
+
+        with self.assertRaises(asyncio.CancelledError):
+            await asyncio.wait_for(loop.create_task(scan()), timeout=5)
+        self.assertTrue(stop.is_set())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import unittest
+from unittest.mock import patch
+from config import settings
+from core.cloud_refs import CloudBucket, CloudRefExtractor, extract_cloud_refs, parse_cloud_url
+
+BODY = rb'''<img src="https://My-Assets.s3.eu-west-1.amazonaws.com/a.png">
+fetch("https:\/\/s3.us-west-2.amazonaws.com\/data-lake\/x.json")
+u = "https://signed-bucket.s3.amazonaws.com/k?X-Amz-Algorithm=AWS4-HMAC-SHA256&X-Amz-Credential=AKIAEXAMPLE%2F20240101%2Fap-south-1%2Fs3%2Faws4_request&X-Amz-Signature=abc"
+cp s3://backup-bucket/dump.sql . ; gsutil cp gs://gcs-bucket/x .
+const cfg={Bucket:"sdk-bucket",region:"us-east-1"};"aws_user_files_s3_bucket": "amplify-app-dev-123"
+<a href="https://ec2.amazonaws.com/">no</a> bucket: "Images" https://my-assets.s3.amazonaws.com/b.png
+'''
+
+class TestCloudRefExtractor(unittest.TestCase):
+    def test_all_forms_in_one_pass(self):
+        self.assertEqual(extract_cloud_refs(BODY), [
+            CloudBucket('s3', 'my-assets', 'eu-west-1'),
+            CloudBucket('s3', 'data-lake', 'us-west-2'),
+            CloudBucket('s3', 'signed-bucket', 'ap-south-1'),
+            CloudBucket('s3', 'backup-bucket', None),
+            CloudBucket('gcs', 'gcs-bucket', None),
+            CloudBucket('s3', 'sdk-bucket', None),
+            CloudBucket('s3', 'amplify-app-dev-123', None),
+        ])
+
+    def test_streamed_chunks_match_whole_body(self):
+        body = b'x' * 10000 + BODY + b'y' * 9000 + BODY.replace(b'signed-bucket', b'other-bucket')
+        expected = extract_cloud_refs(body)
+        for size in (1, 13, 4096, 65536):
+            extractor = CloudRefExtractor()
+            found = []
+            for i in range(0, len(body), size):
+                found.extend(extractor.feed(body[i:i + size]))
+                # El búfer no crece con el cuerpo
+                self.assertLessEqual(len(extractor.buffer), 2 * 4096 + size)
+            found.extend(extractor.close())
+            self.assertEqual(found, expected)
+
+    def test_s3_endpoint_path_style(self):
+        with patch.dict(settings.SETTINGS, {'s3_endpoint': 'http://127.0.0.1:9000'}):
+            self.assertEqual(parse_cloud_url('http://127.0.0.1:9000/local-bucket/key'), CloudBucket('s3', 'local-bucket', None))
+
+class TestParseCloudUrl(unittest.TestCase):
+    def test_providers_and_styles(self):
+        self.assertEqual(parse_cloud_url('https://my.bucket.s3-website-us-west-2.amazonaws.com/index.html'),
+                         CloudBucket('s3', 'my.bucket', 'us-west-2'))
+        self.assertEqual(parse_cloud_url('https://s3.eu-west-1.amazonaws.com/Data-Bucket/key'), CloudBucket('s3', 'data-bucket', 'eu-west-1'))
+        self.assertEqual(parse_cloud_url('https://storage.googleapis.com/gcs-bucket/o'), CloudBucket('gcs', 'gcs-bucket', None))
+        self.assertEqual(parse_cloud_url('https://space.nyc3.digitaloceanspaces.com/a'), CloudBucket('digitalocean', 'space', 'nyc3'))
+        self.assertEqual(parse_cloud_url('https://acct01.blob.core.windows.net/c'), CloudBucket('azure', 'acct01', None))
+        self.assertIsNone(parse_cloud_url('https://ec2.amazonaws.com/'))
+
+if __name__ == '__main__':
+    unittest.main()
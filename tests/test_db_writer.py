@@ -0,0 +1,120 @@
+import unittest
+import asyncio
+import os
+import sqlite3
+import tempfile
+from unittest.mock import patch
+from core.db_writer import DBWriter
+from core.cache import ScanCache
+from main import init_db
+
+class TestDBWriter(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, 'test.db')
+        init_db(self.db_path)
+        self.writer = DBWriter(self.db_path, batch_size=100, flush_interval=60,
+                               pragmas={'synchronous': 'NORMAL', 'cache_size': -8192})
+
+    def tearDown(self):
+        self.writer.close()
+        self.tmp.cleanup()
+
+    def count(self):
+        with sqlite3.connect(self.db_path) as conn:
+            return conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def test_drain_commits_pending_rows(self):
+        self.writer.write_many("INSERT INTO results (bucket, filename, risk) VALUES (?, ?, 'LOW')",
+                               [('b', f'file-{i}') for i in range(10)])
+        asyncio.run(self.writer.drain())
+        self.assertEqual(self.count(), 10)
+
+    def test_writes_keep_order(self):
+        self.writer.write("INSERT INTO results (bucket, filename, risk) VALUES ('b', 'a.env', 'HIGH')")
+        self.writer.write("UPDATE results SET content_risk = 'HIGH' WHERE filename = 'a.env'")
+        asyncio.run(self.writer.drain())
+        with sqlite3.connect(self.db_path) as conn:
+            self.assertEqual(conn.execute("SELECT content_risk FROM results").fetchone()[0], 'HIGH')
+
+    def test_failed_batch_does_not_stop_writer(self):
+        self.writer.write("INSERT INTO missing_table VALUES (1)")
+        asyncio.run(self.writer.drain())
+        self.writer.write("INSERT INTO results (bucket, filename, risk) VALUES ('b', 'ok', 'LOW')")
+        asyncio.run(self.writer.drain())
+        self.assertEqual(self.writer.errors, 1)
+        self.assertEqual(self.count(), 1)
+
+    def test_bad_row_only_loses_itself(self):
+        self.writer.write_many("INSERT INTO results (bucket, filename, risk) VALUES (?, ?, 'LOW')",
+                               [('b', 'a'), (None, 'sin-bucket'), ('b', 'c')])
+        self.writer.write("INSERT INTO results (bucket, filename, risk) VALUES ('b', 'd', 'LOW')")
+        asyncio.run(self.writer.drain())
+        # bucket es NOT NULL: solo esa fila se pierde, el resto del lote se confirma
+        self.assertEqual(self.count(), 3)
+        self.assertEqual((self.writer.errors, self.writer.written), (1, 3))
+
+    def test_busy_batch_is_retried(self):
+        failures = []
+
+        class FlakyConnection:
+            """Conexión cuyo primer commit falla como si otro proceso tuviera la base de datos bloqueada."""
+
+            def __init__(self, conn):
+                self.conn = conn
+
+            def __enter__(self):
+                return self.conn.__enter__()
+
+            def __exit__(self, *exc):
+                if not failures and exc[0] is None:
+                    failures.append(1)
+                    self.conn.rollback()
+                    raise sqlite3.OperationalError('database is locked')
+                return self.conn.__exit__(*exc)
+
+            def executemany(self, *args):
+                return self.conn.executemany(*args)
+
+        with sqlite3.connect(self.db_path) as conn, patch('core.db_writer.time.sleep'):
+            self.writer._commit(FlakyConnection(conn), [("INSERT INTO results (bucket, filename, risk) VALUES (?, ?, 'LOW')",
+                                                         [('b', 'x'), ('b', 'y')])])
+        self.assertEqual(failures, [1])
+        self.assertEqual(self.count(), 2)
+        self.assertEqual(self.writer.errors, 0)
+
+    def test_queue_is_bounded(self):
+        writer = DBWriter(self.db_path, queue_size=5)
+        self.assertEqual(writer.queue.maxsize, 5)
+        writer.close()
+
+    def test_scan_cache_through_writer(self):
+        cache = ScanCache(self.db_path, {'NOT_FOUND': 3600}, writer=self.writer)
+        cache.put('missing-bucket', {'status': 'NOT_FOUND', 'region': None})
+        asyncio.run(self.writer.drain())
+        self.assertEqual(cache.get('missing-bucket')['status'], 'NOT_FOUND')
+        cache.close()
+
+    def test_cache_get_many_single_query(self):
+        cache = ScanCache(self.db_path, {'NOT_FOUND': 3600, 'PUBLIC': 0}, writer=self.writer)
+        cache.put('gone-a', {'status': 'NOT_FOUND', 'region': None})
+        cache.put('gone-b', {'status': 'NOT_FOUND', 'region': None})
+        asyncio.run(self.writer.drain())
+        found = cache.get_many(['gone-a', 'gone-b', 'unknown'])
+        self.assertEqual(sorted(found), ['gone-a', 'gone-b'])
+        self.assertEqual((cache.hits, cache.misses), (2, 1))
+        cache.close()
+
+    def test_dead_writer_fails_fast(self):
+        # Un directorio no se puede abrir como base de datos: el hilo muere al conectar
+        writer = DBWriter(self.tmp.name)
+        writer.thread.join(timeout=10)
+        self.assertIsNotNone(writer.failure)
+        with self.assertRaises(sqlite3.OperationalError):
+            writer.write("INSERT INTO results (bucket, filename, risk) VALUES ('b', 'x', 'LOW')")
+        with self.assertRaises(sqlite3.OperationalError):
+            asyncio.run(asyncio.wait_for(writer.drain(), timeout=10))
+        writer.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import unittest
+import asyncio
+import dns.message
+import dns.rcode
+import dns.rrset
+from core.dns_resolver import DNSResolver, find_storage_buckets, storage_buckets
+
+class StubDNS(asyncio.DatagramProtocol):
+    """Servidor DNS mínimo sobre UDP que responde como un resolver recursivo: la cadena CNAME completa y su A final."""
+
+    def __init__(self, cnames, addresses, delay=0.0, ttl=300):
+        self.cnames = cnames
+        self.addresses = addresses
+        self.delay = delay
+        self.ttl = ttl
+        self.queries = []
+        self.inflight = 0
+        self.max_inflight = 0
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        asyncio.get_running_loop().create_task(self.answer(dns.message.from_wire(data), addr))
+
+    async def answer(self, query, addr):
+        name = query.question[0].name.to_text().rstrip('.')
+        self.queries.append(name)
+        self.inflight += 1
+        self.max_inflight = max(self.max_inflight, self.inflight)
+        await asyncio.sleep(self.delay)
+        self.inflight -= 1
+        response = dns.message.make_response(query)
+        while name in self.cnames:
+            response.answer.append(dns.rrset.from_text(f"{name}.", self.ttl, 'IN', 'CNAME', f"{self.cnames[name]}."))
+            name = self.cnames[name]
+        if name in self.addresses:
+            response.answer.append(dns.rrset.from_text(f"{name}.", self.ttl, 'IN', 'A', self.addresses[name]))
+        else:
+            response.set_rcode(dns.rcode.NXDOMAIN)
+        self.transport.sendto(response.to_wire(), addr)
+
+class TestDNSResolver(unittest.IsolatedAsyncioTestCase):
+    async def start_stub(self, **kwargs):
+        transport, stub = await asyncio.get_running_loop().create_datagram_endpoint(
+            lambda: StubDNS(**kwargs), local_addr=('127.0.0.1', 0))
+        self.addCleanup(transport.close)
+        return stub, transport.get_extra_info('sockname')[1]
+
+    async def test_storage_cnames_become_candidates(self):
+        stub, port = await self.start_stub(
+            cnames={
+                'assets.example.com': 'assets-example-com.s3.eu-west-1.amazonaws.com',
+                'www.example.com': 'www.example.com.s3-website-us-east-1.amazonaws.com',
+                'cdn.example.com': 'd111111abcdef8.cloudfront.net',
+                'app.example.com': 'lb.example.net',
+            },
+            addresses={'assets-example-com.s3.eu-west-1.amazonaws.com': '52.0.0.1', 'lb.example.net': '10.0.0.1',
+                       'www.example.com.s3-website-us-east-1.amazonaws.com': '52.0.0.2',
+                       'd111111abcdef8.cloudfront.net': '13.0.0.1'}
+        )
+        resolver = DNSResolver(['127.0.0.1'], port=port, concurrency=10, timeout=2)
+        buckets = await find_storage_buckets(
+            ['assets.example.com', 'www.example.com', 'cdn.example.com', 'app.example.com', 'missing.example.com'], resolver)
+        self.assertEqual(buckets, ['assets-example-com', 'www.example.com', 'cdn.example.com', 'cdn-example-com'])
+
+    async def test_bounded_concurrency_and_ttl_cache(self):
+        names = [f"host-{i}.example.com" for i in range(300)]
+        stub, port = await self.start_stub(cnames={}, addresses={name: '10.0.0.1' for name in names}, delay=0.01)
+        resolver = DNSResolver(['127.0.0.1'], port=port, concurrency=25, timeout=5)
+        chains = await resolver.resolve_many(names + names[:50])
+        self.assertEqual(len(chains), 300)
+        self.assertLessEqual(stub.max_inflight, 25)
+        self.assertGreater(stub.max_inflight, 1)
+        # Segunda pasada: todo sale de la caché
+        await resolver.resolve_many(names)
+        self.assertEqual(len(stub.queries), 300)
+
+    async def test_dangling_cname_keeps_chain(self):
+        stub, port = await self.start_stub(cnames={'old.example.com': 'gone-bucket.s3.amazonaws.com'}, addresses={})
+        resolver = DNSResolver(['127.0.0.1'], port=port, timeout=2)
+        self.assertEqual(await resolver.cname_chain('old.example.com'), ['gone-bucket.s3.amazonaws.com'])
+
+class TestStorageBuckets(unittest.TestCase):
+    def test_endpoint_only_cname_uses_hostname(self):
+        self.assertEqual(storage_buckets('static.example.com', ['s3-website-eu-west-1.amazonaws.com']),
+                         ['static.example.com', 'static-example-com'])
+
+    def test_unrelated_chain(self):
+        self.assertEqual(storage_buckets('app.example.com', ['lb.example.net']), [])
+
+if __name__ == '__main__':
+    unittest.main()
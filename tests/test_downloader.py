@@ -0,0 +1,103 @@
+import unittest
+import asyncio
+import aiohttp
+import os
+import tempfile
+from unittest.mock import AsyncMock, patch
+from config import settings
+from core.analyzer import Analyzer
+from core import metrics
+from core.downloader import download_file
+
+CHUNK = 1024 * 1024
+
+class FakeContent:
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.served = 0
+
+    async def iter_chunked(self, size):
+        for chunk in self.chunks:
+            self.served += 1
+            yield chunk
+
+class FakeResponse:
+    def __init__(self, chunks):
+        self.status = 200
+        self.headers = {}
+        self.content = FakeContent(chunks)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        pass
+
+class FakeSession:
+    def __init__(self, response, failures=0):
+        self.response = response
+        self.failures = failures
+        self.calls = 0
+
+    def get(self, url, **kwargs):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise aiohttp.ClientConnectionError('conexión cerrada')
+        return self.response
+
+class TestDownloadFile(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        patterns = os.path.join(self.tmp.name, 'patterns.txt')
+        with open(patterns, 'w', encoding='utf-8') as f:
+            f.write('password\n')
+        self.analyzer = Analyzer(patterns)
+        self.settings = patch.dict(settings.SETTINGS, {'save_flagged_files': False, 'max_file_size_mb': 3})
+        self.settings.start()
+
+    def tearDown(self):
+        self.settings.stop()
+        self.tmp.cleanup()
+
+    def download(self, chunks):
+        response = FakeResponse(chunks)
+        with patch('core.downloader.http_client.get_session', return_value=FakeSession(response)):
+            result = asyncio.run(download_file('bucket', 'dump.txt', self.analyzer, 'us-east-1'))
+        return result, response.content.served
+
+    def test_stops_on_first_hit_by_default(self):
+        (local_path, risk), served = self.download([b'password=1' + b'x' * CHUNK] + [b'x' * 10] * 5)
+        self.assertEqual((local_path, risk), (None, 'HIGH'))
+        self.assertEqual(served, 1)
+
+    def test_content_analysis_is_timed(self):
+        before = metrics.REGISTRY.snapshot()['histograms'].get('analysis_seconds', {}).get('stage=content', {}).get('count', 0)
+        self.download([b'x' * 10, b'password'])
+        after = metrics.REGISTRY.snapshot()['histograms']['analysis_seconds']['stage=content']['count']
+        self.assertEqual(after, before + 1)
+
+    def test_oversize_keeps_earlier_hit(self):
+        with patch.dict(settings.SETTINGS, {'save_flagged_files': True}), \
+                patch('core.downloader.os.makedirs'), patch('core.downloader.open', create=True):
+            (local_path, risk), _ = self.download([b'password'] + [b'x' * CHUNK] * 4)
+        self.assertIsNone(local_path)
+        self.assertEqual(risk, 'HIGH')
+
+    def test_transient_errors_are_retried(self):
+        session = FakeSession(FakeResponse([b'password']), failures=2)
+        with patch('core.downloader.http_client.get_session', return_value=session), \
+                patch.object(download_file.retry, 'sleep', AsyncMock()):
+            result = asyncio.run(download_file('bucket', 'dump.txt', self.analyzer, 'us-east-1'))
+        self.assertEqual(result, (None, 'HIGH'))
+        self.assertEqual(session.calls, 3)
+
+    def test_gives_up_after_last_attempt(self):
+        session = FakeSession(FakeResponse([b'password']), failures=5)
+        with patch('core.downloader.http_client.get_session', return_value=session), \
+                patch.object(download_file.retry, 'sleep', AsyncMock()):
+            with self.assertRaises(aiohttp.ClientConnectionError):
+                asyncio.run(download_file('bucket', 'dump.txt', self.analyzer, 'us-east-1'))
+        self.assertEqual(session.calls, 3)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,59 +1,104 @@
 import unittest
-import sqlite3
+import asyncio
+import json
 import os
+import sqlite3
+import tempfile
 from unittest.mock import patch
-import asyncio
 import aiohttp
-from main import main
 from config import settings
+from core.analyzer import Analyzer
+from core.db_writer import DBWriter
+from core.downloader import download_file
+from core.offload import AnalysisPool
+from core.ratelimit import AdaptiveRateLimiter
+from core.reporter import generate_report
+from core.scanner import list_bucket_pages, scan_buckets_async
+from core import http_client
+from benchmarks.fake_s3 import FakeS3
+from benchmarks import run as benchmark
+from main import init_db
+
+def buckets_with_status(fake, status, count):
+    names = (f"example-com-{i}" for i in range(10_000))
+    return [name for name in names if fake.status_of(name) == status][:count]
+
+class TestFullWorkflow(unittest.IsolatedAsyncioTestCase):
+    """Escaneo, listado, análisis, descarga y reporte contra el S3 simulado, sin red ni archivos del repositorio."""
+
+    async def asyncSetUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.fake = await FakeS3(keys_per_bucket=1500, object_size=256 * 1024).start()
+        self.db_path = os.path.join(self.tmp.name, 'results.db')
+        self.settings = patch.dict(settings.SETTINGS, {
+            's3_endpoint': self.fake.endpoint, 'database': self.db_path, 'save_flagged_files': False,
+            'region_discovery': True, 'max_file_size_mb': 5
+        })
+        self.settings.start()
+        init_db(self.db_path)
+        patterns_file = os.path.join(self.tmp.name, 'patterns.txt')
+        with open(patterns_file, 'w', encoding='utf-8') as f:
+            f.write("password\naws_secret_access_key\n")
+        self.analyzer = Analyzer(patterns_file)
+        self.session = aiohttp.ClientSession()
+
+    async def asyncTearDown(self):
+        await self.session.close()
+        await http_client.close_sessions()
+        await self.fake.stop()
+        self.settings.stop()
+        self.tmp.cleanup()
+
+    async def test_full_workflow(self):
+        public = buckets_with_status(self.fake, 200, 1)
+        candidates = public + buckets_with_status(self.fake, 403, 3) + buckets_with_status(self.fake, 404, 3)
+        results = dict(await scan_buckets_async(candidates, 4, self.session))
+        self.assertEqual(results[public[0]], {'status': 'PUBLIC', 'region': 'us-east-1'})
+        self.assertEqual(sorted(data['status'] for data in results.values()), ['NOT_FOUND'] * 3 + ['PRIVATE'] * 3 + ['PUBLIC'])
+
+        writer = DBWriter(self.db_path)
+        pool = AnalysisPool(self.analyzer.patterns, workers=0)
+        records = []
+        async for body in list_bucket_pages(self.session, public[0], 'us-east-1'):
+            records.extend(await pool.analyze(body))
+        writer.write_many("INSERT INTO results (bucket, filename, risk, region) VALUES (?, ?, ?, ?)",
+                          [(public[0], r.filename, r.risk, 'us-east-1') for r in records])
+        self.assertEqual(len(records), 1500)
+        flagged = [r.filename for r in records if r.risk == 'HIGH']
+        self.assertEqual(len(flagged), 375)
+
+        local_path, content_risk = await download_file(public[0], flagged[0], self.analyzer, 'us-east-1')
+        self.assertEqual((local_path, content_risk), (None, 'HIGH'))
+        writer.write("UPDATE results SET content_risk = ? WHERE filename = ?", (content_risk, flagged[0]))
+        await writer.drain()
+        writer.close()
+
+        prefix = os.path.join(self.tmp.name, 'report')
+        generate_report(['json'], prefix)
+        with open(f"{prefix}.json", encoding='utf-8') as f:
+            report = json.load(f)
+        self.assertEqual(len(report), 1500)
+        self.assertEqual([row['filename'] for row in report if row['content_risk'] == 'HIGH'], [flagged[0]])
+
+    async def test_throttled_scan_recovers(self):
+        self.fake.throttle_ratio = 0.2
+        limiter = AdaptiveRateLimiter(500, max_rate=1000, min_rate=100)
+        candidates = buckets_with_status(self.fake, 404, 40)
+        results = await scan_buckets_async(candidates, 8, self.session, limiter=limiter)
+        self.assertEqual({data['status'] for _, data in results}, {'NOT_FOUND'})
+        self.assertGreater(self.fake.statuses.get(429, 0), 0)
+
+class TestBenchmarkHarness(unittest.TestCase):
+    def test_small_run_reports_every_stage(self):
+        before = dict(settings.SETTINGS)
+        with patch('builtins.print'):
+            report = benchmark.main(['--candidates', '200', '--list-buckets', '1', '--keys', '1200',
+                                     '--downloads', '2', '--object-size-mb', '0.5', '--analysis-workers', '0'])
+        self.assertEqual([stage['stage'] for stage in report['stages']], ['scan', 'list+analyze', 'download', 'report'])
+        self.assertEqual(report['stages'][0]['operations'], 200)
+        self.assertEqual(report['stages'][2]['operations'], 2)
+        self.assertIsNotNone(report['stages'][0]['p99_ms'])
+        self.assertEqual(settings.SETTINGS, before)
 
-class TestIntegration(unittest.TestCase):
-    def setUp(self):
-        os.makedirs('data/downloads', exist_ok=True)
-        with open('data/test_buckets.txt', 'w', encoding='utf-8') as f:
-            f.write("test-bucket\n")
-        with open('data/grep_words.txt', 'w', encoding='utf-8') as f:
-            f.write("password\n")
-        settings.SETTINGS['buckets_file'] = 'data/test_buckets.txt'
-        settings.SETTINGS['patterns_file'] = 'data/grep_words.txt'
-
-    @patch('core.scanner.aiohttp.ClientSession.get')
-    async def test_full_workflow(self, mock_get):
-        mock_get.return_value.__aenter__.return_value.status = 200
-        mock_get.return_value.__aenter__.return_value.read.return_value = b'<?xml version="1.0"?><ListBucketResult><Contents><Key>password.txt</Key></Contents></ListBucketResult>'
-        await main()
-        self.assertTrue(os.path.exists('results.md'))
-        self.assertTrue(os.path.exists('results.json'))
-        self.assertTrue(os.path.exists('results.json.gz'))
-        self.assertTrue(os.path.exists('data/downloads/test-bucket/password.txt'))
-        with sqlite3.connect('data/results.db') as conn:
-            c = conn.cursor()
-            c.execute("SELECT * FROM results WHERE bucket = 'test-bucket' AND filename = 'password.txt'")
-            self.assertIsNotNone(c.fetchone())
-
-    @patch('core.scanner.aiohttp.ClientSession.get')
-    async def test_empty_bucket(self, mock_get):
-        mock_get.return_value.__aenter__.return_value.status = 200
-        mock_get.return_value.__aenter__.return_value.read.return_value = b'<?xml version="1.0"?><ListBucketResult></ListBucketResult>'
-        await main()
-        self.assertTrue(os.path.exists('results.md'))
-        with open('results.md', 'r', encoding='utf-8') as f:
-            content = f.read()
-            self.assertIn("Archivos analizados: 0", content)
-
-    @patch('core.scanner.aiohttp.ClientSession.get')
-    async def test_network_error(self, mock_get):
-        mock_get.side_effect = aiohttp.ClientError("Error de red")
-        await main()
-        self.assertTrue(os.path.exists('logs/alerts.log'))
-        with open('logs/alerts.log', 'r', encoding='utf-8') as f:
-            content = f.read()
-            self.assertIn("Error al escanear", content)
-
-    def tearDown(self):
-        for file in ['data/test_buckets.txt', 'data/grep_words.txt', 'results.md', 'results.json', 'results.json.gz', 'data/results.db', 'logs/alerts.log']:
-            if os.path.exists(file):
-                os.remove(file)
-        if os.path.exists('data/downloads'):
-            import shutil
-            shutil.rmtree('data/downloads')
\ No newline at end of file
+if __name__ == '__main__':
+    unittest.main()
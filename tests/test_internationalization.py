@@ -1,20 +1,37 @@
 import unittest
-from core.logger import logger, setup_logger
-from config import settings
+import logging
 import os
+import tempfile
+from core.logger import setup_logger
 
 class TestInternationalization(unittest.TestCase):
+    """Los mensajes se escriben en español: el log debe conservar acentos y eñes en UTF-8."""
+
     def setUp(self):
-        settings.SETTINGS['language'] = 'es'
-        settings.SETTINGS['log_level'] = 'INFO'
-        setup_logger()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.tmp.name)
+        self.logger = setup_logger('INFO')
 
-    def test_spanish_translation(self):
-        logger.info(_("Base de datos inicializada con WAL y índices"))
-        with open('logs/alerts.log', 'r', encoding='utf-8') as f:
+    def test_spanish_messages_in_log_file(self):
+        self.logger.info("Base de datos inicializada con WAL y índices")
+        self.logger.warning("Contraseña encontrada en el bucket")
+        for handler in self.logger.handlers:
+            handler.flush()
+        with open(os.path.join('logs', 's3hunterx.log'), 'r', encoding='utf-8') as f:
             content = f.read()
-            self.assertIn("Base de datos inicializada con WAL e índices", content)
+        self.assertIn("Base de datos inicializada con WAL y índices", content)
+        self.assertIn("WARNING - Contraseña encontrada en el bucket", content)
+
+    def test_level_from_argument(self):
+        self.assertEqual(setup_logger('ERROR').level, logging.ERROR)
 
     def tearDown(self):
-        if os.path.exists('logs/alerts.log'):
-            os.remove('logs/alerts.log')
\ No newline at end of file
+        for handler in self.logger.handlers:
+            handler.close()
+        self.logger.handlers.clear()
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,37 @@
+import unittest
+import re
+from core.matcher import PatternMatcher
+
+class TestPatternMatcher(unittest.TestCase):
+    def setUp(self):
+        self.patterns = ['password', 'secret', 'pass', '.env', 'id_rsa', r'backup_\d{4}\.sql', '^config']
+        self.matcher = PatternMatcher(self.patterns)
+
+    def test_literal_match_reports_pattern(self):
+        self.assertEqual(self.matcher.search('dumps/PASSWORD.txt'), 'password')
+
+    def test_longest_literal_preferred(self):
+        self.assertEqual(self.matcher.search('my-password'), 'password')
+
+    def test_dot_is_wildcard(self):
+        self.assertEqual(self.matcher.search('prod_env'), '.env')
+
+    def test_complex_patterns(self):
+        self.assertEqual(self.matcher.search('db/backup_2023.sql'), r'backup_\d{4}\.sql')
+        self.assertEqual(self.matcher.search('config/app.yml'), '^config')
+        self.assertIsNone(self.matcher.search('app/config.yml'))
+
+    def test_no_match(self):
+        self.assertIsNone(self.matcher.search('images/logo.png'))
+
+    def test_find_all(self):
+        self.assertEqual(sorted(self.matcher.find_all('secret/id_rsa')), ['id_rsa', 'secret'])
+
+    def test_same_result_as_individual_search(self):
+        texts = ['a/b/c.txt', 'x.env', 'id-rsa', 'Secretos', 'configs', 'nothing', 'backup_12.sql']
+        for text in texts:
+            expected = any(re.search(p, text, re.IGNORECASE) for p in self.patterns)
+            self.assertEqual(self.matcher.search(text) is not None, expected, text)
+
+if __name__ == '__main__':
+    unittest.main()
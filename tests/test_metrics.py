@@ -0,0 +1,48 @@
+import unittest
+import json
+import os
+import tempfile
+from core import metrics
+from core.metrics import Registry
+
+class TestRegistry(unittest.TestCase):
+    def setUp(self):
+        self.registry = Registry()
+
+    def test_prometheus_text(self):
+        self.registry.inc('s3_requests_total', op='check', region='eu-west-1', status=429)
+        self.registry.inc('s3_requests_total', op='check', region='eu-west-1', status=429)
+        self.registry.observe('s3_request_seconds', 0.02, op='check')
+        self.registry.gauge_callback('download_queue_depth', lambda: 3)
+        text = self.registry.render_prometheus()
+        self.assertIn('s3hunter_s3_requests_total{op="check",region="eu-west-1",status="429"} 2', text)
+        self.assertIn('s3hunter_s3_request_seconds_bucket{op="check",le="0.01"} 0', text)
+        self.assertIn('s3hunter_s3_request_seconds_bucket{op="check",le="0.025"} 1', text)
+        self.assertIn('s3hunter_s3_request_seconds_bucket{op="check",le="+Inf"} 1', text)
+        self.assertIn('s3hunter_download_queue_depth 3.0', text)
+
+    def test_snapshot_quantiles(self):
+        for _ in range(98):
+            self.registry.observe('db_flush_seconds', 0.004)
+        for _ in range(2):
+            self.registry.observe('db_flush_seconds', 3)
+        summary = self.registry.snapshot()['histograms']['db_flush_seconds']['total']
+        self.assertEqual(summary['count'], 100)
+        self.assertEqual(summary['p50'], 0.005)
+        self.assertEqual(summary['p99'], 5.0)
+
+    def test_timed_adds_labels_from_block(self):
+        with self.registry.timed('download_seconds') as labels:
+            labels['result'] = 'HIGH'
+        self.assertEqual(self.registry.snapshot()['histograms']['download_seconds']['result=HIGH']['count'], 1)
+
+    def test_write_snapshot(self):
+        metrics.inc('download_bytes_total', 1024)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'metrics.json')
+            metrics.write_snapshot(path)
+            with open(path, encoding='utf-8') as f:
+                self.assertGreaterEqual(json.load(f)['counters']['download_bytes_total']['total'], 1024)
+
+if __name__ == '__main__':
+    unittest.main()
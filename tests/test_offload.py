@@ -0,0 +1,39 @@
+import unittest
+import asyncio
+from core.offload import AnalysisPool, KeyRecord
+from core.scanner import page_continuation
+
+def listing_page(keys, next_token=None):
+    contents = ''.join(f"<Contents><Key>{key}</Key><Size>10</Size></Contents>" for key in keys)
+    truncated = f"<IsTruncated>true</IsTruncated><NextContinuationToken>{next_token}</NextContinuationToken>" if next_token else "<IsTruncated>false</IsTruncated>"
+    return f'<?xml version="1.0"?><ListBucketResult xmlns="http://s3.amazonaws.com/doc/2006-03-01/">{truncated}{contents}</ListBucketResult>'.encode()
+
+class TestAnalysisPool(unittest.TestCase):
+    def run_pool(self, workers, body, filter_patterns=None):
+        pool = AnalysisPool(['password', r'\.env$'], filter_patterns, workers=workers)
+        try:
+            return asyncio.run(pool.analyze(body))
+        finally:
+            pool.close()
+
+    def test_inline_analysis(self):
+        records = self.run_pool(0, listing_page(['docs/readme.md', 'prod/.env']))
+        self.assertEqual(records, [KeyRecord('docs/readme.md', 'LOW', None, 10), KeyRecord('prod/.env', 'HIGH', r'\.env$', 10)])
+
+    def test_process_pool_matches_inline(self):
+        body = listing_page([f"dir/file-{i}.txt" for i in range(500)] + ['backup/password.txt'])
+        self.assertEqual(self.run_pool(2, body), self.run_pool(0, body))
+
+    def test_key_filter_applied_in_worker(self):
+        records = self.run_pool(1, listing_page(['a/backup.sql', 'b/image.png']), filter_patterns=['backup'])
+        self.assertEqual([record.filename for record in records], ['a/backup.sql'])
+
+class TestPageContinuation(unittest.TestCase):
+    def test_token_extracted_and_unescaped(self):
+        self.assertEqual(page_continuation(listing_page(['a'], next_token='1x&amp;y')), '1x&y')
+
+    def test_last_page(self):
+        self.assertIsNone(page_continuation(listing_page(['a'])))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import unittest
+import asyncio
+from unittest.mock import patch
+from aiohttp import web
+from core import http_client, proxies
+from core.proxies import ProxyPool
+
+class TestValidateProxies(unittest.TestCase):
+    def setUp(self):
+        proxies._health.clear()
+
+    def test_local_stand_in(self):
+        async def run():
+            hits = []
+
+            async def handler(request):
+                hits.append(request.path)
+                return web.json_response({'origin': '127.0.0.1'})
+
+            app = web.Application()
+            app.router.add_get('/ip', handler)
+            runner = web.AppRunner(app)
+            await runner.setup()
+            site = web.TCPSite(runner, '127.0.0.1', 0)
+            await site.start()
+            port = runner.addresses[0][1]
+            good = f"http://127.0.0.1:{port}"
+            bad = "http://127.0.0.1:1"
+            try:
+                first = await proxies.validate_proxies([good, bad], test_url='http://stand-in.test/ip', timeout=2)
+                second = await proxies.validate_proxies([good, bad], test_url='http://stand-in.test/ip', timeout=2)
+            finally:
+                await http_client.close_sessions()
+                await runner.cleanup()
+            return first, second, hits
+
+        first, second, hits = asyncio.run(run())
+        self.assertEqual(first, second)
+        self.assertEqual(len(first), 1)
+        self.assertEqual(len(hits), 1)
+
+    def test_settings_import_has_no_network_check(self):
+        import config.settings as settings_module
+        self.assertFalse(hasattr(settings_module, 'validate_proxy'))
+
+class TestProxyPool(unittest.TestCase):
+    def test_ejection_and_readmission(self):
+        pool = ProxyPool(['http://a:8080', 'http://b:8080'], min_samples=3, eject_seconds=10)
+        for _ in range(5):
+            pool.record('http://a:8080', False, 0.1)
+        self.assertGreater(pool.stats['http://a:8080'].ejected_until, 0)
+        self.assertTrue(all(pool._pick() == 'http://b:8080' for _ in range(20)))
+        with patch('core.proxies.time.monotonic', return_value=pool.stats['http://a:8080'].ejected_until + 1):
+            self.assertIn('http://a:8080', {pool._pick() for _ in range(50)})
+
+    def test_repeated_ejection_backs_off(self):
+        pool = ProxyPool(['http://a:8080'], min_samples=1, eject_seconds=10)
+        for _ in range(5):
+            pool.record('http://a:8080', False, 0.1)
+        self.assertEqual(pool.stats['http://a:8080'].ejections, 2)
+        pool.record('http://a:8080', True, 0.1)
+        self.assertFalse(pool.stats['http://a:8080'].probation)
+        self.assertEqual(pool.stats['http://a:8080'].ejections, 0)
+
+    def test_lease_scores_failures_and_rotates_user_agent(self):
+        async def run():
+            pool = ProxyPool(['http://a:8080'], user_agents=['UA-1'])
+            async with pool.lease() as lease:
+                headers = lease.headers
+                key = lease.key('s3.amazonaws.com')
+                lease.failed()
+            return pool, headers, key
+
+        pool, headers, key = asyncio.run(run())
+        self.assertEqual(headers, {'User-Agent': 'UA-1'})
+        self.assertEqual(key, 's3.amazonaws.com@http://a:8080')
+        self.assertLess(pool.stats['http://a:8080'].success, 1.0)
+        self.assertEqual(pool.stats['http://a:8080'].inflight, 0)
+
+if __name__ == '__main__':
+    unittest.main()
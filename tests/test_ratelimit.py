@@ -0,0 +1,43 @@
+import unittest
+import asyncio
+import time
+from core.ratelimit import RateLimiter, AdaptiveRateLimiter
+
+class TestRateLimiter(unittest.TestCase):
+    def test_token_bucket_paces_requests(self):
+        async def run():
+            limiter = RateLimiter(20, burst=1)
+            start = time.monotonic()
+            for _ in range(5):
+                await limiter.acquire()
+            return time.monotonic() - start
+        self.assertGreaterEqual(asyncio.run(run()), 0.15)
+
+class TestAdaptiveRateLimiter(unittest.TestCase):
+    def test_multiplicative_decrease_once_per_cooldown(self):
+        limiter = AdaptiveRateLimiter(100, max_rate=200, cooldown=60)
+        limiter.record_throttle('s3.us-east-1.amazonaws.com')
+        limiter.record_throttle('s3.us-east-1.amazonaws.com')
+        self.assertEqual(limiter.rate('s3.us-east-1.amazonaws.com'), 50)
+        self.assertEqual(limiter.throttled, 2)
+
+    def test_endpoints_are_independent(self):
+        limiter = AdaptiveRateLimiter(100)
+        limiter.record_throttle('s3.eu-west-1.amazonaws.com')
+        self.assertEqual(limiter.rate('s3.us-west-2.amazonaws.com'), 100)
+
+    def test_additive_recovery_capped(self):
+        limiter = AdaptiveRateLimiter(10, max_rate=12, min_rate=1)
+        limiter.record_throttle('s3.amazonaws.com')
+        for _ in range(1000):
+            limiter.record_success('s3.amazonaws.com')
+        self.assertEqual(limiter.rate('s3.amazonaws.com'), 12)
+
+    def test_min_rate_floor(self):
+        limiter = AdaptiveRateLimiter(4, min_rate=1, cooldown=0)
+        for _ in range(10):
+            limiter.record_throttle('s3.amazonaws.com')
+        self.assertEqual(limiter.rate('s3.amazonaws.com'), 1)
+
+if __name__ == '__main__':
+    unittest.main()
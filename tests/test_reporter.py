@@ -0,0 +1,74 @@
+import unittest
+import os
+import json
+import sqlite3
+import tempfile
+from unittest.mock import patch
+from config import settings
+from core.reporter import IncrementalReporter, generate_report
+from main import init_db
+
+class TestReporter(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = os.path.join(self.tmp.name, 'test.db')
+        init_db(self.db)
+        self.settings = patch.dict(settings.SETTINGS, {'database': self.db})
+        self.settings.start()
+        self.prefix = os.path.join(self.tmp.name, 'out')
+
+    def tearDown(self):
+        self.settings.stop()
+        self.tmp.cleanup()
+
+    def insert(self, *filenames):
+        with sqlite3.connect(self.db) as conn:
+            conn.executemany("INSERT INTO results (bucket, filename, risk, url, region, timestamp) VALUES (?, ?, 'HIGH', '', 'us-east-1', 'now')",
+                             [('b', f) for f in filenames])
+
+    def test_incremental_appends_only_new_rows(self):
+        reporter = IncrementalReporter(['md', 'json', 'csv'], self.prefix)
+        self.insert('a.env', 'b.sql')
+        self.assertEqual(reporter.append_new(), 2)
+        self.assertEqual(reporter.append_new(), 0)
+        self.insert('c.key')
+        self.assertEqual(reporter.append_new(), 1)
+        with open(f"{self.prefix}.jsonl", encoding='utf-8') as f:
+            self.assertEqual([json.loads(line)['filename'] for line in f], ['a.env', 'b.sql', 'c.key'])
+        with open(f"{self.prefix}.csv", encoding='utf-8') as f:
+            self.assertEqual(len(f.readlines()), 4)
+
+    def test_changed_rows_are_appended_again(self):
+        reporter = IncrementalReporter(['json'], self.prefix)
+        self.insert('a.env', 'b.sql')
+        reporter.append_new()
+        with sqlite3.connect(self.db) as conn:
+            conn.execute("UPDATE results SET content_risk = 'HIGH' WHERE filename = 'a.env'")
+            # Volver a listar el bucket sin cambios no genera filas nuevas
+            conn.execute("""INSERT INTO results (bucket, filename, risk, url, region) VALUES ('b', 'b.sql', 'HIGH', '', 'us-east-1')
+                            ON CONFLICT (bucket, filename) DO UPDATE SET risk = excluded.risk
+                            WHERE results.risk IS NOT excluded.risk""")
+        self.assertEqual(reporter.append_new(), 1)
+        with open(f"{self.prefix}.jsonl", encoding='utf-8') as f:
+            rows = [json.loads(line) for line in f]
+        self.assertEqual([(r['filename'], r['content_risk']) for r in rows],
+                         [('a.env', None), ('b.sql', None), ('a.env', 'HIGH')])
+
+    def test_watermark_continues_existing_report(self):
+        first = IncrementalReporter(['csv'], self.prefix)
+        self.insert('a.env')
+        first.append_new()
+        self.insert('b.sql')
+        resumed = IncrementalReporter(['csv'], self.prefix, watermark=first.watermark)
+        self.assertEqual(resumed.append_new(), 1)
+        with open(f"{self.prefix}.csv", encoding='utf-8') as f:
+            self.assertEqual([line.split(',')[1] for line in f.read().splitlines()], ['Filename', 'a.env', 'b.sql'])
+
+    def test_full_report_is_valid_json(self):
+        self.insert('a.env', 'b.sql')
+        generate_report(['json'], self.prefix)
+        with open(f"{self.prefix}.json", encoding='utf-8') as f:
+            self.assertEqual(len(json.load(f)), 2)
+
+if __name__ == '__main__':
+    unittest.main()
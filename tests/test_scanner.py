@@ -1,34 +1,258 @@
 import unittest
-from unittest.mock import patch
-from core.scanner import check_bucket_async, is_valid_bucket_name
 import asyncio
+from unittest.mock import patch
+from config import settings
+from core import scanner
+from core.scanner import bucket_url, list_bucket_pages, parse_listing_page, scan_bucket, scan_stream, LISTING_PAGE_SIZE
+
+def listing_page(keys, next_token=None):
+    contents = ''.join(f"<Contents><Key>{key}</Key><Size>10</Size></Contents>" for key in keys)
+    truncated = f"<IsTruncated>true</IsTruncated><NextContinuationToken>{next_token}</NextContinuationToken>" if next_token else "<IsTruncated>false</IsTruncated>"
+    return f'<?xml version="1.0"?><ListBucketResult xmlns="http://s3.amazonaws.com/doc/2006-03-01/">{truncated}{contents}</ListBucketResult>'.encode()
+
+class FakeContent:
+    def __init__(self, body):
+        self.body = body
+
+    async def iter_chunked(self, size):
+        for i in range(0, len(self.body), size):
+            yield self.body[i:i + size]
+
+class FakeResponse:
+    def __init__(self, session, status, body=b'', headers=None):
+        self.session = session
+        self.status = status
+        self.content = FakeContent(body)
+        self.headers = headers or {}
+
+    async def __aenter__(self):
+        self.session.open += 1
+        return self
+
+    async def __aexit__(self, *exc):
+        self.session.open -= 1
+
+class FakeSession:
+    """Sesión mínima que sirve respuestas predefinidas y cuenta las que siguen abiertas."""
+
+    def __init__(self, pages=None, heads=None):
+        self.pages = pages or {}
+        self.heads = heads or {}
+        self.open = 0
+        self.requests = []
+
+    def get(self, url, params=None, **kwargs):
+        self.requests.append((url, dict(params or {})))
+        status, body = self.pages[(params or {}).get('continuation-token')]
+        return FakeResponse(self, status, body)
+
+    def head(self, url, **kwargs):
+        self.requests.append((url, {}))
+        status, headers = self.heads[url]
+        return FakeResponse(self, status, headers=headers)
+
+async def listed_keys(session, bucket='bucket', region='us-east-1'):
+    """Claves de todas las páginas, analizadas como lo hace el pool de análisis."""
+    return [record['Key'] async for body in list_bucket_pages(session, bucket, region) for record in parse_listing_page(body)]
+
+class TestListBucketPages(unittest.TestCase):
+    def test_follows_continuation_tokens(self):
+        session = FakeSession({
+            None: (200, listing_page(['a.txt', 'b.txt'], next_token='t1')),
+            't1': (200, listing_page(['c.env'], next_token='t2')),
+            't2': (200, listing_page(['d.sql'])),
+        })
+
+        self.assertEqual(asyncio.run(listed_keys(session)), ['a.txt', 'b.txt', 'c.env', 'd.sql'])
+        self.assertEqual([params.get('continuation-token') for _, params in session.requests], [None, 't1', 't2'])
+        self.assertTrue(all(params['max-keys'] == str(LISTING_PAGE_SIZE) for _, params in session.requests))
+
+    def test_slow_consumer_does_not_hold_response(self):
+        session = FakeSession({
+            None: (200, listing_page([f"key-{i}" for i in range(3000)], next_token='t1')),
+            't1': (200, listing_page(['last'])),
+        })
+
+        async def run():
+            keys = []
+            async for body in list_bucket_pages(session, 'bucket', 'us-east-1'):
+                # Ninguna respuesta debe seguir abierta mientras el consumidor procesa (p. ej. esperando a las descargas)
+                self.assertEqual(session.open, 0)
+                await asyncio.sleep(0)
+                keys.extend(record['Key'] for record in parse_listing_page(body))
+            return keys
+
+        keys = asyncio.run(run())
+        self.assertEqual(len(keys), 3001)
+        self.assertEqual(keys[-1], 'last')
+
+    def test_stops_on_error_status(self):
+        session = FakeSession({
+            None: (200, listing_page(['a.txt'], next_token='t1')),
+            't1': (403, b''),
+        })
+
+        self.assertEqual(asyncio.run(listed_keys(session)), ['a.txt'])
+
+class TestRegionDiscovery(unittest.TestCase):
+    def test_region_from_header_then_single_check(self):
+        session = FakeSession(
+            pages={None: (200, b'')},
+            heads={'https://bucket.s3.amazonaws.com': (301, {'x-amz-bucket-region': 'eu-west-1'})}
+        )
+        result = asyncio.run(scan_bucket(session, 'bucket'))
+        self.assertEqual(result, {'status': 'PUBLIC', 'region': 'eu-west-1'})
+        self.assertEqual([url for url, _ in session.requests],
+                         ['https://bucket.s3.amazonaws.com', 'https://bucket.s3.eu-west-1.amazonaws.com'])
+
+    def test_region_from_location_header(self):
+        session = FakeSession(
+            pages={None: (403, b'')},
+            heads={'https://bucket.s3.amazonaws.com': (307, {'Location': 'https://bucket.s3-ap-southeast-1.amazonaws.com/'})}
+        )
+        self.assertEqual(asyncio.run(scan_bucket(session, 'bucket')), {'status': 'PRIVATE', 'region': 'ap-southeast-1'})
+
+    def test_missing_bucket_needs_one_request(self):
+        session = FakeSession(heads={'https://missing.s3.amazonaws.com': (404, {})})
+        self.assertEqual(asyncio.run(scan_bucket(session, 'missing'))['status'], 'NOT_FOUND')
+        self.assertEqual(len(session.requests), 1)
+
+class UrlSession(FakeSession):
+    """Sesión que responde según la URL, para distinguir estilo path y virtual-hosted."""
+
+    def get(self, url, params=None, **kwargs):
+        self.requests.append((url, dict(params or {})))
+        status, body = self.pages[url]
+        return FakeResponse(self, status, body)
+
+class TestPathStyle(unittest.TestCase):
+    def setUp(self):
+        scanner._virtual_hosted_only.clear()
+        patcher = patch.dict(settings.SETTINGS, {'s3_path_style': True, 's3_endpoint': ''})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(scanner._virtual_hosted_only.clear)
+
+    def test_probes_share_regional_endpoint(self):
+        session = UrlSession(
+            pages={'https://s3.eu-west-1.amazonaws.com/bucket': (200, b'')},
+            heads={'https://s3.amazonaws.com/bucket': (301, {'x-amz-bucket-region': 'eu-west-1'})}
+        )
+        self.assertEqual(asyncio.run(scan_bucket(session, 'bucket')), {'status': 'PUBLIC', 'region': 'eu-west-1'})
+        self.assertEqual([url for url, _ in session.requests],
+                         ['https://s3.amazonaws.com/bucket', 'https://s3.eu-west-1.amazonaws.com/bucket'])
+
+    def test_falls_back_to_virtual_hosted(self):
+        session = UrlSession(
+            pages={
+                'https://s3.eu-west-1.amazonaws.com/bucket': (400, b''),
+                'https://bucket.s3.eu-west-1.amazonaws.com': (200, b''),
+            },
+            heads={'https://s3.amazonaws.com/bucket': (301, {'Location': 'https://s3.eu-west-1.amazonaws.com/bucket'})}
+        )
+        self.assertEqual(asyncio.run(scan_bucket(session, 'bucket')), {'status': 'PUBLIC', 'region': 'eu-west-1'})
+        self.assertEqual(len(session.requests), 3)
+        # El fallback se recuerda para el listado y las descargas del mismo bucket
+        self.assertEqual(bucket_url('bucket', 'eu-west-1'), 'https://bucket.s3.eu-west-1.amazonaws.com')
+        self.assertEqual(bucket_url('other', 'eu-west-1'), 'https://s3.eu-west-1.amazonaws.com/other')
+
+    def test_listing_falls_back_to_virtual_hosted(self):
+        session = UrlSession(pages={
+            'https://s3.us-east-1.amazonaws.com/bucket': (301, b''),
+            'https://bucket.s3.us-east-1.amazonaws.com': (200, listing_page(['a.txt'])),
+        })
+
+        self.assertEqual(asyncio.run(listed_keys(session)), ['a.txt'])
+
+class TestEndpointKey(unittest.TestCase):
+    def test_custom_endpoint_is_the_limiter_key(self):
+        with patch.dict(settings.SETTINGS, {'s3_endpoint': 'http://127.0.0.1:9000/s3'}):
+            self.assertEqual(scanner.endpoint_for('eu-west-1'), '127.0.0.1:9000')
+            self.assertEqual(scanner.endpoint_for(None), '127.0.0.1:9000')
+        with patch.dict(settings.SETTINGS, {'s3_endpoint': ''}):
+            self.assertEqual(scanner.endpoint_for('eu-west-1'), 's3.eu-west-1.amazonaws.com')
+
+class FakeCache:
+    def __init__(self, cached):
+        self.cached = cached
+        self.stored = {}
+        self.flushed = False
+
+    def get_many(self, buckets):
+        return {bucket: self.cached[bucket] for bucket in buckets if bucket in self.cached}
+
+    def put(self, bucket, result):
+        self.stored[bucket] = result
+
+    def flush(self):
+        self.flushed = True
+
+class TestScanStream(unittest.TestCase):
+    def test_slow_bucket_does_not_block_others(self):
+        async def fake_scan(session, bucket, limiter=None, proxy_pool=None):
+            await asyncio.sleep(0.3 if bucket == 'slow' else 0.01)
+            return {'status': 'NOT_FOUND', 'region': None}
+
+        async def run():
+            return [bucket async for bucket, _ in scan_stream(['slow'] + [f"b{i}" for i in range(10)], 2, None)]
+
+        with patch('core.scanner.scan_bucket', fake_scan):
+            order = asyncio.run(run())
+        self.assertEqual(len(order), 11)
+        self.assertEqual(order[-1], 'slow')
+
+    def test_slow_consumer_slows_probes(self):
+        scanned = []
+
+        async def fake_scan(session, bucket, limiter=None, proxy_pool=None):
+            scanned.append(bucket)
+            return {'status': 'NOT_FOUND', 'region': None}
+
+        async def run():
+            seen = 0
+            async for _ in scan_stream([f"b{i}" for i in range(100)], 2, None):
+                seen += 1
+                await asyncio.sleep(0.01)
+                # Resultados en la cola (4) más los que tienen los workers en mano (2) y el que se entrega
+                self.assertLessEqual(len(scanned) - seen, 2 * 2 + 2 + 1)
+            return seen
+
+        with patch('core.scanner.scan_bucket', fake_scan):
+            self.assertEqual(asyncio.run(run()), 100)
+
+    def test_cache_hits_skip_network(self):
+        scanned = []
+
+        async def fake_scan(session, bucket, limiter=None, proxy_pool=None):
+            scanned.append(bucket)
+            return {'status': 'PRIVATE', 'region': 'us-east-1'}
+
+        cache = FakeCache({'cached': {'status': 'NOT_FOUND', 'region': None, 'cached': True}})
+
+        async def run():
+            return dict([item async for item in scan_stream(['cached', 'fresh'], 2, None, cache=cache)])
+
+        with patch('core.scanner.scan_bucket', fake_scan):
+            results = asyncio.run(run())
+        self.assertEqual(scanned, ['fresh'])
+        self.assertTrue(results['cached']['cached'])
+        self.assertEqual(cache.stored, {'fresh': {'status': 'PRIVATE', 'region': 'us-east-1'}})
+        self.assertTrue(cache.flushed)
+
+    def test_producer_error_propagates(self):
+        def candidates():
+            yield 'ok'
+            raise RuntimeError('generador roto')
+
+        async def fake_scan(session, bucket, limiter=None, proxy_pool=None):
+            return {'status': 'NOT_FOUND', 'region': None}
+
+        async def run():
+            return [item async for item in scan_stream(candidates(), 2, None)]
 
-class TestScanner(unittest.TestCase):
-    @patch('core.scanner.aiohttp.ClientSession.get')
-    async def test_check_bucket_public(self, mock_get):
-        mock_get.return_value.__aenter__.return_value.status = 200
-        mock_get.return_value.__aenter__.return_value.read.return_value = b'<?xml version="1.0"?><ListBucketResult><Contents><Key>test.txt</Key></Contents></ListBucketResult>'
-        result = await check_bucket_async("test-bucket")
-        self.assertIsNotNone(result)
-        self.assertEqual(result[0], "test-bucket")
-
-    @patch('core.scanner.aiohttp.ClientSession.get')
-    async def test_check_bucket_private(self, mock_get):
-        mock_get.return_value.__aenter__.return_value.status = 403
-        result = await check_bucket_async("private-bucket")
-        self.assertIsNone(result)
-
-    @patch('core.scanner.aiohttp.ClientSession.get')
-    async def test_check_bucket_error(self, mock_get):
-        mock_get.side_effect = aiohttp.ClientError("Error de red")
-        result = await check_bucket_async("error-bucket")
-        self.assertIsNone(result)
-
-    def test_valid_bucket_name(self):
-        self.assertTrue(is_valid_bucket_name("valid-bucket"))
-        self.assertFalse(is_valid_bucket_name("invalid bucket!"))
-        self.assertFalse(is_valid_bucket_name("ab"))
-        self.assertFalse(is_valid_bucket_name("a" * 64))
+        with patch('core.scanner.scan_bucket', fake_scan):
+            with self.assertRaises(RuntimeError):
+                asyncio.run(run())
 
 if __name__ == '__main__':
-    unittest.main()
\ No newline at end of file
+    unittest.main()
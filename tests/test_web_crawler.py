@@ -0,0 +1,86 @@
+import unittest
+import asyncio
+from unittest.mock import patch
+from aiohttp import web
+from config import settings
+from core import http_client
+from core.cloud_refs import CloudBucket
+from core.web_crawler import normalize_url, spider_cloud_resources
+
+PAGES = {
+    '/': '<a href="/a">a</a> <a href="/b#top">b</a> <a href="https://other.example/">fuera</a> <script src="/app.js"></script>',
+    '/a': '<a href="/">inicio</a> <a href="/b">b</a> <a href="/c?y=2&x=1">c</a> <img src="{s3}/Assets-Bucket/a.png">',
+    '/b': '<a href="/a">a</a> <a href="/c?x=1&y=2">c</a> <img src="{s3}/assets-bucket/b.png">',
+    '/c': '<a href="/">inicio</a> <img src="{s3}/missing-bucket/c.png">',
+}
+
+class TestNormalizeUrl(unittest.TestCase):
+    def test_canonical_form(self):
+        self.assertEqual(normalize_url('HTTPS://Example.COM:443/path?b=2&a=1#frag'), 'https://example.com/path?a=1&b=2')
+        self.assertEqual(normalize_url('../x', 'http://example.com/a/b/'), 'http://example.com/a/x')
+        self.assertEqual(normalize_url('http://example.com'), 'http://example.com/')
+
+    def test_rejects_non_http(self):
+        self.assertIsNone(normalize_url('mailto:admin@example.com'))
+        self.assertIsNone(normalize_url('javascript:void(0)', 'http://example.com/'))
+
+class TestSpider(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.hits = {}
+        self.active = 0
+        self.max_active = 0
+
+        async def page(request):
+            self.hits[request.path_qs] = self.hits.get(request.path_qs, 0) + 1
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            await asyncio.sleep(0.01)
+            self.active -= 1
+            if request.path == '/app.js':
+                return web.Response(text=f'fetch("{self.s3}/assets-bucket/app.json")', content_type='application/javascript')
+            if request.path.startswith('/s3/'):
+                return web.Response(status=404 if 'missing' in request.path else 403)
+            return web.Response(text=PAGES[request.path].format(s3=self.s3), content_type='text/html')
+
+        app = web.Application()
+        app.router.add_route('*', '/{tail:.*}', page)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, '127.0.0.1', 0)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        self.s3 = f"http://127.0.0.1:{self.port}/s3"
+        patcher = patch.dict(settings.SETTINGS, {'s3_endpoint': self.s3})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def asyncTearDown(self):
+        await http_client.close_sessions()
+        await self.runner.cleanup()
+
+    def pages(self):
+        return {path: count for path, count in self.hits.items() if not path.startswith('/s3/')}
+
+    async def test_each_page_fetched_once(self):
+        found = await spider_cloud_resources(f"http://127.0.0.1:{self.port}/", depth=5, workers=4, providers=['s3'])
+        self.assertEqual(self.pages(), {'/': 1, '/a': 1, '/b': 1, '/c?x=1&y=2': 1, '/app.js': 1})
+        # Referenciado desde tres recursos, validado una sola vez; el inexistente se descarta
+        self.assertEqual(found, [CloudBucket('s3', 'assets-bucket', None)])
+        self.assertEqual({path: count for path, count in self.hits.items() if path.startswith('/s3/')},
+                         {'/s3/assets-bucket': 1, '/s3/missing-bucket': 1})
+
+    async def test_page_budget(self):
+        await spider_cloud_resources(f"http://127.0.0.1:{self.port}/", workers=4, providers=['s3'], max_pages=2)
+        self.assertEqual(sum(self.pages().values()), 2)
+
+    async def test_depth_limit(self):
+        await spider_cloud_resources(f"http://127.0.0.1:{self.port}/", depth=0, workers=2, providers=['s3'])
+        self.assertEqual(self.hits, {'/': 1})
+
+    async def test_host_concurrency(self):
+        with patch.dict(settings.SETTINGS, {'crawl_host_concurrency': 1}):
+            await spider_cloud_resources(f"http://127.0.0.1:{self.port}/", workers=8, providers=[])
+        self.assertEqual(self.max_active, 1)
+
+if __name__ == '__main__':
+    unittest.main()
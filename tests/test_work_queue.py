@@ -0,0 +1,81 @@
+import unittest
+import asyncio
+import os
+import tempfile
+from unittest.mock import patch
+from core.work_queue import HashRing, WorkQueue, enqueue_candidates, leased_buckets
+from main import worker_command
+
+class TestHashRing(unittest.TestCase):
+    def test_stable_and_balanced(self):
+        ring = HashRing(4)
+        buckets = [f"bucket-{i}" for i in range(4000)]
+        shards = [ring.shard_for(b) for b in buckets]
+        self.assertEqual(shards, [HashRing(4).shard_for(b) for b in buckets])
+        for shard in range(4):
+            self.assertGreater(shards.count(shard), 600)
+
+    def test_adding_shard_moves_few_keys(self):
+        buckets = [f"bucket-{i}" for i in range(4000)]
+        before, after = HashRing(4), HashRing(5)
+        moved = sum(before.shard_for(b) != after.shard_for(b) for b in buckets)
+        self.assertLess(moved, 4000 * 0.35)
+
+class TestWorkQueue(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.queue = WorkQueue(os.path.join(self.tmp.name, 'queue.db'), lease_seconds=60, max_attempts=2)
+        self.ring = HashRing(2)
+        self.queue.reset(2)
+
+    def tearDown(self):
+        self.queue.close()
+        self.tmp.cleanup()
+
+    def test_enqueue_is_idempotent(self):
+        self.assertEqual(self.queue.enqueue_many(['a', 'b'], self.ring), 2)
+        self.assertEqual(self.queue.enqueue_many(['a', 'b', 'c'], self.ring), 1)
+
+    def test_lease_prefers_own_shard_then_steals(self):
+        buckets = [f"bucket-{i}" for i in range(20)]
+        self.queue.enqueue_many(buckets, self.ring)
+        own = [b for b in buckets if self.ring.shard_for(b) == 0]
+        leased = self.queue.lease('0', 0, len(own))
+        self.assertEqual(sorted(leased), sorted(own))
+        self.assertEqual(len(self.queue.lease('0', 0, 100)), 20 - len(own))
+
+    def test_expired_lease_is_retried_then_abandoned(self):
+        self.queue.enqueue_many(['flaky'], self.ring)
+        self.queue.finish_producing()
+        self.assertEqual(self.queue.lease('0', 0, 10), ['flaky'])
+        self.assertEqual(self.queue.lease('1', 1, 10), [])
+        with patch('core.work_queue.time.time', return_value=10 ** 12):
+            self.assertEqual(self.queue.lease('1', 1, 10), ['flaky'])
+            self.assertFalse(self.queue.drained())
+        with patch('core.work_queue.time.time', return_value=10 ** 13):
+            self.assertEqual(self.queue.lease('0', 0, 10), [])
+            self.assertTrue(self.queue.drained())
+
+    def test_complete_and_drain(self):
+        async def run():
+            producer = enqueue_candidates(self.queue, self.ring, iter(['a', 'b', 'c']))
+            await producer
+            seen = []
+            async for bucket in leased_buckets(self.queue, '1', batch_size=2):
+                seen.append(bucket)
+                self.queue.complete('1', [bucket])
+                self.queue.complete('1', [bucket])
+            return seen
+
+        self.assertEqual(sorted(asyncio.run(run())), ['a', 'b', 'c'])
+        self.assertEqual(self.queue.counts(), {'done': 3})
+
+class TestWorkerCommand(unittest.TestCase):
+    def test_strips_coordinator_options(self):
+        command = worker_command(['--target-domain', 'example.com', '--mode', 'coordinator', '--local-workers=4',
+                                  '--shards', '8', '--purge-db', '--report-formats', 'md', 'csv'], 3)
+        self.assertEqual(command[2:], ['--target-domain', 'example.com', '--report-formats', 'md', 'csv',
+                                       '--mode', 'worker', '--worker-id', '3'])
+
+if __name__ == '__main__':
+    unittest.main()